@@ -23,6 +23,12 @@ class PointAdmin(GISModelAdmin):
     search_fields = ('name', 'created_by__username')
     readonly_fields = ('created_at', 'updated_at')
 
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.save(update_fields=Point.data_fields())
+        else:
+            obj.save()
+
     def get_latitude(self, obj):
         return round(obj.location.y, 6) if obj.location else None
     get_latitude.short_description = 'Широта'
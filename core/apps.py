@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     name = 'core'
     default_auto_field = 'django.db.models.BigAutoField'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,195 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.views import exception_handler
+
+from .authentication import CachedJWTAuthentication
+from .message_stats import create_message
+from .metrics import record_search
+from .models import Message, Point
+from .pagination import KeysetPagination
+from .search import (
+    match_text,
+    order_points,
+    parse_order_params,
+    parse_search_params,
+    parse_text_params,
+    within_radius,
+)
+from .serializers import (
+    MessageReadSerializer,
+    MessageSerializer,
+    PointReadSerializer,
+    PointSerializer,
+)
+
+jwt_authentication = CachedJWTAuthentication()
+
+
+def render(data, status=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        content_type='application/json',
+        status=status,
+        headers=headers,
+    )
+
+
+async def authenticate(request):
+    header = jwt_authentication.get_header(request)
+    raw_token = None if header is None else jwt_authentication.get_raw_token(header)
+    if raw_token is None:
+        raise NotAuthenticated()
+    token = jwt_authentication.get_validated_token(raw_token)
+    return await sync_to_async(jwt_authentication.get_user)(token)
+
+
+class AsyncAPIView(View):
+    # Асинхронные аналоги эндпоинтов DRF для ASGI: пока PostGIS выполняет
+    # запрос, event loop обслуживает другие запросы. Ответы и ошибки
+    # совпадают с синхронными вьюхами.
+    model = None
+    serializer_class = None
+    read_serializer_class = None
+    pagination_class = KeysetPagination
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Как APIView в DRF: клиенты приходят с JWT в заголовке, без
+        # CSRF-cookie, поэтому проверка CsrfViewMiddleware не нужна.
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        request = Request(request, parsers=[JSONParser()])
+        self.request = request
+        try:
+            request.user = await authenticate(request._request)
+            return await super().dispatch(request, *args, **kwargs)
+        except Exception as exc:
+            if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+                exc.auth_header = jwt_authentication.authenticate_header(request)
+            response = exception_handler(exc, {'view': self, 'request': request})
+            if response is None:
+                raise
+            headers = {
+                name: value for name, value in response.items()
+                if name != 'Content-Type'
+            }
+            return render(response.data, response.status_code, headers)
+
+    def get_queryset(self):
+        return self.model.objects.filter(created_by=self.request.user)
+
+    def get_read_queryset(self):
+        return self.read_serializer_class.project(self.get_queryset())
+
+    async def paginate(self, queryset):
+        paginator = self.pagination_class()
+        page = self.page = await paginator.apaginate_queryset(
+            queryset, self.request, self
+        )
+        data = self.read_serializer_class(page, many=True).data
+        return render(paginator.get_paginated_data(data))
+
+
+class PointView(AsyncAPIView):
+    model = Point
+    serializer_class = PointSerializer
+    read_serializer_class = PointReadSerializer
+
+
+class PointListView(PointView):
+
+    async def get(self, request):
+        return await self.paginate(self.get_read_queryset())
+
+    async def post(self, request):
+        serializer = self.serializer_class(
+            data=request.data, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        point = await Point.objects.acreate(**serializer.validated_data)
+        return render(
+            self.serializer_class(point).data, status.HTTP_201_CREATED
+        )
+
+
+class PointDetailView(PointView):
+
+    async def get(self, request, pk):
+        row = await aget_object_or_404(self.get_read_queryset(), pk=pk)
+        return render(self.read_serializer_class(row).data)
+
+
+class PointSearchView(PointView):
+
+    def get_queryset(self):
+        return Point.objects.all()
+
+    async def get(self, request):
+        center, radius = parse_search_params(request.query_params)
+        order = parse_order_params(request.query_params)
+        queryset = order_points(
+            within_radius(self.get_read_queryset(), 'location', center, radius),
+            order,
+        )
+        response = await self.paginate(queryset)
+        record_search('points', request.query_params, len(self.page))
+        return response
+
+
+class MessageView(AsyncAPIView):
+    model = Message
+    serializer_class = MessageSerializer
+    read_serializer_class = MessageReadSerializer
+
+
+class MessageListView(MessageView):
+
+    async def get(self, request):
+        return await self.paginate(self.get_read_queryset())
+
+    async def post(self, request):
+        serializer = self.serializer_class(
+            data=request.data, context={'request': request}
+        )
+        # Проверка point_id обращается к БД через синхронный ORM.
+        await sync_to_async(serializer.is_valid)(raise_exception=True)
+        # Сообщение и счётчики точки меняются в одной транзакции.
+        message = await sync_to_async(create_message)(
+            **serializer.validated_data
+        )
+        return render(
+            self.serializer_class(message).data, status.HTTP_201_CREATED
+        )
+
+
+class MessageDetailView(MessageView):
+
+    async def get(self, request, pk):
+        row = await aget_object_or_404(self.get_read_queryset(), pk=pk)
+        return render(self.read_serializer_class(row).data)
+
+
+class MessageSearchView(MessageView):
+
+    def get_queryset(self):
+        return Message.objects.all()
+
+    async def get(self, request):
+        center, radius = parse_search_params(request.query_params)
+        text, rank = parse_text_params(request.query_params)
+        queryset = match_text(
+            within_radius(self.get_read_queryset(), 'location', center, radius),
+            text, rank, radius,
+        )
+        response = await self.paginate(queryset)
+        record_search('messages', request.query_params, len(self.page))
+        return response
@@ -0,0 +1,85 @@
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .metrics import record_auth_cache
+from .timing import timed
+
+# Ключ - строковый id: в токене user_id хранится строкой.
+_users = {}
+_lock = threading.Lock()
+
+
+def cache_settings():
+    return getattr(settings, 'JWT_USER_CACHE', {})
+
+
+def cached_user(user_id):
+    with _lock:
+        entry = _users.get(str(user_id))
+    if entry is None:
+        return None
+    user, expires_at = entry
+    if expires_at < time.monotonic():
+        evict_user(user_id)
+        return None
+    return copy.copy(user)
+
+
+def cache_user(user_id, user):
+    config = cache_settings()
+    ttl = config.get('TTL', 0)
+    if ttl <= 0:
+        return
+    with _lock:
+        if len(_users) >= config.get('MAX_ENTRIES', 10000):
+            _users.clear()
+        _users[str(user_id)] = (copy.copy(user), time.monotonic() + ttl)
+
+
+def evict_user(user_id):
+    with _lock:
+        _users.pop(str(user_id), None)
+
+
+def clear_user_cache():
+    with _lock:
+        _users.clear()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    # Пользователь токена берётся из кэша процесса, а не запросом к auth_user
+    # на каждый запрос. Изменения пользователя в этом процессе сбрасывают
+    # запись сразу (см. signals), в остальных процессах - не позже TTL.
+
+    def authenticate(self, request):
+        with timed('auth'):
+            return super().authenticate(request)
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        user = cached_user(user_id)
+        record_auth_cache(user is not None)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache_user(user_id, user)
+            return user
+
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."),
+                code='password_changed',
+            )
+        return user
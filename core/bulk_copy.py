@@ -0,0 +1,94 @@
+import csv
+import json
+import re
+
+from django.db import connection
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+FEATURES_RE = re.compile(r'"features"\s*:\s*\[')
+WHITESPACE_RE = re.compile(r'[\s,]*')
+
+
+def point_ewkt(lon, lat):
+    return f'SRID=4326;POINT({lon!r} {lat!r})'
+
+
+def copy_rows(cursor, table, columns, rows):
+    if not is_psycopg3:
+        raise RuntimeError('Для COPY нужен драйвер psycopg 3')
+    quote = connection.ops.quote_name
+    sql = 'COPY {} ({}) FROM STDIN'.format(
+        quote(table), ', '.join(quote(column) for column in columns)
+    )
+    count = 0
+    with cursor.copy(sql) as copy:
+        for row in rows:
+            copy.write_row(row)
+            count += 1
+    return count
+
+
+def feature_record(feature):
+    record = dict(feature.get('properties') or {})
+    geometry = feature.get('geometry') or {}
+    coordinates = geometry.get('coordinates')
+    if geometry.get('type') == 'Point' and coordinates:
+        record['longitude'], record['latitude'] = coordinates[:2]
+    return record
+
+
+def iter_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def iter_ndjson(stream):
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        record = json.loads(line)
+        if record.get('type') == 'Feature':
+            record = feature_record(record)
+        yield record
+
+
+def iter_geojson(stream, chunk_size=1 << 16):
+    # Потоковый разбор FeatureCollection: в памяти только текущий кусок
+    # файла, объекты из массива features декодируются по одному.
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+
+    while True:
+        match = FEATURES_RE.search(buffer)
+        if match:
+            position = match.end()
+            break
+        if eof:
+            raise ValueError('В файле нет массива features')
+        chunk = stream.read(chunk_size)
+        eof = not chunk
+        buffer = buffer[-64:] + chunk
+
+    while True:
+        position = WHITESPACE_RE.match(buffer, position).end()
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            feature, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield feature_record(feature)
+
+
+READERS = {
+    'csv': iter_csv,
+    'ndjson': iter_ndjson,
+    'geojson': iter_geojson,
+}
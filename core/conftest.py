@@ -0,0 +1,74 @@
+import pytest
+from django.contrib.auth.models import User
+from django.contrib.gis.geos import Point as GeoPoint
+from rest_framework.test import APIClient
+
+from core.models import Message, Point
+
+
+@pytest.fixture(autouse=True)
+def clear_db(request):
+    if request.node.get_closest_marker('django_db') is None:
+        return
+    Point.objects.all().delete()
+    Message.objects.all().delete()
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(username='testuser', password='test123')
+
+
+@pytest.fixture
+def another_user(db):
+    return User.objects.create_user(username='another', password='test123')
+
+
+@pytest.fixture
+def auth_client(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.fixture
+def unauth_client():
+    return APIClient()
+
+
+@pytest.fixture
+def point_amsterdam(user):
+    return Point.objects.create(
+        created_by=user,
+        name="Amsterdam Centraal",
+        location=GeoPoint(4.900225, 52.379189, srid=4326)
+    )
+
+
+@pytest.fixture
+def another_point(another_user):
+    return Point.objects.create(
+        created_by=another_user,
+        name="Чужая точка",
+        location=GeoPoint(4.895, 52.370, srid=4326)
+    )
+
+
+@pytest.fixture
+def points(user):
+    coords = [
+        ("Центр", 4.895168, 52.370216),
+        ("Аэропорт", 4.763889, 52.308056),
+        ("Берлин", 13.4050, 52.5200),
+    ]
+
+    points_list = []
+    for name, lon, lat in coords:
+        point = Point.objects.create(
+            created_by=user,
+            name=name,
+            location=GeoPoint(lon, lat, srid=4326)
+        )
+        points_list.append(point)
+
+    return points_list
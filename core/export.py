@@ -0,0 +1,87 @@
+import json
+
+from rest_framework import serializers
+
+from .search import X, Y
+
+EXPORT_CHUNK_SIZE = 2000
+CONTENT_TYPES = {
+    'geojson': 'application/geo+json',
+    'ndjson': 'application/x-ndjson',
+}
+
+datetime_field = serializers.DateTimeField()
+
+
+def feature(lon, lat, properties):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+        'properties': properties,
+    }
+
+
+def point_features(queryset):
+    rows = (
+        queryset
+        .order_by('id')
+        .annotate(lon=X('location'), lat=Y('location'))
+        .values_list('id', 'name', 'lon', 'lat', 'created_at', 'updated_at')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for point_id, name, lon, lat, created_at, updated_at in rows:
+        yield feature(lon, lat, {
+            'kind': 'point',
+            'id': point_id,
+            'name': name,
+            'created_at': datetime_field.to_representation(created_at),
+            'updated_at': datetime_field.to_representation(updated_at),
+        })
+
+
+def message_features(queryset):
+    rows = (
+        queryset
+        .order_by('id')
+        .annotate(lon=X('location'), lat=Y('location'))
+        .values_list(
+            'id', 'point_id', 'text', 'lon', 'lat', 'created_at', 'updated_at'
+        )
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for message_id, point_id, text, lon, lat, created_at, updated_at in rows:
+        yield feature(lon, lat, {
+            'kind': 'message',
+            'id': message_id,
+            'point_id': point_id,
+            'text': text,
+            'created_at': datetime_field.to_representation(created_at),
+            'updated_at': datetime_field.to_representation(updated_at),
+        })
+
+
+def encode_features(features, output):
+    # Отдаём данные кусками по EXPORT_CHUNK_SIZE объектов, чтобы не делать
+    # отдельную запись в сокет на каждую строку.
+    if output == 'geojson':
+        yield '{"type": "FeatureCollection", "features": ['
+        separator = ','
+    else:
+        separator = '\n'
+
+    prefix = ''
+    chunk = []
+    for item in features:
+        chunk.append(json.dumps(item, ensure_ascii=False))
+        if len(chunk) >= EXPORT_CHUNK_SIZE:
+            yield prefix + separator.join(chunk)
+            prefix = separator
+            chunk = []
+    if chunk:
+        yield prefix + separator.join(chunk)
+        prefix = separator
+
+    if output == 'geojson':
+        yield ']}'
+    elif prefix:
+        yield '\n'
@@ -0,0 +1,50 @@
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+DECODE = {char: value for value, char in enumerate(BASE32)}
+MAX_PRECISION = 12
+
+
+def encode(lon, lat, precision=MAX_PRECISION):
+    # Стандартный geohash, совпадает с ST_GeoHash в PostGIS: биты долготы и
+    # широты чередуются, начиная с долготы, по 5 бит на символ.
+    lon_range = [-180.0, 180.0]
+    lat_range = [-90.0, 90.0]
+    chars = []
+    value = bits = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            value = bits = 0
+    return ''.join(chars)
+
+
+def bounds(geohash):
+    # (west, south, east, north) ячейки.
+    lon_range = [-180.0, 180.0]
+    lat_range = [-90.0, 90.0]
+    even = True
+    for char in geohash:
+        value = DECODE[char]
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return lon_range[0], lat_range[0], lon_range[1], lat_range[1]
+
+
+def is_valid(prefix):
+    return len(prefix) <= MAX_PRECISION and all(char in DECODE for char in prefix)
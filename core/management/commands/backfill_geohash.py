@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+
+from core.models import GEOHASH_PRECISION, Point
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет Point.geohash через ST_GeoHash партиями по диапазонам id. '
+        'Каждая партия - отдельная транзакция, команду можно прервать и '
+        'запустить снова'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50_000)
+        parser.add_argument(
+            '--all', action='store_true',
+            help='пересчитать и уже заполненные строки',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+
+        bounds = Point.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            self.stdout.write('В базе нет точек')
+            return
+
+        condition = '' if options['all'] else "AND geohash = ''"
+        sql = (
+            f'UPDATE {Point._meta.db_table} '
+            'SET geohash = ST_GeoHash(location, %s) '
+            f'WHERE id >= %s AND id < %s {condition}'
+        )
+        started = time.perf_counter()
+        updated = 0
+        for low in range(bounds['low'], bounds['high'] + 1, options['batch_size']):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    sql, [GEOHASH_PRECISION, low, low + options['batch_size']]
+                )
+                updated += cursor.rowcount
+            self.stdout.write(f'id < {low + options["batch_size"]}: {updated} строк')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено {updated} точек за {elapsed:.1f} с'
+        ))
@@ -0,0 +1,169 @@
+import json
+import platform
+import random
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Message, Point
+
+from .bench_spatial_index import percentile
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет points/search, messages/search, список и получение точки '
+        'через полный стек Django на текущих данных: p50/p95/p99 и строк/с '
+        'для каждого радиуса и глубины страницы. Результат пишется в JSON, '
+        'который можно сравнивать между релизами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='bench-api.json')
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument(
+            '--radius', type=float, nargs='+', default=[1, 10, 100, 1000]
+        )
+        parser.add_argument(
+            '--pages', type=int, nargs='+', default=[1, 5, 20],
+            help='глубина страниц, на которых снимаются замеры',
+        )
+        parser.add_argument(
+            '--user', help='username для list/retrieve (по умолчанию - '
+                           'пользователь с наибольшим числом точек)',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        bounds = Point.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            raise CommandError('В базе нет точек, см. seed_geodata')
+
+        self.rng = random.Random(options['seed'])
+        self.pages = sorted(set(options['pages']))
+        self.user = self.bench_user(options['user'])
+        self.client = APIClient(SERVER_NAME='localhost')
+        self.client.force_authenticate(self.user)
+        self.results = []
+
+        centers = [self.random_location(bounds) for _ in range(options['queries'])]
+        for endpoint in ('points', 'messages'):
+            for radius in options['radius']:
+                self.bench_pages(
+                    f'{endpoint}/search', f'/api/{endpoint}/search/',
+                    [
+                        {'latitude': center.y, 'longitude': center.x,
+                         'radius': radius}
+                        for center in centers
+                    ],
+                    radius_km=radius,
+                )
+
+        self.bench_pages(
+            'points/list', '/api/points/', [{}] * options['queries']
+        )
+        self.bench_retrieve(options['queries'])
+
+        report = {
+            'created_at': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'search_cache': settings.SEARCH_CACHE.get('ENABLED', False),
+                'spatial_index': settings.SPATIAL_INDEX.get('ENABLED', False),
+                'points': Point.objects.count(),
+                'messages': Message.objects.count(),
+            },
+            'options': {
+                key: options[key]
+                for key in ('queries', 'radius', 'pages', 'seed')
+            },
+            'results': self.results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as stream:
+            json.dump(report, stream, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Результаты: {options['output']}"))
+
+    def bench_user(self, username):
+        if username:
+            try:
+                return User.objects.get(username=username)
+            except User.DoesNotExist:
+                raise CommandError(f'Пользователь {username} не найден') from None
+        return (
+            User.objects.annotate(points=Count('created_points'))
+            .order_by('-points', 'id')
+            .first()
+        )
+
+    def random_location(self, bounds):
+        # id в последовательности могут быть с пропусками, поэтому берём
+        # первую существующую точку начиная со случайного id.
+        start = self.rng.randint(bounds['low'], bounds['high'])
+        return (
+            Point.objects.filter(pk__gte=start)
+            .order_by('pk')
+            .values_list('location', flat=True)
+            .first()
+        )
+
+    def get(self, url, params=None):
+        started = time.perf_counter()
+        response = self.client.get(url, params)
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            raise CommandError(f'{url}: статус {response.status_code}')
+        return response.json(), elapsed
+
+    def bench_pages(self, name, url, queries, **extra):
+        timings = {page: [] for page in self.pages}
+        rows = {page: 0 for page in self.pages}
+        for params in queries:
+            data, elapsed = self.get(url, params)
+            page = 1
+            while True:
+                if page in timings:
+                    timings[page].append(elapsed)
+                    rows[page] += len(data['results'])
+                if page >= self.pages[-1] or not data['next']:
+                    break
+                data, elapsed = self.get(data['next'])
+                page += 1
+
+        for page in self.pages:
+            self.record(name, timings[page], rows[page], page=page, **extra)
+
+    def bench_retrieve(self, count):
+        ids = list(
+            Point.objects.filter(created_by=self.user)
+            .values_list('id', flat=True)[:count]
+        )
+        timings = [self.get(f'/api/points/{point_id}/')[1] for point_id in ids]
+        self.record('points/retrieve', timings, len(timings))
+
+    def record(self, name, timings, rows, **extra):
+        if not timings:
+            return
+        total = sum(timings)
+        result = {
+            'endpoint': name,
+            **extra,
+            'requests': len(timings),
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 2),
+            'p95_ms': round(percentile(timings, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 2),
+            'rows_per_s': round(rows / max(total, 1e-9), 1),
+        }
+        self.results.append(result)
+        self.stdout.write(
+            f"{name:<16} "
+            + ' '.join(f'{key}={value}' for key, value in extra.items())
+            + f" p50={result['p50_ms']} мс p95={result['p95_ms']} мс "
+            f"p99={result['p99_ms']} мс строк/с={result['rows_per_s']}"
+        )
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .bench_spatial_index import percentile
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Сервер закрыл соединение')
+    status = int(status_line.split()[1])
+
+    length, chunked, close = 0, False, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding':
+            chunked = value == 'chunked'
+        elif name == 'connection':
+            close = value == 'close'
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status, close
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест HTTP-эндпоинтов: запросы с заданной конкурентностью '
+        'по keep-alive соединениям, пропускная способность и p50/p95/p99. '
+        'Несколько URL сравниваются на одинаковой нагрузке, например один и '
+        'тот же поиск через WSGI (gunicorn) и ASGI (uvicorn).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+')
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[10, 100, 500]
+        )
+        parser.add_argument(
+            '--requests', type=int, default=2000,
+            help='число запросов на каждый URL и уровень конкурентности',
+        )
+        parser.add_argument('--user', help='username, для которого выпустить JWT')
+        parser.add_argument('--token', help='готовый access-токен')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--output', help='сохранить результаты в JSON')
+
+    def handle(self, *args, **options):
+        token = options['token']
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(
+                    f"Пользователь {options['user']} не найден"
+                ) from None
+            token = str(AccessToken.for_user(user))
+
+        self.timeout = options['timeout']
+        results = []
+        for url in options['urls']:
+            target = self.prepare(url, token)
+            for concurrency in options['concurrency']:
+                result = asyncio.run(
+                    self.run(target, concurrency, options['requests'])
+                )
+                result = {'url': url, 'concurrency': concurrency, **result}
+                results.append(result)
+                self.report(result)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(results, stream, ensure_ascii=False, indent=2)
+
+    def prepare(self, url, token):
+        parts = urlsplit(url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise CommandError(f'Поддерживаются только http:// URL: {url}')
+        target = parts.path or '/'
+        if parts.query:
+            target += f'?{parts.query}'
+        headers = [
+            f'GET {target} HTTP/1.1',
+            f'Host: {parts.netloc}',
+            'Accept: application/json',
+            'Connection: keep-alive',
+        ]
+        if token:
+            headers.append(f'Authorization: Bearer {token}')
+        request = ('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1')
+        return parts.hostname, parts.port or 80, request
+
+    async def run(self, target, concurrency, total):
+        self.remaining = total
+        self.latencies, self.statuses, self.errors = [], {}, 0
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            self.worker(*target) for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+
+        ok = len(self.latencies)
+        return {
+            'requests': ok + self.errors,
+            'errors': self.errors,
+            'statuses': {str(code): n for code, n in sorted(self.statuses.items())},
+            'seconds': round(elapsed, 3),
+            'rps': round(ok / max(elapsed, 1e-9), 1),
+            'p50_ms': self.ms(0.5),
+            'p95_ms': self.ms(0.95),
+            'p99_ms': self.ms(0.99),
+        }
+
+    async def worker(self, host, port, request):
+        reader = writer = None
+        while self.remaining > 0:
+            self.remaining -= 1
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection(host, port)
+                writer.write(request)
+                await writer.drain()
+                status, close = await asyncio.wait_for(
+                    read_response(reader), self.timeout
+                )
+            except (OSError, ValueError, asyncio.IncompleteReadError):
+                self.errors += 1
+                close = True
+            else:
+                self.latencies.append(time.perf_counter() - started)
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+            if close and writer is not None:
+                writer.close()
+                reader = writer = None
+        if writer is not None:
+            writer.close()
+
+    def ms(self, q):
+        if not self.latencies:
+            return None
+        return round(percentile(self.latencies, q) * 1000, 2)
+
+    def report(self, result):
+        self.stdout.write(
+            f"{result['url']} c={result['concurrency']:<4} "
+            f"{result['rps']:>8.1f} запр/с "
+            f"p50={result['p50_ms']} мс p95={result['p95_ms']} мс "
+            f"p99={result['p99_ms']} мс "
+            f"ошибок={result['errors']} статусы={result['statuses']}"
+        )
@@ -0,0 +1,74 @@
+import random
+import statistics
+import time
+
+from django.contrib.gis.geos import Point as GeoPoint
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Point
+from core.search import radius_m, within_radius
+from core.spatial_index import GridIndex, point_rows
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает поиск по радиусу через in-memory индекс и через PostGIS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument(
+            '--radius', type=float, nargs='+', default=[1, 10, 100, 1000]
+        )
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--cell-size', type=float, default=0.1)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rows = list(point_rows())
+        if not rows:
+            raise CommandError('В базе нет точек')
+
+        index = GridIndex(cell_size=options['cell_size'])
+        started = time.perf_counter()
+        index.load(rows)
+        self.stdout.write(
+            f"Индекс: {len(index)} точек, загрузка "
+            f"{time.perf_counter() - started:.2f} c"
+        )
+
+        rng = random.Random(options['seed'])
+        centers = [rng.choice(rows) for _ in range(options['queries'])]
+        page_size = options['page_size']
+
+        for radius in options['radius']:
+            memory_times, db_times = [], []
+            for _, lon, lat, _ in centers:
+                started = time.perf_counter()
+                index.search(lon, lat, radius_m(radius))[:page_size]
+                memory_times.append(time.perf_counter() - started)
+
+                center = GeoPoint(lon, lat, srid=4326)
+                started = time.perf_counter()
+                list(
+                    within_radius(Point.objects.all(), 'location', center, radius)
+                    .order_by('distance', 'id')
+                    .values_list('id', flat=True)[:page_size]
+                )
+                db_times.append(time.perf_counter() - started)
+
+            self.report(radius, 'memory', memory_times)
+            self.report(radius, 'postgis', db_times)
+            speedup = statistics.median(db_times) / statistics.median(memory_times)
+            self.stdout.write(f"  ускорение по медиане: x{speedup:.1f}")
+
+    def report(self, radius, name, times):
+        self.stdout.write(
+            f"{radius:>7g} км {name:<8} "
+            f"p50={percentile(times, 0.5) * 1000:8.2f} мс "
+            f"p95={percentile(times, 0.95) * 1000:8.2f} мс "
+            f"p99={percentile(times, 0.99) * 1000:8.2f} мс"
+        )
@@ -0,0 +1,214 @@
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DataError, connection, transaction
+from django.utils import timezone
+
+from core.bulk_copy import READERS, copy_rows, point_ewkt
+from core.message_stats import reconcile
+from core.models import GEOHASH_PRECISION, Message, Point
+from core.signals import rows_copied
+
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.geojson': 'geojson',
+    '.json': 'geojson',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+STAGING_TABLE = 'core_import_staging'
+# Верхние границы колонок: auth_user.id - integer, id точек - bigint.
+MAX_USER_ID = 2**31 - 1
+MAX_POINT_ID = 2**63 - 1
+
+
+def parse_id(value, max_value):
+    # Id вне диапазона колонки прошёл бы int(), но уронил бы COPY в staging
+    # DataError, поэтому такие строки пропускаются здесь. Дробные числа
+    # из JSON не округляются молча до чужого id.
+    if isinstance(value, bool | float):
+        raise ValueError(f'Недопустимый id: {value!r}')
+    number = int(value)
+    if not 1 <= number <= max_value:
+        raise ValueError(f'id вне допустимого диапазона: {value!r}')
+    return number
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоковый импорт точек или сообщений из CSV, GeoJSON FeatureCollection '
+        'или NDJSON через PostgreSQL COPY'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--model', choices=['points', 'messages'], default='points'
+        )
+        parser.add_argument('--format', choices=sorted(READERS))
+        parser.add_argument(
+            '--user',
+            help='username владельца для строк без created_by',
+        )
+        parser.add_argument('--progress-every', type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'Файл {path} не найден')
+        file_format = options['format'] or EXTENSIONS.get(path.suffix.lower())
+        if file_format is None:
+            raise CommandError('Не удалось определить формат, укажите --format')
+        if options['progress_every'] < 1:
+            raise CommandError('--progress-every должен быть не меньше 1')
+
+        self.default_user_id = None
+        if options['user']:
+            try:
+                self.default_user_id = User.objects.get(
+                    username=options['user']
+                ).pk
+            except User.DoesNotExist:
+                raise CommandError(
+                    f"Пользователь {options['user']} не найден"
+                ) from None
+
+        self.progress_every = options['progress_every']
+        self.skipped = 0
+        self.started = time.perf_counter()
+
+        importer = {
+            'points': self.import_points,
+            'messages': self.import_messages,
+        }[options['model']]
+        with open(path, encoding='utf-8-sig', newline='') as stream:
+            records = READERS[file_format](stream)
+            try:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    staged, inserted = importer(cursor, records)
+            except (ValueError, RuntimeError, DataError) as exc:
+                raise CommandError(str(exc)) from exc
+
+        elapsed = time.perf_counter() - self.started
+        self.skipped += staged - inserted
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано {inserted} строк за {elapsed:.1f} с '
+            f'({inserted / max(elapsed, 1e-9):.0f} строк/с), '
+            f'пропущено {self.skipped}'
+        ))
+        rows_copied()
+
+    def import_points(self, cursor, records):
+        cursor.execute(
+            f'CREATE TEMP TABLE {STAGING_TABLE} ('
+            'name varchar(255), location geometry(Point, 4326), '
+            'created_by_id integer) ON COMMIT DROP'
+        )
+        staged = copy_rows(
+            cursor,
+            STAGING_TABLE,
+            ('name', 'location', 'created_by_id'),
+            self.progress(self.point_rows(records)),
+        )
+        now = timezone.now()
+        cursor.execute(
+            f'INSERT INTO {Point._meta.db_table} '
+            '(name, location, geohash, created_by_id, created_at, updated_at) '
+            'SELECT s.name, s.location, ST_GeoHash(s.location, %s), '
+            's.created_by_id, %s, %s '
+            f'FROM {STAGING_TABLE} s '
+            f'JOIN {User._meta.db_table} u ON u.id = s.created_by_id',
+            [GEOHASH_PRECISION, now, now],
+        )
+        inserted = cursor.rowcount
+        cursor.execute(f'DROP TABLE {STAGING_TABLE}')
+        return staged, inserted
+
+    def import_messages(self, cursor, records):
+        cursor.execute(
+            f'CREATE TEMP TABLE {STAGING_TABLE} ('
+            'point_id bigint, text text, created_by_id integer) '
+            'ON COMMIT DROP'
+        )
+        staged = copy_rows(
+            cursor,
+            STAGING_TABLE,
+            ('point_id', 'text', 'created_by_id'),
+            self.progress(self.message_rows(records)),
+        )
+        now = timezone.now()
+        # Строки с несуществующими точками или авторами отсеиваются
+        # соединением, а не проверкой каждой строки отдельным запросом.
+        cursor.execute(
+            f'INSERT INTO {Message._meta.db_table} '
+            '(point_id, location, text, created_by_id, created_at, updated_at) '
+            f'SELECT s.point_id, p.location, s.text, s.created_by_id, %s, %s '
+            f'FROM {STAGING_TABLE} s '
+            f'JOIN {Point._meta.db_table} p ON p.id = s.point_id '
+            f'JOIN {User._meta.db_table} u ON u.id = s.created_by_id',
+            [now, now],
+        )
+        inserted = cursor.rowcount
+        # COPY обходит MessageViewSet: счётчики затронутых точек
+        # пересчитываются в той же транзакции.
+        reconcile(cursor, f'q.id IN (SELECT point_id FROM {STAGING_TABLE})')
+        cursor.execute(f'DROP TABLE {STAGING_TABLE}')
+        return staged, inserted
+
+    def owner_id(self, record):
+        value = record.get('created_by')
+        if value in (None, ''):
+            return self.default_user_id
+        return parse_id(value, MAX_USER_ID)
+
+    def point_rows(self, records):
+        for number, record in enumerate(records, 1):
+            try:
+                lat = float(record['latitude'])
+                lon = float(record['longitude'])
+                owner_id = self.owner_id(record)
+                name = (record.get('name') or '')[:255]
+            except (KeyError, TypeError, ValueError):
+                self.skip(number, 'нет координат или неверный created_by')
+                continue
+            if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+                self.skip(number, 'координаты вне допустимого диапазона')
+                continue
+            if owner_id is None:
+                self.skip(number, 'не указан created_by и --user')
+                continue
+            yield name, point_ewkt(lon, lat), owner_id
+
+    def message_rows(self, records):
+        for number, record in enumerate(records, 1):
+            try:
+                point_id = parse_id(record['point_id'], MAX_POINT_ID)
+                owner_id = self.owner_id(record)
+                text = str(record.get('text') or '').strip()
+            except (KeyError, TypeError, ValueError):
+                self.skip(number, 'нет point_id или неверный created_by')
+                continue
+            if not text or len(text) > 2000:
+                self.skip(number, 'текст пустой или длиннее 2000 символов')
+                continue
+            if owner_id is None:
+                self.skip(number, 'не указан created_by и --user')
+                continue
+            yield point_id, text, owner_id
+
+    def skip(self, number, reason):
+        self.skipped += 1
+        if self.skipped <= 20:
+            self.stderr.write(f'Запись {number} пропущена: {reason}')
+
+    def progress(self, rows):
+        for count, row in enumerate(rows, 1):
+            yield row
+            if count % self.progress_every == 0:
+                elapsed = time.perf_counter() - self.started
+                self.stdout.write(
+                    f'{count} строк, {count / max(elapsed, 1e-9):.0f} строк/с'
+                )
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+
+from core.message_stats import reconcile
+from core.models import Point
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет Point.message_count и last_message_at с таблицей сообщений '
+        'и исправляет расхождения партиями по диапазонам id. Каждая партия - '
+        'отдельная транзакция'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50_000)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+
+        bounds = Point.objects.aggregate(low=Min('id'), high=Max('id'))
+        if bounds['low'] is None:
+            self.stdout.write('В базе нет точек')
+            return
+
+        started = time.perf_counter()
+        fixed = 0
+        for low in range(bounds['low'], bounds['high'] + 1, options['batch_size']):
+            with connection.cursor() as cursor:
+                fixed += reconcile(
+                    cursor, 'q.id >= %s AND q.id < %s',
+                    [low, low + options['batch_size']],
+                )
+            self.stdout.write(f'id < {low + options["batch_size"]}: {fixed} строк')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено {fixed} точек за {elapsed:.1f} с'
+        ))
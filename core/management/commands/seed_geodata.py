@@ -0,0 +1,245 @@
+import math
+import random
+import time
+from array import array
+from datetime import UTC, date, datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core import geohash
+from core.bulk_copy import copy_rows, point_ewkt
+from core.message_stats import reconcile
+from core.models import Message, Point
+from core.signals import rows_copied
+
+# (широта, долгота, вес) крупных городов для распределения clustered
+CITIES = [
+    (55.7558, 37.6173, 10),
+    (59.9343, 30.3351, 5),
+    (54.7388, 55.9721, 2),
+    (55.7887, 49.1221, 2),
+    (52.3676, 4.9041, 3),
+    (52.5200, 13.4050, 4),
+    (48.8566, 2.3522, 5),
+    (51.5074, -0.1278, 6),
+    (40.7128, -74.0060, 8),
+    (34.0522, -118.2437, 5),
+    (35.6762, 139.6503, 9),
+    (-23.5505, -46.6333, 5),
+    (19.0760, 72.8777, 7),
+    (-33.8688, 151.2093, 3),
+    (1.3521, 103.8198, 3),
+    (64.8378, -147.7164, 1),
+    (-36.8485, 174.7633, 1),
+]
+CITY_SIGMA = 0.3
+HOTSPOT_SIGMA = 0.02
+HOTSPOT_CENTER = (52.37, 4.89)
+DATE_SPREAD = timedelta(days=365)
+DEFAULT_START = '2026-01-01'
+
+
+def wrap_lon(lon):
+    return (lon + 180) % 360 - 180
+
+
+def clamp_lat(lat):
+    return max(-90.0, min(90.0, lat))
+
+
+def uniform(rng):
+    # Равномерно по площади сферы, а не по сетке градусов.
+    lat = math.degrees(math.asin(rng.uniform(-1, 1)))
+    return rng.uniform(-180, 180), lat
+
+
+def clustered(rng):
+    lat, lon, _ = rng.choices(CITIES, weights=[c[2] for c in CITIES])[0]
+    return (
+        wrap_lon(rng.gauss(lon, CITY_SIGMA)),
+        clamp_lat(rng.gauss(lat, CITY_SIGMA)),
+    )
+
+
+def hotspot(rng, center=HOTSPOT_CENTER):
+    lat, lon = center
+    return (
+        wrap_lon(rng.gauss(lon, HOTSPOT_SIGMA)),
+        clamp_lat(rng.gauss(lat, HOTSPOT_SIGMA)),
+    )
+
+
+DISTRIBUTIONS = {
+    'uniform': uniform,
+    'clustered': clustered,
+    'hotspot': hotspot,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует воспроизводимый набор точек и сообщений для нагрузочных '
+        'тестов: равномерно по миру, вокруг городов или в одной плотной зоне. '
+        'Данные пишутся через COPY'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--points', type=int, default=100_000)
+        parser.add_argument('--messages', type=int, default=0)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument(
+            '--distribution', choices=sorted(DISTRIBUTIONS), default='clustered'
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--start', default=DEFAULT_START,
+            help='дата YYYY-MM-DD, от которой отсчитываются created_at',
+        )
+        parser.add_argument('--user-prefix', default='seed')
+        parser.add_argument('--progress-every', type=int, default=1_000_000)
+
+    def handle(self, *args, **options):
+        if options['points'] < 1 or options['users'] < 1:
+            raise CommandError('Нужна хотя бы одна точка и один пользователь')
+        if options['messages'] < 0:
+            raise CommandError('Число сообщений не может быть отрицательным')
+        if options['progress_every'] < 1:
+            raise CommandError('--progress-every должен быть не меньше 1')
+
+        try:
+            start = date.fromisoformat(str(options['start']))
+        except ValueError as exc:
+            raise CommandError(
+                f'--start должен быть датой YYYY-MM-DD: {options["start"]!r}'
+            ) from exc
+
+        self.rng = random.Random(options['seed'])
+        self.progress_every = options['progress_every']
+        # Даты отсчитываются от --start, а не от текущего времени, чтобы
+        # одинаковый --seed давал одинаковые данные при любом запуске.
+        self.start = datetime(start.year, start.month, start.day, tzinfo=UTC)
+        distribution = DISTRIBUTIONS[options['distribution']]
+
+        user_ids = self.ensure_users(options['user_prefix'], options['users'])
+        self.stdout.write(f'Пользователей: {len(user_ids)}')
+
+        self.lons, self.lats = array('d'), array('d')
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                self.seed(cursor, options, distribution, user_ids)
+        except RuntimeError as exc:
+            raise CommandError(str(exc)) from exc
+        rows_copied()
+
+    def seed(self, cursor, options, distribution, user_ids):
+        started = time.perf_counter()
+        point_ids = self.seed_points(
+            cursor, options['points'], distribution, user_ids
+        )
+        if len(point_ids) != options['points']:
+            raise CommandError(
+                'Во время генерации точки добавлялись из другого сеанса, '
+                'повторите запуск'
+            )
+        self.report('точек', len(point_ids), started)
+
+        if options['messages']:
+            started = time.perf_counter()
+            self.seed_messages(cursor, options['messages'], point_ids, user_ids)
+            self.report('сообщений', options['messages'], started)
+
+    def ensure_users(self, prefix, count):
+        usernames = [f'{prefix}{number:05d}' for number in range(count)]
+        password = make_password(None)
+        User.objects.bulk_create(
+            [User(username=username, password=password) for username in usernames],
+            ignore_conflicts=True,
+        )
+        return list(
+            User.objects.filter(username__in=usernames)
+            .order_by('username')
+            .values_list('id', flat=True)
+        )
+
+    def created_at(self):
+        return self.start + self.rng.random() * DATE_SPREAD
+
+    def seed_points(self, cursor, count, distribution, user_ids):
+        last_id = Point.objects.order_by('-id').values_list('id', flat=True).first()
+
+        def rows():
+            for number in range(count):
+                lon, lat = distribution(self.rng)
+                self.lons.append(lon)
+                self.lats.append(lat)
+                created_at = self.created_at()
+                yield (
+                    f'Точка {number}',
+                    point_ewkt(lon, lat),
+                    geohash.encode(lon, lat),
+                    self.rng.choice(user_ids),
+                    created_at,
+                    created_at,
+                )
+
+        copy_rows(
+            cursor,
+            Point._meta.db_table,
+            (
+                'name', 'location', 'geohash', 'created_by_id',
+                'created_at', 'updated_at',
+            ),
+            self.progress(rows()),
+        )
+        # COPY в одном сеансе берёт id из последовательности по порядку строк,
+        # поэтому i-й id соответствует i-й сгенерированной точке.
+        cursor.execute(
+            f'SELECT id FROM {Point._meta.db_table} WHERE id > %s ORDER BY id',
+            [last_id or 0],
+        )
+        return array('q', (row[0] for row in cursor.fetchall()))
+
+    def seed_messages(self, cursor, count, point_ids, user_ids):
+        def rows():
+            for number in range(count):
+                index = self.rng.randrange(len(point_ids))
+                created_at = self.created_at()
+                yield (
+                    point_ids[index],
+                    point_ewkt(self.lons[index], self.lats[index]),
+                    f'Сообщение {number}',
+                    self.rng.choice(user_ids),
+                    created_at,
+                    created_at,
+                )
+
+        copy_rows(
+            cursor,
+            Message._meta.db_table,
+            (
+                'point_id', 'location', 'text', 'created_by_id',
+                'created_at', 'updated_at',
+            ),
+            self.progress(rows()),
+        )
+        reconcile(cursor, 'q.id BETWEEN %s AND %s', [point_ids[0], point_ids[-1]])
+
+    def progress(self, rows):
+        started = time.perf_counter()
+        for count, row in enumerate(rows, 1):
+            yield row
+            if count % self.progress_every == 0:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{count} строк, {count / max(elapsed, 1e-9):.0f} строк/с'
+                )
+
+    def report(self, label, count, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {count} {label} за {elapsed:.1f} с '
+            f'({count / max(elapsed, 1e-9):.0f} строк/с)'
+        ))
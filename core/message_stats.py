@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Greatest
+
+from .models import Message, Point
+
+RECONCILE_SQL = f'''
+    UPDATE {Point._meta.db_table} AS p
+    SET message_count = s.message_count, last_message_at = s.last_message_at
+    FROM {Point._meta.db_table} AS q
+    CROSS JOIN LATERAL (
+        SELECT count(*) AS message_count, max(m.created_at) AS last_message_at
+        FROM {Message._meta.db_table} AS m
+        WHERE m.point_id = q.id
+    ) AS s
+    WHERE p.id = q.id AND ({{}})
+      AND (
+        p.message_count <> s.message_count
+        OR p.last_message_at IS DISTINCT FROM s.last_message_at
+      )
+'''
+
+
+def message_created(message):
+    # F-выражения: параллельные сообщения к одной точке не теряют
+    # инкременты, а GREATEST в PostgreSQL пропускает NULL.
+    Point.objects.filter(pk=message.point_id).update(
+        message_count=F('message_count') + 1,
+        last_message_at=Greatest('last_message_at', Value(message.created_at)),
+    )
+
+
+def message_deleted(message, last_message_at):
+    # Вызывается после удаления. last_message_at пересчитывается, только
+    # если удалено самое свежее сообщение точки.
+    updates = {'message_count': Greatest(F('message_count') - 1, Value(0))}
+    if last_message_at is None or message.created_at >= last_message_at:
+        updates['last_message_at'] = Subquery(
+            Message.objects.filter(point=OuterRef('pk'))
+            .order_by('-created_at')
+            .values('created_at')[:1]
+        )
+    Point.objects.filter(pk=message.point_id).update(**updates)
+
+
+def create_message(**fields):
+    with transaction.atomic():
+        message = Message.objects.create(**fields)
+        message_created(message)
+    return message
+
+
+def reconcile(cursor, condition, params=()):
+    # Пересчитывает счётчики точек, подходящих под condition (условие на q.id),
+    # и возвращает число исправленных строк.
+    cursor.execute(RECONCILE_SQL.format(condition), params)
+    return cursor.rowcount
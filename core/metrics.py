@@ -0,0 +1,319 @@
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+from .search import DEFAULT_RADIUS_KM, MAX_RADIUS_KM
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+RADIUS_BUCKETS = (
+    0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 20000,
+)
+RESULT_BUCKETS = (0, 1, 5, 10, 20, 50, 100)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+logger = logging.getLogger('core.metrics')
+
+# имя: (тип, описание, границы корзин гистограммы)
+METRICS = {
+    'geopoints_requests_total': (
+        'counter', 'Запросы по маршруту, методу и статусу', None,
+    ),
+    'geopoints_request_duration_seconds': (
+        'histogram', 'Время обработки запроса по маршруту', LATENCY_BUCKETS,
+    ),
+    'geopoints_request_db_queries': (
+        'histogram', 'SQL-запросов на один HTTP-запрос', QUERY_BUCKETS,
+    ),
+    'geopoints_search_radius_km': (
+        'histogram', 'Запрошенный радиус поиска до ограничения', RADIUS_BUCKETS,
+    ),
+    'geopoints_search_radius_clamped_total': (
+        'counter', 'Поиски, радиус которых урезан до MAX_RADIUS_KM', None,
+    ),
+    'geopoints_search_results': (
+        'histogram', 'Строк на странице результата поиска', RESULT_BUCKETS,
+    ),
+    'geopoints_search_cache_total': (
+        'counter', 'Обращения к кэшу поиска: hit, miss, bypass', None,
+    ),
+    'geopoints_auth_user_cache_total': (
+        'counter', 'Обращения к кэшу пользователей JWT: hit, miss', None,
+    ),
+    'geopoints_db_pool_size': (
+        'gauge', 'Открытых соединений в пуле процесса', None,
+    ),
+    'geopoints_db_pool_available': (
+        'gauge', 'Свободных соединений в пуле процесса', None,
+    ),
+    'geopoints_db_pool_requests_waiting': (
+        'gauge', 'Запросов, ожидающих соединение из пула', None,
+    ),
+}
+POOL_GAUGES = {
+    'geopoints_db_pool_size': 'pool_size',
+    'geopoints_db_pool_available': 'pool_available',
+    'geopoints_db_pool_requests_waiting': 'requests_waiting',
+}
+
+
+def metrics_settings():
+    return getattr(settings, 'METRICS', {})
+
+
+def enabled():
+    return metrics_settings().get('ENABLED', False)
+
+
+class Registry:
+    # Значения процесса в памяти. При нескольких воркерах каждый процесс
+    # раз в FLUSH_INTERVAL секунд сбрасывает их в DIR/<pid>.json, а /metrics
+    # складывает файлы всех процессов.
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Отдельная блокировка записи файла: потоки одного воркера
+        # (gunicorn --threads) не сбрасывают метрики одновременно.
+        self.flush_lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.flushed_at = 0.0
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+        self.maybe_flush()
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(buckets), 0.0, 0]
+            index = bisect_left(buckets, value)
+            if index < len(buckets):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+        self.maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'pid': os.getpid(),
+                'counters': [
+                    [name, list(labels), value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                'histograms': [
+                    [name, list(labels), list(buckets), total, count]
+                    for (name, labels), (buckets, total, count)
+                    in self.histograms.items()
+                ],
+                'gauges': pool_gauges(),
+            }
+
+    def maybe_flush(self):
+        directory = metrics_settings().get('DIR')
+        if not directory:
+            return
+        interval = metrics_settings().get('FLUSH_INTERVAL', 1)
+        if time.monotonic() - self.flushed_at < interval:
+            return
+        # Если файл уже пишет другой поток, этот запрос его не ждёт.
+        if not self.flush_lock.acquire(blocking=False):
+            return
+        try:
+            now = time.monotonic()
+            if now - self.flushed_at >= interval:
+                self.flushed_at = now
+                self.write(directory)
+        finally:
+            self.flush_lock.release()
+
+    def flush(self, directory=None):
+        directory = directory or metrics_settings().get('DIR')
+        if not directory:
+            return
+        with self.flush_lock:
+            self.write(directory)
+
+    def write(self, directory):
+        # Ошибка записи метрик не должна превращать ответ в 500: она только
+        # логируется, следующая попытка будет через FLUSH_INTERVAL.
+        temporary = None
+        try:
+            path = Path(directory)
+            path.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                'w', encoding='utf-8', dir=path, prefix=f'{os.getpid()}.',
+                suffix='.tmp', delete=False,
+            ) as stream:
+                temporary = stream.name
+                json.dump(self.snapshot(), stream)
+            os.replace(temporary, path / f'{os.getpid()}.json')
+        except OSError:
+            logger.exception('Не удалось записать метрики в %s', directory)
+            if temporary is not None:
+                Path(temporary).unlink(missing_ok=True)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+registry = Registry()
+atexit.register(registry.flush)
+
+
+def pool_gauges():
+    gauges = []
+    for connection in connections.all(initialized_only=True):
+        pool = getattr(connection, 'pool', None)
+        if pool is None:
+            continue
+        stats = pool.get_stats()
+        for name, key in POOL_GAUGES.items():
+            gauges.append([name, [['alias', connection.alias]], stats.get(key, 0)])
+    return gauges
+
+
+def record_request(route, method, status, seconds, queries):
+    if not enabled():
+        return
+    registry.inc(
+        'geopoints_requests_total',
+        {'route': route, 'method': method, 'status': str(status)},
+    )
+    labels = {'route': route, 'method': method}
+    registry.observe('geopoints_request_duration_seconds', labels, seconds)
+    registry.observe('geopoints_request_db_queries', labels, queries)
+
+
+def record_search(scope, query_params, results, cache=None):
+    # Радиус берётся из запроса до ограничения MAX_RADIUS_KM: параметры к
+    # этому моменту уже проверены parse_search_params.
+    if not enabled():
+        return
+    labels = {'scope': scope}
+    requested = float(query_params.get('radius', DEFAULT_RADIUS_KM))
+    registry.observe('geopoints_search_radius_km', labels, requested)
+    if requested > MAX_RADIUS_KM:
+        registry.inc('geopoints_search_radius_clamped_total', labels)
+    if results is not None:
+        registry.observe('geopoints_search_results', labels, results)
+    if cache is not None:
+        registry.inc(
+            'geopoints_search_cache_total', {'scope': scope, 'result': cache}
+        )
+
+
+def record_auth_cache(hit):
+    if not enabled():
+        return
+    registry.inc(
+        'geopoints_auth_user_cache_total', {'result': 'hit' if hit else 'miss'}
+    )
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def collect():
+    snapshots = [registry.snapshot()]
+    directory = metrics_settings().get('DIR')
+    if directory and Path(directory).is_dir():
+        own = f'{os.getpid()}.json'
+        for path in Path(directory).glob('*.json'):
+            if path.name == own:
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text(encoding='utf-8')))
+            except (OSError, ValueError):
+                continue
+
+    counters, histograms, gauges = {}, {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, total, count in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.setdefault(key, [[0] * len(buckets), 0.0, 0])
+            merged[0] = [a + b for a, b in zip(merged[0], buckets, strict=True)]
+            merged[1] += total
+            merged[2] += count
+        # Счётчики умерших воркеров остаются в сумме, а текущие значения
+        # пула имеют смысл только для живых процессов.
+        if snapshot['pid'] == os.getpid() or pid_alive(snapshot['pid']):
+            for name, labels, value in snapshot['gauges']:
+                key = (name, (*map(tuple, labels), ('pid', str(snapshot['pid']))))
+                gauges[key] = value
+    return counters, histograms, gauges
+
+
+def format_labels(labels, extra=()):
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'),
+        )
+        for name, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def render_metrics():
+    counters, histograms, gauges = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'histogram':
+            for (metric, labels), (counts, total, count) in sorted(
+                    histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, value in zip(buckets, counts, strict=True):
+                    cumulative += value
+                    lines.append(
+                        f'{name}_bucket{format_labels(labels, [("le", bound)])} '
+                        f'{cumulative}'
+                    )
+                lines.append(
+                    f'{name}_bucket{format_labels(labels, [("le", "+Inf")])} '
+                    f'{count}'
+                )
+                lines.append(f'{name}_sum{format_labels(labels)} {total}')
+                lines.append(f'{name}_count{format_labels(labels)} {count}')
+        else:
+            values = counters if kind == 'counter' else gauges
+            for (metric, labels), value in sorted(values.items()):
+                if metric == name:
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
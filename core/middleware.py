@@ -0,0 +1,236 @@
+import cProfile
+import io
+import json
+import logging
+import pstats
+import re
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.utils import timezone
+from rest_framework.exceptions import APIException
+
+from .authentication import CachedJWTAuthentication
+from .metrics import metrics_settings, record_request
+from .timing import ainstrumented, instrumented
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:
+    SamplingProfiler = None
+
+logger = logging.getLogger('core.timing')
+
+SERVER_TIMING_METRICS = ('auth', 'db', 'serialize', 'render')
+
+
+def timing_settings():
+    return getattr(settings, 'SERVER_TIMING', {})
+
+
+class ServerTimingMiddleware:
+    # Число запросов и время в БД, аутентификации, сериализации и рендеринге
+    # для каждого запроса: заголовок Server-Timing и строка JSON в лог
+    # core.timing. Запросы сверх QUERY_BUDGETS[url_name] логируются как
+    # WARNING. Работает и под WSGI, и под ASGI: асинхронные вьюхи не
+    # переводятся обратно в синхронный режим.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not timing_settings().get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with instrumented(request) as timings:
+            response = self.get_response(request)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        async with ainstrumented(request) as timings:
+            response = await self.get_response(request)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        total = time.perf_counter() - timings.started
+        response['Server-Timing'] = self.header(timings, total)
+        self.log(request, response, timings, total)
+        return response
+
+    def process_template_response(self, request, response):
+        timings = getattr(request, 'timings', None)
+        if timings is None:
+            return response
+        started = time.perf_counter()
+
+        def rendered(response):
+            timings.add('render', time.perf_counter() - started)
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def header(self, timings, total):
+        parts = [
+            f'{name};dur={timings.durations[name] * 1000:.1f}'
+            for name in SERVER_TIMING_METRICS
+            if name in timings.durations
+        ]
+        parts.append(f'queries;desc="{timings.queries}"')
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+    def log(self, request, response, timings, total):
+        match = request.resolver_match
+        url_name = match.url_name if match else None
+        budget = timing_settings().get('QUERY_BUDGETS', {}).get(url_name)
+        over_budget = budget is not None and timings.queries > budget
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'url_name': url_name,
+            'status': response.status_code,
+            'queries': timings.queries,
+            'total_ms': round(total * 1000, 1),
+            **{
+                f'{name}_ms': round(seconds * 1000, 1)
+                for name, seconds in timings.durations.items()
+            },
+        }
+        if over_budget:
+            record['query_budget'] = budget
+            logger.warning(json.dumps(record, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(record, ensure_ascii=False))
+
+
+class MetricsMiddleware:
+    # Длительность, число запросов к БД и статусы по маршрутам для /metrics.
+    # Маршрут - url_name, чтобы число рядов не зависело от id в пути.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not metrics_settings().get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        with instrumented(request) as timings:
+            response = self.get_response(request)
+        return self.finish(request, response, timings, started)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        async with ainstrumented(request) as timings:
+            response = await self.get_response(request)
+        return self.finish(request, response, timings, started)
+
+    def finish(self, request, response, timings, started):
+        match = request.resolver_match
+        route = (match and match.url_name) or 'unmatched'
+        if route != 'metrics':
+            record_request(
+                route, request.method, response.status_code,
+                time.perf_counter() - started, timings.queries,
+            )
+        return response
+
+
+def profiling_settings():
+    return getattr(settings, 'PROFILING', {})
+
+
+class ProfilingMiddleware:
+    # Профилирование отдельного запроса по заголовку X-Profile или параметру
+    # ?profile= только для staff. Профиль пишется в PROFILING DIR как
+    # {url_name}-{время}.prof (cProfile) или .html (pyinstrument, если
+    # установлен). Значение inline возвращает вместо ответа топ функций.
+
+    def __init__(self, get_response):
+        if not profiling_settings().get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.authentication = CachedJWTAuthentication()
+
+    def __call__(self, request):
+        mode = self.requested_mode(request)
+        if mode is None or not self.is_staff(request):
+            return self.get_response(request)
+
+        config = profiling_settings()
+        sampling = SamplingProfiler is not None and config.get(
+            'PROFILER', 'auto'
+        ) in ('auto', 'pyinstrument')
+        if sampling:
+            profiler = SamplingProfiler()
+            profiler.start()
+            response = self.get_response(request)
+            profiler.stop()
+        else:
+            profiler = cProfile.Profile()
+            response = profiler.runcall(self.get_response, request)
+
+        path = self.profile_path(request, '.html' if sampling else '.prof')
+        if sampling:
+            path.write_text(profiler.output_html(), encoding='utf-8')
+            report = profiler.output_text()
+        else:
+            profiler.dump_stats(path)
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats(
+                'cumulative'
+            ).print_stats(config.get('TOP', 30))
+            report = stream.getvalue()
+
+        if mode == 'inline':
+            response = HttpResponse(
+                report, content_type='text/plain; charset=utf-8',
+                status=response.status_code,
+            )
+        response['X-Profile-File'] = path.name
+        return response
+
+    def requested_mode(self, request):
+        config = profiling_settings()
+        header = 'HTTP_' + config.get('HEADER', 'X-Profile').upper().replace('-', '_')
+        value = request.META.get(header) or request.GET.get(
+            config.get('QUERY_PARAM', 'profile')
+        )
+        if not value or value.lower() in ('0', 'false', 'no'):
+            return None
+        return 'inline' if value.lower() == 'inline' else 'file'
+
+    def is_staff(self, request):
+        # DRF аутентифицирует JWT только во вьюхе, поэтому здесь токен
+        # проверяется вручную; сессия админки тоже подходит.
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+        try:
+            result = self.authentication.authenticate(request)
+        except APIException:
+            return False
+        return result is not None and result[0].is_staff
+
+    def profile_path(self, request, suffix):
+        match = request.resolver_match
+        url_name = re.sub(r'[^\w.-]', '_', (match and match.url_name) or 'unknown')
+        timestamp = timezone.now().strftime('%Y%m%dT%H%M%S%f')
+        directory = Path(profiling_settings().get('DIR', 'profiles'))
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / f'{url_name}-{timestamp}{suffix}'
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-17 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_point_location_geog_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='point',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='point_by_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['created_by', '-created_at', '-id'], name='msg_by_user_created_idx'),
+        ),
+    ]
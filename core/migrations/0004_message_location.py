@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-17 13:40
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+from django.db import migrations
+
+COPY_POINT_LOCATION = '''
+    UPDATE core_message AS m
+    SET location = p.location
+    FROM core_point AS p
+    WHERE p.id = m.point_id
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='location',
+            field=django.contrib.gis.db.models.fields.PointField(editable=False, help_text='Копия Point.location, чтобы поиск сообщений обходился без соединения с точками', null=True, srid=4326, verbose_name='Координаты точки'),
+        ),
+        migrations.RunSQL(COPY_POINT_LOCATION, migrations.RunSQL.noop),
+        migrations.AlterField(
+            model_name='message',
+            name='location',
+            field=django.contrib.gis.db.models.fields.PointField(editable=False, help_text='Копия Point.location, чтобы поиск сообщений обходился без соединения с точками', srid=4326, verbose_name='Координаты точки'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=django.contrib.postgres.indexes.GistIndex(django.db.models.functions.comparison.Cast('location', django.contrib.gis.db.models.fields.PointField(geography=True, srid=4326)), name='msg_location_geog_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_message_location'),
+    ]
+
+    # Существующие строки заполняет команда backfill_geohash: партиями,
+    # без одной длинной транзакции на всю таблицу.
+    operations = [
+        migrations.AddField(
+            model_name='point',
+            name='geohash',
+            field=models.CharField(blank=True, default='', editable=False, help_text='Ячейка geohash точки, заполняется из location при сохранении', max_length=12, verbose_name='Geohash'),
+        ),
+        migrations.AddIndex(
+            model_name='point',
+            index=models.Index(fields=['geohash'], name='point_geohash_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-17 16:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_point_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='search_vector',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.SearchVector('text', config='russian') + django.contrib.postgres.search.SearchVector('text', config='english'), help_text='tsvector текста в русской и английской конфигурациях для полнотекстового поиска', output_field=django.contrib.postgres.search.SearchVectorField(), verbose_name='Поисковый вектор'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='msg_search_vector_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-17 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_message_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='point',
+            name='message_count',
+            field=models.PositiveIntegerField(db_default=0, default=0, editable=False, help_text='Денормализованный счётчик сообщений точки, поддерживается при создании и удалении сообщений', verbose_name='Число сообщений'),
+        ),
+        migrations.AddField(
+            model_name='point',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='Дата самого свежего сообщения точки', null=True, verbose_name='Последнее сообщение'),
+        ),
+        # Начальные значения по уже существующим сообщениям.
+        migrations.RunSQL(
+            sql='''
+                UPDATE core_point AS p
+                SET message_count = s.message_count,
+                    last_message_at = s.last_message_at
+                FROM (
+                    SELECT point_id, count(*) AS message_count,
+                           max(created_at) AS last_message_at
+                    FROM core_message
+                    GROUP BY point_id
+                ) AS s
+                WHERE p.id = s.point_id
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -1,7 +1,73 @@
 from django.contrib.auth.models import User
 from django.contrib.gis.db import models
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Cast, Left
 from django.utils.translation import gettext_lazy as _
 
+from . import geohash
+
+GEOHASH_PRECISION = geohash.MAX_PRECISION
+# Поля, которые меняются только UPDATE с F-выражениями (core.message_stats).
+MESSAGE_STATS_FIELDS = ('message_count', 'last_message_at')
+
+
+def as_geography(expression):
+    return Cast(expression, models.PointField(srid=4326, geography=True))
+
+
+def set_geohash(point):
+    if point.location is not None:
+        point.geohash = geohash.encode(point.location.x, point.location.y)
+
+
+class PointQuerySet(models.QuerySet):
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for point in objs:
+            set_geohash(point)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        if 'location' in fields and 'geohash' not in fields:
+            fields = [*fields, 'geohash']
+        for point in objs:
+            set_geohash(point)
+        if 'location' not in fields:
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        with transaction.atomic(using=self.db):
+            updated = super().bulk_update(objs, fields, *args, **kwargs)
+            Message.objects.filter(point__in=objs).update(
+                location=Subquery(
+                    Point.objects.filter(pk=OuterRef('point_id'))
+                    .values('location')[:1]
+                )
+            )
+        return updated
+
+    def in_cell(self, prefix):
+        # LIKE 'prefix%' по point_geohash_idx: все точки ячейки geohash
+        # и её подъячеек.
+        if not geohash.is_valid(prefix):
+            raise ValueError(f'Недопустимый geohash: {prefix!r}')
+        return self.filter(geohash__startswith=prefix)
+
+    def cell_counts(self, precision):
+        # Число точек в ячейках geohash длины precision.
+        if not 1 <= precision <= GEOHASH_PRECISION:
+            raise ValueError(
+                f'precision должен быть от 1 до {GEOHASH_PRECISION}'
+            )
+        return (
+            self.values(cell=Left('geohash', precision))
+            .annotate(count=Count('id'))
+            .order_by('cell')
+        )
+
 
 class Point(models.Model):
     name = models.CharField(
@@ -16,6 +82,34 @@ class Point(models.Model):
         verbose_name=_("Координаты"),
         help_text=_("Долгота и широта в WGS84 (EPSG:4326)")
     )
+    geohash = models.CharField(
+        max_length=GEOHASH_PRECISION,
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name=_("Geohash"),
+        help_text=_(
+            "Ячейка geohash точки, заполняется из location при сохранении"
+        )
+    )
+    # db_default - для строк, которые вставляет COPY в обход ORM.
+    message_count = models.PositiveIntegerField(
+        default=0,
+        db_default=0,
+        editable=False,
+        verbose_name=_("Число сообщений"),
+        help_text=_(
+            "Денормализованный счётчик сообщений точки, "
+            "поддерживается при создании и удалении сообщений"
+        )
+    )
+    last_message_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("Последнее сообщение"),
+        help_text=_("Дата самого свежего сообщения точки")
+    )
     created_by = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -31,18 +125,71 @@ class Point(models.Model):
         verbose_name=_("Дата изменения")
     )
 
+    objects = PointQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Точка")
         verbose_name_plural = _("Точки")
         ordering = ["-created_at"]
         indexes = [
             models.Index(fields=["created_by"], name="point_by_user_idx"),
+            models.Index(
+                fields=["created_by", "-created_at", "-id"],
+                name="point_by_user_created_idx",
+            ),
+            GistIndex(
+                as_geography("location"),
+                name="point_location_geog_idx",
+            ),
+            models.Index(
+                fields=["geohash"],
+                name="point_geohash_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
         ]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_location()
+        return instance
+
+    def remember_location(self):
+        location = self.__dict__.get('location')
+        self._loaded_location = location.clone() if location else location
+
+    def save(self, *args, **kwargs):
+        set_geohash(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'location' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        # Сообщения хранят копию координат точки (Message.location), поэтому
+        # при переносе точки они переносятся в той же транзакции - из API,
+        # админки и любого другого save(). Точка, загруженная без location,
+        # считается перенесённой.
+        moved = not self._state.adding and (
+            update_fields is None or 'location' in update_fields
+        ) and self.location != getattr(self, '_loaded_location', None)
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            if moved:
+                Message.objects.filter(point=self).update(location=self.location)
+        self.remember_location()
+
     def __str__(self):
         name_part = self.name if self.name else f"ID {self.id}"
         return f"{name_part} ({self.location.y:.6f}, {self.location.x:.6f})"
 
+    @classmethod
+    def data_fields(cls):
+        # Поля для save(update_fields=...) при редактировании точки: счётчики
+        # сообщений меняются параллельно UPDATE с F-выражениями, и полное
+        # сохранение загруженной ранее точки затёрло бы их.
+        return [
+            field.name for field in cls._meta.concrete_fields
+            if not field.primary_key and field.name not in MESSAGE_STATS_FIELDS
+        ]
+
     @property
     def latitude(self):
         return self.location.y
@@ -62,6 +209,28 @@ class Message(models.Model):
     text = models.TextField(
         verbose_name=_("Текст сообщения")
     )
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('text', config='russian')
+            + SearchVector('text', config='english')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+        verbose_name=_("Поисковый вектор"),
+        help_text=_(
+            "tsvector текста в русской и английской конфигурациях "
+            "для полнотекстового поиска"
+        )
+    )
+    location = models.PointField(
+        srid=4326,
+        editable=False,
+        verbose_name=_("Координаты точки"),
+        help_text=_(
+            "Копия Point.location, чтобы поиск сообщений обходился "
+            "без соединения с точками"
+        )
+    )
     created_by = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -84,8 +253,22 @@ class Message(models.Model):
         indexes = [
             models.Index(fields=["point"], name="msg_point_idx"),
             models.Index(fields=["created_by"], name="msg_by_user_idx"),
+            models.Index(
+                fields=["created_by", "-created_at", "-id"],
+                name="msg_by_user_created_idx",
+            ),
+            GistIndex(
+                as_geography("location"),
+                name="msg_location_geog_idx",
+            ),
+            GinIndex(fields=["search_vector"], name="msg_search_vector_idx"),
         ]
 
+    def save(self, *args, **kwargs):
+        if self.location is None and self.point_id is not None:
+            self.location = self.point.location
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return (
             f"Сообщение {self.id} "
@@ -0,0 +1,174 @@
+import base64
+import binascii
+import bisect
+import json
+from datetime import datetime
+
+from django.contrib.gis.measure import Distance
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Некорректный курсор'
+    # Кто выдал курсор: None - запрос к БД, 'index' - in-memory индекс.
+    # Расстояния на двух путях могут различаться в последних знаках, поэтому
+    # курсор продолжает только тот путь, который его выдал.
+    source = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.order_queryset(queryset, request)
+        self.count = None
+        if self.count_requested(request):
+            self.count = queryset.count()
+        return self.get_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.order_queryset(queryset, request)
+        self.count = None
+        if self.count_requested(request):
+            self.count = await queryset.acount()
+        return self.get_page(
+            [row async for row in self.page_queryset(queryset, request)]
+        )
+
+    def order_queryset(self, queryset, request):
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        return queryset.order_by(*self.ordering)
+
+    def page_queryset(self, queryset, request):
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.keyset_filter(position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message) from None
+        return queryset[:self.page_size + 1]
+
+    def get_page(self, page):
+        self.next_position = None
+        if len(page) > self.page_size:
+            page = page[:self.page_size]
+            self.next_position = self.get_position(page[-1])
+        return page
+
+    def paginate_hits(self, hits, request):
+        # hits - уже отсортированный список пар (distance_m, id)
+        # из in-memory индекса; курсор совместим с поиском через БД.
+        self.request = request
+        self.ordering = ['distance', 'id']
+        self.source = 'index'
+        self.count = len(hits) if self.count_requested(request) else None
+
+        start = 0
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                start = bisect.bisect_right(hits, tuple(position))
+            except TypeError:
+                raise NotFound(self.invalid_cursor_message) from None
+
+        page = hits[start:start + self.page_size + 1]
+        self.next_position = None
+        if len(page) > self.page_size:
+            page = page[:self.page_size]
+            self.next_position = list(page[-1])
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_data(self, data):
+        response = {'next': self.get_next_link(), 'results': data}
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return response
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            descending = bool(ordering) and ordering[0].startswith('-')
+            ordering.append('-id' if descending else 'id')
+        return ordering
+
+    def count_requested(self, request):
+        value = request.query_params.get(self.count_query_param, '')
+        return value.lower() in ('1', 'true', 'yes')
+
+    def keyset_filter(self, position):
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{field.lstrip("-")}__{lookup}': position[index]})
+            for previous, value in zip(
+                    self.ordering[:index], position[:index], strict=True
+            ):
+                step &= Q(**{previous.lstrip('-'): value})
+            condition |= step
+        return condition
+
+    def get_position(self, obj):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = obj[name] if isinstance(obj, dict) else getattr(obj, name)
+            if isinstance(value, Distance):
+                value = value.m
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def cursor_source(self, request):
+        # 'index' или 'db' для запроса с курсором, None - для первой страницы.
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError, UnicodeEncodeError, binascii.Error):
+            return 'db'
+        if isinstance(cursor, dict) and cursor.get('s') == 'index':
+            return 'index'
+        return 'db'
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            ordering, position = cursor['o'], cursor['v']
+            source = cursor.get('s')
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError,
+                AttributeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message) from None
+        if (
+            ordering != self.ordering or len(position) != len(ordering)
+            or source != self.source
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        cursor = {'o': self.ordering, 'v': position}
+        if self.source is not None:
+            cursor['s'] = self.source
+        cursor = json.dumps(cursor)
+        encoded = base64.urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position)
@@ -0,0 +1,495 @@
+import math
+from datetime import UTC, datetime
+
+from django.contrib.gis.db import models
+from django.contrib.gis.db.models import Collect
+from django.contrib.gis.db.models.functions import Centroid, Distance, SnapToGrid
+from django.contrib.gis.geos import Point as GeoPoint
+from django.contrib.gis.geos import Polygon
+from django.contrib.gis.measure import D
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import (
+    Aggregate,
+    BigIntegerField,
+    Count,
+    F,
+    FloatField,
+    Func,
+    Q,
+    Value,
+)
+from django.db.models.functions import Cast, Coalesce
+from rest_framework import serializers
+
+from .models import Point, as_geography
+
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 1000
+
+# Граница круга включительная с запасом: расстояния в PostGIS и в
+# in-memory индексе расходятся на доли миллиметра, и точка на самой
+# границе должна попадать в выдачу на обоих путях.
+DISTANCE_TOLERANCE_M = 0.001
+
+DEFAULT_NEAREST_K = 20
+MAX_NEAREST_K = 100
+# <-> на geography считает расстояние по сфере, а не по эллипсоиду,
+# поэтому берём кандидатов с запасом и досортировываем точным расстоянием.
+NEAREST_CANDIDATES_FACTOR = 2
+
+MAX_TEXT_QUERY_LENGTH = 200
+TEXT_RANKINGS = ('relevance', 'distance', 'blend')
+TEXT_CONFIGS = ('russian', 'english')
+# В режиме blend релевантность на границе радиуса уменьшается вдвое.
+BLEND_DISTANCE_WEIGHT = 0.5
+
+# Порядок points/search: ключи сортировки, последним идёт id.
+POINT_ORDERINGS = {
+    'distance': ('distance',),
+    'message_count': ('message_count', 'distance'),
+    '-message_count': ('-message_count', 'distance'),
+    'last_message_at': ('last_activity', 'distance'),
+    '-last_message_at': ('-last_activity', 'distance'),
+}
+# Точки без сообщений сортируются как самые старые: курсор не умеет NULL.
+NO_ACTIVITY = datetime(1970, 1, 1, tzinfo=UTC)
+
+MAX_BATCH_CENTERS = 200
+DEFAULT_BATCH_LIMIT = 100
+MAX_BATCH_LIMIT = 500
+# С unique на все центры вместе выбирается не больше стольких кандидатов
+# (но у каждого центра не меньше limit + 1).
+MAX_UNIQUE_CANDIDATES = 20_000
+
+DEFAULT_BBOX_LIMIT = 1000
+MAX_BBOX_LIMIT = 10_000
+
+MAX_CLUSTER_ZOOM = 20
+# Ячейка сетки - четверть тайла 256 px, то есть около 64 px на экране.
+CLUSTER_CELLS_PER_TILE = 4
+CLUSTER_SAMPLE_SIZE = 5
+MAX_CLUSTER_CELLS = 10_000
+
+
+class X(Func):
+    function = 'ST_X'
+    output_field = FloatField()
+
+
+class Y(Func):
+    function = 'ST_Y'
+    output_field = FloatField()
+
+
+class KNNDistance(Func):
+    arg_joiner = ' <-> '
+    template = '(%(expressions)s)'
+    output_field = FloatField()
+
+
+class SampleIds(Aggregate):
+    # Первые limit id группы по возрастанию: array_agg(id ORDER BY id)[1:limit]
+    function = 'ARRAY_AGG'
+    template = (
+        '(%(function)s(%(expressions)s ORDER BY %(expressions)s))[1:%(limit)d]'
+    )
+    output_field = ArrayField(BigIntegerField())
+
+    def __init__(self, expression, limit, **extra):
+        super().__init__(expression, limit=int(limit), **extra)
+
+
+def parse_search_params(query_params):
+    try:
+        lat = float(query_params['latitude'])
+        lon = float(query_params['longitude'])
+        radius = float(query_params.get('radius', DEFAULT_RADIUS_KM))
+    except (KeyError, ValueError, TypeError):
+        raise serializers.ValidationError(
+            {
+                "detail": (
+                    "Обязательные параметры: latitude, longitude, radius (числа)"
+                )
+            }
+        ) from None
+
+    if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+        raise serializers.ValidationError(
+            {"detail": "Недопустимые значения широты или долготы"}
+        )
+
+    if not radius > 0:
+        raise serializers.ValidationError(
+            {"detail": "Радиус должен быть больше 0 км"}
+        )
+
+    return GeoPoint(lon, lat, srid=4326), min(radius, MAX_RADIUS_KM)
+
+
+def parse_text_params(query_params):
+    text = query_params.get('q', '').strip()
+    rank = query_params.get('rank') or ('relevance' if text else 'distance')
+
+    if len(text) > MAX_TEXT_QUERY_LENGTH:
+        raise serializers.ValidationError(
+            {"detail": f"q не длиннее {MAX_TEXT_QUERY_LENGTH} символов"}
+        )
+
+    if rank not in TEXT_RANKINGS:
+        raise serializers.ValidationError(
+            {"detail": "Параметр rank: relevance, distance или blend"}
+        )
+
+    if rank != 'distance' and not text:
+        raise serializers.ValidationError(
+            {"detail": f"Для rank={rank} нужен параметр q"}
+        )
+
+    return text, rank
+
+
+def parse_order_params(query_params):
+    order = query_params.get('order') or 'distance'
+    if order not in POINT_ORDERINGS:
+        raise serializers.ValidationError(
+            {"detail": f"Параметр order: {', '.join(POINT_ORDERINGS)}"}
+        )
+    return order
+
+
+def parse_nearest_params(query_params):
+    try:
+        lat = float(query_params['latitude'])
+        lon = float(query_params['longitude'])
+        k = int(query_params.get('k', DEFAULT_NEAREST_K))
+    except (KeyError, ValueError, TypeError):
+        raise serializers.ValidationError(
+            {"detail": "Обязательные параметры: latitude, longitude (числа), k"}
+        ) from None
+
+    if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
+        raise serializers.ValidationError(
+            {"detail": "Недопустимые значения широты или долготы"}
+        )
+
+    if not (1 <= k <= MAX_NEAREST_K):
+        raise serializers.ValidationError(
+            {"detail": f"k должно быть от 1 до {MAX_NEAREST_K}"}
+        )
+
+    return GeoPoint(lon, lat, srid=4326), k
+
+
+def parse_batch_params(data):
+    centers = data.get('centers') if isinstance(data, dict) else None
+    if not isinstance(centers, list) or not centers:
+        raise serializers.ValidationError(
+            {"detail": "Ожидается непустой список centers"}
+        )
+    if len(centers) > MAX_BATCH_CENTERS:
+        raise serializers.ValidationError(
+            {"detail": f"Не более {MAX_BATCH_CENTERS} центров за запрос"}
+        )
+
+    parsed = []
+    for index, item in enumerate(centers):
+        if not isinstance(item, dict):
+            raise serializers.ValidationError(
+                {"index": index, "detail": "Центр - объект с latitude и longitude"}
+            )
+        try:
+            parsed.append(parse_search_params(item))
+        except serializers.ValidationError as exc:
+            raise serializers.ValidationError(
+                {"index": index, **exc.detail}
+            ) from None
+
+    limit = data.get('limit', DEFAULT_BATCH_LIMIT)
+    if (
+        not isinstance(limit, int) or isinstance(limit, bool)
+        or not 1 <= limit <= MAX_BATCH_LIMIT
+    ):
+        raise serializers.ValidationError(
+            {"detail": f"limit должен быть целым от 1 до {MAX_BATCH_LIMIT}"}
+        )
+
+    unique = data.get('unique', False)
+    if not isinstance(unique, bool):
+        raise serializers.ValidationError(
+            {"detail": "unique должен быть true или false"}
+        )
+
+    return parsed, limit, unique
+
+
+def parse_bbox(query_params, wrap=False):
+    # wrap=True разрешает west > east: bbox пересекает антимеридиан.
+    try:
+        west, south, east, north = (
+            float(value) for value in query_params['bbox'].split(',')
+        )
+    except (KeyError, ValueError, TypeError, AttributeError):
+        raise serializers.ValidationError(
+            {"detail": "Параметр bbox: west,south,east,north (градусы)"}
+        ) from None
+
+    if not (
+        -180 <= west <= 180 and -180 <= east <= 180
+        and (west < east or wrap and west > east)
+        and -90 <= south < north <= 90
+    ):
+        raise serializers.ValidationError(
+            {"detail": "Недопустимые границы bbox"}
+        )
+
+    return west, south, east, north
+
+
+def parse_bbox_params(query_params):
+    bbox = parse_bbox(query_params, wrap=True)
+    try:
+        limit = int(query_params.get('limit', DEFAULT_BBOX_LIMIT))
+    except (ValueError, TypeError):
+        raise serializers.ValidationError(
+            {"detail": "limit должен быть целым числом"}
+        ) from None
+
+    if not (1 <= limit <= MAX_BBOX_LIMIT):
+        raise serializers.ValidationError(
+            {"detail": f"limit должен быть от 1 до {MAX_BBOX_LIMIT}"}
+        )
+
+    return bbox, limit
+
+
+def parse_cluster_params(query_params):
+    bbox = parse_bbox(query_params)
+    try:
+        zoom = int(query_params['zoom'])
+    except (KeyError, ValueError, TypeError):
+        raise serializers.ValidationError(
+            {"detail": "Обязательные параметры: bbox, zoom (целое)"}
+        ) from None
+
+    if not (0 <= zoom <= MAX_CLUSTER_ZOOM):
+        raise serializers.ValidationError(
+            {"detail": f"zoom должен быть от 0 до {MAX_CLUSTER_ZOOM}"}
+        )
+
+    cell_size = 360 / (2 ** zoom * CLUSTER_CELLS_PER_TILE)
+    west, south, east, north = bbox
+    cells = (
+        math.ceil((east - west) / cell_size)
+        * math.ceil((north - south) / cell_size)
+    )
+    if cells > MAX_CLUSTER_CELLS:
+        raise serializers.ValidationError(
+            {"detail": "Слишком большой bbox для этого zoom"}
+        )
+
+    return bbox, zoom, cell_size
+
+
+def radius_m(radius_km):
+    return radius_km * 1000 + DISTANCE_TOLERANCE_M
+
+
+def within_radius(queryset, field, center, radius_km):
+    # ST_DWithin по geography использует функциональный GiST-индекс
+    # point_location_geog_idx, а точное расстояние считается только для
+    # строк, прошедших фильтр.
+    return (
+        queryset
+        .alias(geog=as_geography(field))
+        .filter(geog__dwithin=(center, D(m=radius_m(radius_km))))
+        .annotate(distance=Distance('geog', center))
+    )
+
+
+def match_text(queryset, text, rank, radius_km):
+    # queryset уже отфильтрован within_radius. Запрос разбирается в обеих
+    # конфигурациях, как и search_vector, а планировщик сам выбирает между
+    # GIN-индексом по тексту и GiST-индексом по координатам.
+    if not text:
+        return queryset.order_by('distance', 'id')
+
+    query = SearchQuery(text, config=TEXT_CONFIGS[0], search_type='websearch')
+    for config in TEXT_CONFIGS[1:]:
+        query |= SearchQuery(text, config=config, search_type='websearch')
+    queryset = queryset.filter(search_vector=query)
+    if rank == 'distance':
+        return queryset.order_by('distance', 'id')
+
+    queryset = queryset.annotate(rank=SearchRank(F('search_vector'), query))
+    if rank == 'relevance':
+        return queryset.order_by('-rank', 'id')
+
+    return queryset.annotate(
+        score=F('rank') * (
+            1 - BLEND_DISTANCE_WEIGHT
+            * Cast('distance', FloatField()) / (radius_km * 1000)
+        )
+    ).order_by('-score', 'id')
+
+
+def order_points(queryset, order):
+    # queryset уже отфильтрован within_radius. При равных счётчиках ближние
+    # точки идут раньше, id делает порядок строгим для курсора.
+    ordering = POINT_ORDERINGS[order]
+    if any(field.lstrip('-') == 'last_activity' for field in ordering):
+        queryset = queryset.annotate(
+            last_activity=Coalesce('last_message_at', Value(NO_ACTIVITY))
+        )
+    return queryset.order_by(*ordering, 'id')
+
+
+def batch_within_radius(centers, limit, unique=False):
+    # Все центры одним запросом: список VALUES и LATERAL-подзапрос, который
+    # для каждого центра идёт по point_location_geog_idx, как within_radius,
+    # и останавливается на limit + 1 строке. Колонки совпадают с
+    # PointReadSerializer.project, поэтому второй запрос за полями не нужен.
+    # Возвращает группы строк по центрам (не больше limit) и флаги truncated.
+    #
+    # С unique точка, найденная у нескольких центров, остаётся только у
+    # ближайшего (при равном расстоянии - у первого по списку). Это делается
+    # в SQL через DISTINCT ON до ограничения limit, поэтому у центра не
+    # пропадают точки, отданные соседу, а truncated считается по уже
+    # уникальным строкам. Кандидатов у центра не больше candidates, чтобы
+    # 200 кругов по 1000 км не читали всю таблицу; центр, упёршийся в это
+    # ограничение, помечается truncated.
+    values = ', '.join(
+        ['(%s, ST_SetSRID(ST_MakePoint(%s, %s), 4326)::geography, %s::float8)']
+        * len(centers)
+    )
+    params = [
+        value
+        for index, (center, radius) in enumerate(centers)
+        for value in (index, center.x, center.y, radius_m(radius))
+    ]
+    hits = f'''
+        SELECT c.center_index, hit.*
+        FROM (VALUES {values}) AS c(center_index, center, radius)
+        CROSS JOIN LATERAL (
+            SELECT p.id, p.name, p.created_at, p.updated_at,
+                   p.message_count, p.last_message_at,
+                   ST_X(p.location) AS lon, ST_Y(p.location) AS lat,
+                   ST_Distance(p.location::geography(POINT, 4326), c.center)
+                       AS distance
+            FROM {Point._meta.db_table} AS p
+            WHERE ST_DWithin(
+                p.location::geography(POINT, 4326), c.center, c.radius
+            )
+            ORDER BY distance, p.id
+            LIMIT %s
+        ) AS hit
+    '''
+    if unique:
+        candidates = max(limit + 1, MAX_UNIQUE_CANDIDATES // len(centers))
+        sql = f'''
+            WITH hits AS ({hits}),
+            counts AS (
+                SELECT center_index, count(*) >= %s AS capped
+                FROM hits
+                GROUP BY center_index
+            ),
+            nearest AS (
+                SELECT DISTINCT ON (id) *
+                FROM hits
+                ORDER BY id, distance, center_index
+            ),
+            ranked AS (
+                SELECT nearest.*, row_number() OVER (
+                    PARTITION BY center_index ORDER BY distance, id
+                ) AS center_rank
+                FROM nearest
+            )
+            SELECT * FROM counts
+            LEFT JOIN (
+                SELECT * FROM ranked WHERE center_rank <= %s
+            ) AS top USING (center_index)
+            ORDER BY center_index, distance, id
+        '''
+        params += [candidates, candidates, limit + 1]
+    else:
+        sql = f'{hits} ORDER BY c.center_index, hit.distance, hit.id'
+        params.append(limit + 1)
+
+    groups = [[] for _ in centers]
+    truncated = [False for _ in centers]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column.name for column in cursor.description]
+        for values in cursor.fetchall():
+            row = dict(zip(columns, values, strict=True))
+            index = row.pop('center_index')
+            if row.pop('capped', False):
+                truncated[index] = True
+            row.pop('center_rank', None)
+            # Центр, все кандидаты которого достались соседям.
+            if row['id'] is None:
+                continue
+            row['distance'] = D(m=row['distance'])
+            groups[index].append(row)
+    for index, rows in enumerate(groups):
+        truncated[index] = truncated[index] or len(rows) > limit
+        groups[index] = rows[:limit]
+    return groups, truncated
+
+
+def within_bbox(queryset, field, bbox, limit):
+    # && по GiST-индексу геометрии без расчёта расстояний. Bbox через
+    # антимеридиан - две части по разные стороны от него, объединённые OR.
+    # Сортировка не задаётся: PostgreSQL останавливается на limit + 1 строке,
+    # лишняя строка только показывает, что результат обрезан.
+    west, south, east, north = bbox
+    parts = (
+        [bbox] if west < east
+        else [(west, south, 180, north), (-180, south, east, north)]
+    )
+    condition = Q()
+    for part in parts:
+        envelope = Polygon.from_bbox(part)
+        envelope.srid = 4326
+        condition |= Q(**{f'{field}__bboverlaps': envelope})
+    return queryset.filter(condition).order_by()[:limit + 1]
+
+
+def k_nearest(queryset, field, center, k):
+    # ORDER BY geog <-> center обходит GiST-индекс в порядке близости
+    # и останавливается после LIMIT, не зависимо от плотности точек.
+    knn = KNNDistance(
+        as_geography(field),
+        Value(center, output_field=models.PointField(srid=4326, geography=True)),
+    )
+    candidates = (
+        queryset.order_by(knn).values('pk')[:k * NEAREST_CANDIDATES_FACTOR]
+    )
+    return (
+        queryset
+        .filter(pk__in=candidates)
+        .alias(geog=as_geography(field))
+        .annotate(distance=Distance('geog', center))
+        .order_by('distance', 'id')[:k]
+    )
+
+
+def clusters(queryset, field, bbox, cell_size):
+    # && по bbox идёт по GiST-индексу геометрии, точки группируются по
+    # ячейкам ST_SnapToGrid, и из базы приходит по строке на ячейку.
+    envelope = Polygon.from_bbox(bbox)
+    envelope.srid = 4326
+    return (
+        queryset
+        .filter(**{f'{field}__bboverlaps': envelope})
+        .annotate(cell=SnapToGrid(field, cell_size))
+        .values('cell')
+        .annotate(
+            count=Count('id'),
+            center=Centroid(Collect(field)),
+            ids=SampleIds('id', CLUSTER_SAMPLE_SIZE),
+        )
+        .values('count', 'center', 'ids')
+        .order_by('-count')
+    )
@@ -0,0 +1,135 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.gis.geos import Point as GeoPoint
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from .metrics import record_search
+from .spatial_index import cell_of, covering_cells
+
+GENERATION_KEY = 'search-gen:{}:{}'
+SEARCH_PARAMS = ('latitude', 'longitude', 'radius')
+
+
+def cache_settings():
+    return getattr(settings, 'SEARCH_CACHE', {})
+
+
+def get_cache():
+    return caches[cache_settings().get('ALIAS', 'default')]
+
+
+def quantize(center, radius, config):
+    # Центр округляется до PRECISION знаков, радиус - до шага RADIUS_STEP км,
+    # чтобы запросы с дрожащими GPS-координатами попадали в одну запись.
+    # Поиск выполняется от округлённых значений, они возвращаются в
+    # заголовках X-Search-Center и X-Search-Radius.
+    precision = config.get('PRECISION', 3)
+    step = config.get('RADIUS_STEP', 0.5)
+    lon = round(center.x, precision)
+    lat = round(center.y, precision)
+    radius = max(step, round(radius / step) * step)
+    return GeoPoint(lon, lat, srid=4326), radius
+
+
+def generation_keys(center, radius, config):
+    cell_size = config.get('CELL_SIZE', 1.0)
+    columns, rows = covering_cells(center.x, center.y, radius * 1000, cell_size)
+    if len(columns) * len(rows) > config.get('MAX_CELLS', 400):
+        return None
+    return [
+        GENERATION_KEY.format(column, row)
+        for column in columns
+        for row in rows
+    ]
+
+
+def read_generations(cache, keys):
+    generations = cache.get_many(keys)
+    missing = [key for key in keys if key not in generations]
+    if missing:
+        # Счётчик, вытесненный из кэша, начинается заново с текущего времени,
+        # иначе после вытеснения снова совпал бы ключ устаревшей страницы.
+        initial = time.time_ns()
+        for key in missing:
+            cache.add(key, initial, timeout=None)
+        generations.update(cache.get_many(missing))
+    return [str(generations.get(key, '')) for key in keys]
+
+
+def search_key(request, scope, center, radius, config):
+    keys = generation_keys(center, radius, config)
+    if keys is None:
+        return None
+    generations = read_generations(get_cache(), keys)
+    extra = sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        if name not in SEARCH_PARAMS
+        for value in values
+    )
+    digest = hashlib.md5(
+        repr((generations, extra)).encode('utf-8'),
+        usedforsecurity=False,
+    ).hexdigest()
+    return f'search:{scope}:{center.y!r}:{center.x!r}:{radius!r}:{digest}'
+
+
+def cached_search(request, scope, center, radius, compute):
+    response, result = lookup(request, scope, center, radius, compute)
+    results = None
+    if response.status_code == 200:
+        results = len(response.data['results'])
+    record_search(scope, request.query_params, results, result)
+    return response
+
+
+def lookup(request, scope, center, radius, compute):
+    config = cache_settings()
+    if not config.get('ENABLED'):
+        return compute(center, radius), None
+
+    center, radius = quantize(center, radius, config)
+    headers = {
+        'X-Search-Center': f'{center.y},{center.x}',
+        'X-Search-Radius': f'{radius}',
+    }
+    key = search_key(request, scope, center, radius, config)
+    if key is None:
+        response, result = compute(center, radius), 'bypass'
+    else:
+        cache = get_cache()
+        data = cache.get(key)
+        if data is not None:
+            return Response(data, headers={**headers, 'X-Cache': 'HIT'}), 'hit'
+
+        response, result = compute(center, radius), 'miss'
+        if response.status_code == 200:
+            cache.set(key, response.data, config.get('TIMEOUT', 60))
+        response['X-Cache'] = 'MISS'
+    for name, value in headers.items():
+        response[name] = value
+    return response, result
+
+
+def bump_generations(locations):
+    config = cache_settings()
+    if not config.get('ENABLED'):
+        return
+    cell_size = config.get('CELL_SIZE', 1.0)
+    keys = {
+        GENERATION_KEY.format(*cell_of(location.x, location.y, cell_size))
+        for location in locations
+        if location is not None
+    }
+    bump_keys(get_cache(), keys)
+
+
+def bump_keys(cache, keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
@@ -1,11 +1,58 @@
+from django.conf import settings
 from django.contrib.gis.geos import Point as GeoPoint
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
 from rest_framework import serializers
 
 from .models import Message
 from .models import Point as PointModel
+from .search import X, Y
+from .timing import TimedDataMixin
 
+datetime_field = serializers.DateTimeField()
 
-class PointSerializer(serializers.ModelSerializer):
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
+
+
+class PointListSerializer(TimedListSerializer):
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError(
+                {"detail": "Ожидается список точек"}
+            )
+        if not data:
+            raise serializers.ValidationError({"detail": "Список точек пуст"})
+        max_items = settings.POINTS_BULK['MAX_ITEMS']
+        if len(data) > max_items:
+            raise serializers.ValidationError(
+                {"detail": f"За один запрос можно создать не более {max_items} точек"}
+            )
+
+        # Ошибочные элементы не прерывают пачку: их ошибки копятся
+        # в item_errors, а в validated_data попадают только валидные.
+        self.item_errors = []
+        self.valid_indexes = []
+        validated = []
+        for index, item in enumerate(data):
+            try:
+                validated.append(self.child.run_validation(item))
+            except serializers.ValidationError as exc:
+                self.item_errors.append({'index': index, 'errors': exc.detail})
+            else:
+                self.valid_indexes.append(index)
+        return validated
+
+    def create(self, validated_data):
+        points = [self.child.Meta.model(**attrs) for attrs in validated_data]
+        with transaction.atomic():
+            return self.child.Meta.model.objects.bulk_create(
+                points, batch_size=settings.POINTS_BULK['BATCH_SIZE']
+            )
+
+
+class PointSerializer(TimedDataMixin, serializers.ModelSerializer):
     latitude = serializers.FloatField(
         write_only=True,
         required=False,
@@ -33,12 +80,16 @@ class PointSerializer(serializers.ModelSerializer):
         model = PointModel
         fields = [
             'id', 'name', 'latitude', 'longitude', 'created_by',
-            'created_at', 'updated_at', 'distance_km'
+            'created_at', 'updated_at', 'message_count', 'last_message_at',
+            'distance_km'
         ]
+        list_serializer_class = PointListSerializer
         read_only_fields = ['id',
                             'created_by',
                             'created_at',
                             'updated_at',
+                            'message_count',
+                            'last_message_at',
                             'distance_km']
         extra_kwargs = {
             'name': {
@@ -94,6 +145,13 @@ class PointSerializer(serializers.ModelSerializer):
 
         return attrs
 
+    def update(self, instance, validated_data):
+        # Сообщения переносит Point.save, если изменился location.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=PointModel.data_fields())
+        return instance
+
     def to_representation(self, instance):
         ret = super().to_representation(instance)
         if instance.location:
@@ -108,7 +166,7 @@ class PointSerializer(serializers.ModelSerializer):
         return None
 
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(TimedDataMixin, serializers.ModelSerializer):
     point_id = serializers.PrimaryKeyRelatedField(
         queryset=PointModel.objects.all(),
         source='point',
@@ -124,6 +182,7 @@ class MessageSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Message
+        list_serializer_class = TimedListSerializer
         fields = [
             'id',
             'point_id',
@@ -189,3 +248,79 @@ class MessageSerializer(serializers.ModelSerializer):
         ret = super().to_representation(instance)
         ret.pop('created_by', None)
         return ret
+
+
+class PointReadSerializer(TimedDataMixin, serializers.BaseSerializer):
+    # Быстрое чтение строк из values(): без модели и GEOS, координаты
+    # приходят из ST_X/ST_Y. Вывод совпадает с PointSerializer побайтно.
+
+    class Meta:
+        list_serializer_class = TimedListSerializer
+
+    @staticmethod
+    def project(queryset):
+        return queryset.annotate(
+            lon=X('location'), lat=Y('location')
+        ).values(
+            'id', 'name', 'created_at', 'updated_at', 'message_count',
+            'last_message_at', 'lon', 'lat',
+        )
+
+    def to_representation(self, row):
+        distance = row.get('distance')
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'created_at': datetime_field.to_representation(row['created_at']),
+            'updated_at': datetime_field.to_representation(row['updated_at']),
+            'message_count': row['message_count'],
+            'last_message_at': datetime_field.to_representation(
+                row['last_message_at']
+            ),
+            'distance_km': (
+                round(distance.km, 2) if distance is not None else None
+            ),
+            'latitude': round(row['lat'], 6),
+            'longitude': round(row['lon'], 6),
+        }
+
+
+class MessageReadSerializer(TimedDataMixin, serializers.BaseSerializer):
+    # То же для сообщений: совпадает с выводом MessageSerializer.
+    # Координаты берутся из Message.location, а имя точки — подзапросом,
+    # который PostgreSQL вычисляет уже после LIMIT, только для строк страницы.
+
+    class Meta:
+        list_serializer_class = TimedListSerializer
+
+    @staticmethod
+    def project(queryset):
+        return queryset.annotate(
+            lon=X('location'),
+            lat=Y('location'),
+            point_name=Subquery(
+                PointModel.objects.filter(pk=OuterRef('point_id')).values('name')
+            ),
+        ).values(
+            'id', 'point_id', 'point_name', 'text', 'created_at', 'updated_at',
+            'lon', 'lat',
+        )
+
+    def to_representation(self, row):
+        distance = row.get('distance')
+        point_id = row['point_id']
+        return {
+            'id': row['id'],
+            'point': {
+                'id': point_id,
+                'name': row['point_name'] or f"Точка #{point_id}",
+                'latitude': round(row['lat'], 6),
+                'longitude': round(row['lon'], 6),
+            },
+            'text': row['text'],
+            'created_at': datetime_field.to_representation(row['created_at']),
+            'updated_at': datetime_field.to_representation(row['updated_at']),
+            'point_distance_km': (
+                round(distance.km, 2) if distance is not None else None
+            ),
+        }
@@ -0,0 +1,135 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .authentication import evict_user
+from .models import Message, Point
+from .search_cache import bump_generations, cache_settings, get_cache
+from .spatial_index import loaded_spatial_index, reset_spatial_index
+from .tiles import bump_all_tiles, bump_tiles, tile_settings
+
+
+def bump_on_commit(*locations):
+    transaction.on_commit(lambda: bump_generations(locations))
+
+
+def point_caches_enabled():
+    return cache_settings().get('ENABLED') or tile_settings().get('ENABLED')
+
+
+def bump_points_on_commit(*locations):
+    # Точки есть и в страницах поиска, и в векторных тайлах.
+    def bump():
+        bump_generations(locations)
+        bump_tiles(locations)
+
+    transaction.on_commit(bump)
+
+
+def points_bulk_created(points):
+    # bulk_create не отправляет post_save, поэтому кэш поиска и
+    # in-memory индекс обновляются здесь одним вызовом на всю пачку.
+    # Тайлы сбрасываются общим поколением: счётчики каждого тайла на
+    # каждом зуме для тысяч точек - тысячи incr.
+    if point_caches_enabled():
+        locations = [point.location for point in points]
+
+        def bump():
+            bump_generations(locations)
+            bump_all_tiles()
+
+        transaction.on_commit(bump)
+
+    index = loaded_spatial_index()
+    if index is None:
+        return
+    rows = [
+        (point.pk, point.location.x, point.location.y, point.created_by_id)
+        for point in points
+    ]
+
+    def add_rows():
+        for row in rows:
+            index.add(*row)
+
+    transaction.on_commit(add_rows)
+
+
+def rows_copied():
+    # COPY не отправляет сигналы моделей: сбрасываем кэши поиска и тайлов,
+    # а in-memory индексы процессов перечитаются по SPATIAL_INDEX MAX_AGE.
+    if cache_settings().get('ENABLED'):
+        get_cache().clear()
+    bump_all_tiles()
+    reset_spatial_index()
+
+
+@receiver(pre_save, sender=Point)
+def remember_previous_location(sender, instance, **kwargs):
+    if not point_caches_enabled() or instance._state.adding:
+        return
+    instance._previous_location = (
+        Point.objects.filter(pk=instance.pk)
+        .values_list('location', flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Point)
+def index_saved_point(sender, instance, **kwargs):
+    if point_caches_enabled():
+        bump_points_on_commit(
+            instance.location,
+            getattr(instance, '_previous_location', None),
+        )
+
+    index = loaded_spatial_index()
+    if index is None:
+        return
+    row = (
+        instance.pk,
+        instance.location.x,
+        instance.location.y,
+        instance.created_by_id,
+    )
+    transaction.on_commit(lambda: index.add(*row))
+
+
+@receiver(post_delete, sender=Point)
+def unindex_deleted_point(sender, instance, **kwargs):
+    if point_caches_enabled():
+        bump_points_on_commit(instance.location)
+
+    index = loaded_spatial_index()
+    if index is None:
+        return
+    point_id = instance.pk
+    transaction.on_commit(lambda: index.remove(point_id))
+
+
+@receiver(post_save, sender=Message)
+def invalidate_saved_message(sender, instance, **kwargs):
+    if cache_settings().get('ENABLED'):
+        bump_on_commit(instance.location)
+
+
+@receiver(post_delete, sender=Message)
+def invalidate_deleted_message(sender, instance, origin=None, **kwargs):
+    if not cache_settings().get('ENABLED'):
+        return
+    # При каскадном удалении точки её ячейку сбросит сигнал самой точки.
+    if isinstance(origin, Point) or (
+        isinstance(origin, QuerySet) and origin.model is Point
+    ):
+        return
+    bump_on_commit(instance.location)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_cached_user(sender, instance, **kwargs):
+    # Деактивация, смена пароля или удаление должны действовать сразу,
+    # а не после истечения TTL кэша аутентификации.
+    evict_user(instance.pk)
@@ -0,0 +1,276 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+
+EARTH_RADIUS_M = 6371008.8
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+# Наименьший радиус кривизны WGS84 (меридиан на экваторе): с ним оценка
+# ячеек, покрывающих круг, не бывает меньше нужной.
+MIN_CURVATURE_RADIUS_M = WGS84_A * (1 - WGS84_F) ** 2
+# Отношение расстояния по эллипсоиду к haversine лежит в пределах ±0.7%,
+# поэтому точная формула считается только для прошедших грубый фильтр.
+HAVERSINE_MARGIN = 1.01
+# Примерный расход памяти на одну точку: запись в словаре ячейки,
+# кортеж координат и ссылка из _cell_of.
+BYTES_PER_POINT = 320
+
+
+def haversine_m(lon1, lat1, lon2, lat2):
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def geodesic_m(lon1, lat1, lon2, lat2):
+    # Расстояние по эллипсоиду WGS84 (обратная задача Винсенти) - то же, что
+    # ST_Distance и ST_DWithin по geography в PostGIS, с точностью до долей
+    # миллиметра. Для почти антиподальных точек итерации не сходятся, там
+    # остаётся haversine.
+    if lon1 == lon2 and lat1 == lat2:
+        return 0.0
+    f = WGS84_F
+    u1 = math.atan((1 - f) * math.tan(math.radians(lat1)))
+    u2 = math.atan((1 - f) * math.tan(math.radians(lat2)))
+    sin_u1, cos_u1 = math.sin(u1), math.cos(u1)
+    sin_u2, cos_u2 = math.sin(u2), math.cos(u2)
+    lon_diff = math.radians(lon2 - lon1)
+    lmb = lon_diff
+    for _ in range(200):
+        sin_lmb, cos_lmb = math.sin(lmb), math.cos(lmb)
+        sin_sigma = math.hypot(
+            cos_u2 * sin_lmb, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lmb
+        )
+        if sin_sigma == 0:
+            return 0.0
+        cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lmb
+        sigma = math.atan2(sin_sigma, cos_sigma)
+        sin_alpha = cos_u1 * cos_u2 * sin_lmb / sin_sigma
+        cos2_alpha = 1 - sin_alpha ** 2
+        cos_2sm = (
+            cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha if cos2_alpha else 0.0
+        )
+        c = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+        previous = lmb
+        lmb = lon_diff + (1 - c) * f * sin_alpha * (
+            sigma + c * sin_sigma * (
+                cos_2sm + c * cos_sigma * (-1 + 2 * cos_2sm ** 2)
+            )
+        )
+        if abs(lmb - previous) < 1e-12:
+            break
+    else:
+        return haversine_m(lon1, lat1, lon2, lat2)
+
+    u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = b * sin_sigma * (
+        cos_2sm + b / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sm ** 2)
+            - b / 6 * cos_2sm * (-3 + 4 * sin_sigma ** 2)
+            * (-3 + 4 * cos_2sm ** 2)
+        )
+    )
+    return WGS84_B * a * (sigma - delta_sigma)
+
+
+def cell_of(lon, lat, cell_size):
+    columns = math.ceil(360 / cell_size)
+    column = math.floor((lon + 180) / cell_size) % columns
+    row = math.floor((lat + 90) / cell_size)
+    return column, row
+
+
+def covering_cells(lon, lat, radius_m, cell_size):
+    # Ячейки сетки, покрывающие круг радиуса radius_m: строки по широте
+    # и множество столбцов с учётом перехода через антимеридиан.
+    total_columns = math.ceil(360 / cell_size)
+    dlat = math.degrees(radius_m / MIN_CURVATURE_RADIUS_M)
+    min_row = cell_of(lon, max(lat - dlat, -90), cell_size)[1]
+    max_row = cell_of(lon, min(lat + dlat, 90), cell_size)[1]
+    rows = range(min_row, max_row + 1)
+
+    max_abs_lat = min(abs(lat) + dlat, 90)
+    if max_abs_lat >= 90:
+        return range(total_columns), rows
+    dlon = dlat / math.cos(math.radians(max_abs_lat))
+    if dlon >= 180:
+        return range(total_columns), rows
+
+    first = cell_of(lon - dlon, lat, cell_size)[0]
+    span = math.floor(2 * dlon / cell_size) + 2
+    columns = sorted({
+        (first + offset) % total_columns
+        for offset in range(min(span, total_columns))
+    })
+    return columns, rows
+
+
+class GridIndex:
+    def __init__(self, cell_size=0.1, max_points=None):
+        self.cell_size = cell_size
+        self.max_points = max_points
+        self.loaded_at = None
+        self.overflow = False
+        self._cells = {}
+        self._cell_of = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._cell_of)
+
+    def _cell(self, lon, lat):
+        return cell_of(lon, lat, self.cell_size)
+
+    def add(self, point_id, lon, lat, owner_id):
+        with self._lock:
+            self._discard(point_id)
+            if self.max_points is not None and len(self) >= self.max_points:
+                self.overflow = True
+                return
+            cell = self._cell(lon, lat)
+            self._cells.setdefault(cell, {})[point_id] = (lon, lat, owner_id)
+            self._cell_of[point_id] = cell
+
+    def remove(self, point_id):
+        with self._lock:
+            self._discard(point_id)
+
+    def _discard(self, point_id):
+        cell = self._cell_of.pop(point_id, None)
+        if cell is None:
+            return
+        bucket = self._cells[cell]
+        del bucket[point_id]
+        if not bucket:
+            del self._cells[cell]
+
+    def load(self, rows):
+        cells = {}
+        cell_of = {}
+        overflow = False
+        for point_id, lon, lat, owner_id in rows:
+            if self.max_points is not None and len(cell_of) >= self.max_points:
+                overflow = True
+                break
+            cell = self._cell(lon, lat)
+            cells.setdefault(cell, {})[point_id] = (lon, lat, owner_id)
+            cell_of[point_id] = cell
+
+        with self._lock:
+            self._cells = cells
+            self._cell_of = cell_of
+            self.overflow = overflow
+            self.loaded_at = time.monotonic()
+
+    def _candidate_cells(self, lon, lat, radius_m):
+        columns, rows = covering_cells(lon, lat, radius_m, self.cell_size)
+        for column in columns:
+            for row in rows:
+                bucket = self._cells.get((column, row))
+                if bucket:
+                    yield bucket
+
+    def search(self, lon, lat, radius_m):
+        # Под блокировкой только копируются ячейки, расстояния считаются
+        # без неё: долгий поиск не задерживает другие поиски и add/remove.
+        with self._lock:
+            candidates = [
+                list(bucket.items())
+                for bucket in self._candidate_cells(lon, lat, radius_m)
+            ]
+
+        hits = []
+        rough_radius_m = radius_m * HAVERSINE_MARGIN
+        for bucket in candidates:
+            for point_id, (p_lon, p_lat, _owner) in bucket:
+                if haversine_m(lon, lat, p_lon, p_lat) > rough_radius_m:
+                    continue
+                distance = geodesic_m(lon, lat, p_lon, p_lat)
+                if distance <= radius_m:
+                    hits.append((distance, point_id))
+        hits.sort()
+        return hits
+
+
+_index = None
+_index_lock = threading.Lock()
+_load_lock = threading.Lock()
+
+
+def index_settings():
+    return getattr(settings, 'SPATIAL_INDEX', {})
+
+
+def get_spatial_index():
+    global _index
+    config = index_settings()
+    if not config.get('ENABLED'):
+        return None
+
+    with _index_lock:
+        if _index is None:
+            budget = config.get('MAX_MEMORY_MB', 256) * 1024 * 1024
+            _index = GridIndex(
+                cell_size=config.get('CELL_SIZE', 0.1),
+                max_points=budget // BYTES_PER_POINT,
+            )
+        index = _index
+
+    max_age = config.get('MAX_AGE', 300)
+    # Пока один поток перечитывает точки, остальные продолжают работать
+    # со старой копией; ждут только самую первую загрузку.
+    if is_stale(index, max_age) and _load_lock.acquire(
+        blocking=index.loaded_at is None
+    ):
+        try:
+            if is_stale(index, max_age):
+                index.load(point_rows())
+        finally:
+            _load_lock.release()
+
+    if index.loaded_at is None or index.overflow:
+        return None
+    return index
+
+
+def is_stale(index, max_age):
+    if index.loaded_at is None:
+        return True
+    return bool(max_age) and time.monotonic() - index.loaded_at > max_age
+
+
+def loaded_spatial_index():
+    if _index is None or _index.loaded_at is None:
+        return None
+    return _index
+
+
+def reset_spatial_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def point_rows():
+    from .models import Point
+    from .search import X, Y
+
+    return (
+        Point.objects
+        .order_by()
+        .annotate(lon=X('location'), lat=Y('location'))
+        .values_list('id', 'lon', 'lat', 'created_by_id')
+        .iterator(chunk_size=10000)
+    )
+
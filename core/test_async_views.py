@@ -0,0 +1,98 @@
+import pytest
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import Message, Point
+
+
+@pytest.fixture
+def jwt_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    return client
+
+
+SEARCH = {'latitude': 52.37, 'longitude': 4.89, 'radius': 1000}
+
+
+@pytest.mark.django_db
+class TestAsyncViews:
+
+    @pytest.mark.parametrize('path', ['points/', 'points/search/'])
+    def test_points_match_sync_views(self, auth_client, jwt_client, points, path):
+        params = SEARCH if 'search' in path else {}
+        sync_resp = auth_client.get(f'/api/{path}', params)
+        async_resp = jwt_client.get(f'/api/async/{path}', params)
+
+        assert async_resp.status_code == 200
+        assert async_resp.content == sync_resp.content
+
+    def test_point_retrieve_matches_sync_view(
+            self, auth_client, jwt_client, point_amsterdam):
+        sync_resp = auth_client.get(f'/api/points/{point_amsterdam.pk}/')
+        async_resp = jwt_client.get(f'/api/async/points/{point_amsterdam.pk}/')
+
+        assert async_resp.status_code == 200
+        assert async_resp.content == sync_resp.content
+
+    def test_foreign_point_not_found(self, jwt_client, another_point):
+        resp = jwt_client.get(f'/api/async/points/{another_point.pk}/')
+        assert resp.status_code == 404
+
+    def test_create_point(self, jwt_client, user):
+        resp = jwt_client.post('/api/async/points/', {
+            'name': 'Дом', 'latitude': 55.7558, 'longitude': 37.6173,
+        }, format='json')
+
+        assert resp.status_code == 201
+        point = Point.objects.get(pk=resp.json()['id'])
+        assert point.created_by == user
+        assert resp.json()['latitude'] == 55.7558
+
+    @pytest.mark.parametrize('path, field', [
+        ('points/', None), ('messages/', 'point_id'),
+    ])
+    def test_post_without_csrf_cookie(self, user, points, path, field):
+        client = APIClient(enforce_csrf_checks=True)
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'
+        )
+        data = {'latitude': 55.7558, 'longitude': 37.6173, 'text': 'Привет'}
+        if field:
+            data[field] = points[0].pk
+
+        resp = client.post(f'/api/async/{path}', data, format='json')
+
+        assert resp.status_code == 201
+
+    def test_create_point_validation_error(self, jwt_client):
+        resp = jwt_client.post(
+            '/api/async/points/', {'latitude': 100, 'longitude': 0}, format='json'
+        )
+        assert resp.status_code == 400
+        assert 'latitude' in resp.json()
+
+    def test_create_and_search_messages(self, auth_client, jwt_client, points):
+        resp = jwt_client.post('/api/async/messages/', {
+            'point_id': points[0].pk, 'text': 'Привет',
+        }, format='json')
+        assert resp.status_code == 201
+        assert Message.objects.get(pk=resp.json()['id']).location == points[0].location
+
+        sync_resp = auth_client.get('/api/messages/search/', SEARCH)
+        async_resp = jwt_client.get('/api/async/messages/search/', SEARCH)
+        assert async_resp.content == sync_resp.content
+
+    def test_search_invalid_params(self, jwt_client):
+        resp = jwt_client.get('/api/async/points/search/', {'latitude': 'x'})
+        assert resp.status_code == 400
+
+    def test_unauthenticated(self, unauth_client):
+        resp = unauth_client.get('/api/async/points/')
+        assert resp.status_code == 401
+        assert resp['WWW-Authenticate'].startswith('Bearer')
+
+    def test_invalid_token(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Bearer nonsense')
+        assert client.get('/api/async/points/').status_code == 401
@@ -0,0 +1,54 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.authentication import clear_user_cache
+
+
+@pytest.fixture
+def jwt_client(user):
+    clear_user_cache()
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+    yield client
+    clear_user_cache()
+
+
+def user_queries(client):
+    with CaptureQueriesContext(connection) as queries:
+        resp = client.get('/api/points/')
+    assert resp.status_code == 200
+    return [q['sql'] for q in queries if 'auth_user' in q['sql']]
+
+
+@pytest.mark.django_db
+class TestCachedJWTAuthentication:
+
+    def test_user_is_loaded_once(self, jwt_client):
+        assert len(user_queries(jwt_client)) == 1
+        assert user_queries(jwt_client) == []
+
+    def test_deactivation_applies_immediately(self, jwt_client, user):
+        user_queries(jwt_client)
+
+        user.is_active = False
+        user.save()
+
+        assert jwt_client.get('/api/points/').status_code == 401
+
+    def test_cache_disabled(self, jwt_client, settings):
+        settings.JWT_USER_CACHE = {'TTL': 0}
+
+        assert len(user_queries(jwt_client)) == 1
+        assert len(user_queries(jwt_client)) == 1
+
+    def test_token_obtain_does_not_update_last_login(self, user):
+        resp = APIClient().post(
+            '/api/token/', {'username': 'testuser', 'password': 'test123'}
+        )
+
+        assert resp.status_code == 200
+        user.refresh_from_db()
+        assert user.last_login is None
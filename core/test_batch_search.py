@@ -0,0 +1,133 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.search import MAX_BATCH_CENTERS
+
+URL = '/api/points/search/batch/'
+AMSTERDAM = {'latitude': 52.370216, 'longitude': 4.895168, 'radius': 5}
+AIRPORT = {'latitude': 52.308056, 'longitude': 4.763889, 'radius': 15}
+BERLIN = {'latitude': 52.52, 'longitude': 13.405, 'radius': 5}
+
+
+def names(group):
+    return [row['name'] for row in group['results']]
+
+
+@pytest.mark.django_db
+class TestBatchSearch:
+
+    def test_grouped_per_center(self, auth_client, points):
+        resp = auth_client.post(
+            URL, {'centers': [BERLIN, AIRPORT]}, format='json'
+        )
+
+        assert resp.status_code == 200
+        berlin, airport = resp.data['results']
+        assert names(berlin) == ['Берлин']
+        assert names(airport) == ['Аэропорт', 'Центр']
+        assert airport['results'][0]['distance_km'] == 0.0
+        assert airport['radius'] == 15
+
+    def test_same_rows_as_search(self, auth_client, points):
+        search = auth_client.get('/api/points/search/', AIRPORT)
+
+        resp = auth_client.post(URL, {'centers': [AIRPORT]}, format='json')
+
+        assert resp.data['results'][0]['results'] == search.data['results']
+
+    def test_one_query(self, auth_client, points):
+        centers = [AMSTERDAM, AIRPORT, BERLIN] * 20
+
+        with CaptureQueriesContext(connection) as queries:
+            resp = auth_client.post(URL, {'centers': centers}, format='json')
+
+        assert len(resp.data['results']) == 60
+        assert len(queries) == 1
+
+    def test_unique_keeps_nearest_center(self, auth_client, points):
+        resp = auth_client.post(
+            URL, {'centers': [AMSTERDAM, AIRPORT], 'unique': True},
+            format='json',
+        )
+
+        amsterdam, airport = resp.data['results']
+        assert names(amsterdam) == ['Центр']
+        assert names(airport) == ['Аэропорт']
+
+    def test_unique_truncated_after_dedupe(self, auth_client, points):
+        # Оба центра видят Центр и Аэропорт, но каждому остаётся по одной
+        # точке - лишних точек после удаления повторов нет.
+        wide_amsterdam = {**AMSTERDAM, 'radius': 15}
+        resp = auth_client.post(
+            URL,
+            {'centers': [wide_amsterdam, AIRPORT], 'limit': 1, 'unique': True},
+            format='json',
+        )
+
+        amsterdam, airport = resp.data['results']
+        assert names(amsterdam) == ['Центр']
+        assert names(airport) == ['Аэропорт']
+        assert amsterdam['truncated'] is False
+        assert airport['truncated'] is False
+
+    def test_unique_candidates_capped(self, auth_client, points, monkeypatch):
+        monkeypatch.setattr('core.search.MAX_UNIQUE_CANDIDATES', 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            resp = auth_client.post(
+                URL,
+                {'centers': [AIRPORT, BERLIN], 'limit': 1, 'unique': True},
+                format='json',
+            )
+
+        airport, berlin = resp.data['results']
+        assert names(airport) == ['Аэропорт']
+        assert airport['truncated'] is True
+        assert berlin['truncated'] is False
+        sql, = (query['sql'] for query in queries)
+        assert 'LIMIT 2' in sql
+
+    def test_limit_and_truncated(self, auth_client, points):
+        resp = auth_client.post(
+            URL, {'centers': [AIRPORT, BERLIN], 'limit': 1}, format='json'
+        )
+
+        airport, berlin = resp.data['results']
+        assert names(airport) == ['Аэропорт']
+        assert airport['truncated'] is True
+        assert berlin['truncated'] is False
+
+    def test_empty_center(self, auth_client, points):
+        resp = auth_client.post(
+            URL, {'centers': [{'latitude': 0, 'longitude': 0}]}, format='json'
+        )
+
+        assert resp.data['results'][0]['results'] == []
+
+    @pytest.mark.parametrize('body', [
+        {},
+        {'centers': []},
+        {'centers': [AMSTERDAM] * (MAX_BATCH_CENTERS + 1)},
+        {'centers': ['52.37,4.89']},
+        {'centers': [{'latitude': 100, 'longitude': 0}]},
+        {'centers': [AMSTERDAM], 'limit': 0},
+        {'centers': [AMSTERDAM], 'limit': '10'},
+        {'centers': [AMSTERDAM], 'unique': 'yes'},
+    ])
+    def test_invalid_body(self, auth_client, body):
+        resp = auth_client.post(URL, body, format='json')
+
+        assert resp.status_code == 400
+
+    def test_error_points_to_center(self, auth_client):
+        resp = auth_client.post(
+            URL, {'centers': [AMSTERDAM, {'latitude': 1}]}, format='json'
+        )
+
+        assert resp.data['index'] == 1
+
+    def test_requires_auth(self, unauth_client):
+        resp = unauth_client.post(URL, {'centers': [AMSTERDAM]}, format='json')
+
+        assert resp.status_code == 401
@@ -0,0 +1,112 @@
+import pytest
+from django.contrib.gis.geos import Point as GeoPoint
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Message, Point
+from core.search import within_bbox
+
+POINTS_URL = '/api/points/bbox/'
+MESSAGES_URL = '/api/messages/bbox/'
+
+
+def ids(resp):
+    return sorted(row['id'] for row in resp.data['results'])
+
+
+@pytest.mark.django_db
+class TestPointsBBox:
+
+    def test_inside_rectangle(self, auth_client, points, another_point):
+        resp = auth_client.get(POINTS_URL, {'bbox': '4.7,52.3,5,52.4'})
+
+        assert resp.status_code == 200
+        assert resp.data['truncated'] is False
+        assert ids(resp) == sorted(
+            [points[0].id, points[1].id, another_point.id]
+        )
+
+    def test_no_distance(self, auth_client, points):
+        resp = auth_client.get(POINTS_URL, {'bbox': '13,52,14,53'})
+
+        row, = resp.data['results']
+        assert row['name'] == 'Берлин'
+        assert row['distance_km'] is None
+
+    def test_antimeridian(self, auth_client, user, points):
+        fiji, samoa = Point.objects.bulk_create([
+            Point(created_by=user, location=GeoPoint(178.4, -18.1, srid=4326)),
+            Point(created_by=user, location=GeoPoint(-171.8, -13.8, srid=4326)),
+        ])
+
+        resp = auth_client.get(POINTS_URL, {'bbox': '170,-25,-165,-10'})
+
+        assert ids(resp) == sorted([fiji.id, samoa.id])
+
+    def test_truncated(self, auth_client, points):
+        resp = auth_client.get(POINTS_URL, {'bbox': '0,50,20,55', 'limit': 2})
+
+        assert len(resp.data['results']) == 2
+        assert resp.data['truncated'] is True
+
+    def test_exact_limit_not_truncated(self, auth_client, points):
+        resp = auth_client.get(POINTS_URL, {'bbox': '0,50,20,55', 'limit': 3})
+
+        assert len(resp.data['results']) == 3
+        assert resp.data['truncated'] is False
+
+    def test_single_query(self, auth_client, points):
+        with CaptureQueriesContext(connection) as queries:
+            auth_client.get(POINTS_URL, {'bbox': '0,50,20,55'})
+
+        sql, = (query['sql'] for query in queries)
+        assert '&&' in sql
+        assert 'ORDER BY' not in sql
+        assert 'ST_Distance' not in sql
+
+    @pytest.mark.parametrize('params', [
+        {},
+        {'bbox': '1,2,3'},
+        {'bbox': '10,50,10,55'},
+        {'bbox': '0,55,20,50'},
+        {'bbox': '0,50,190,55'},
+        {'bbox': '0,50,20,55', 'limit': 0},
+        {'bbox': '0,50,20,55', 'limit': 10_001},
+        {'bbox': '0,50,20,55', 'limit': 'all'},
+    ])
+    def test_invalid_params(self, auth_client, params):
+        assert auth_client.get(POINTS_URL, params).status_code == 400
+
+    def test_requires_auth(self, unauth_client):
+        resp = unauth_client.get(POINTS_URL, {'bbox': '0,50,20,55'})
+
+        assert resp.status_code == 401
+
+
+@pytest.mark.django_db
+class TestMessagesBBox:
+
+    def test_inside_rectangle(self, auth_client, user, points):
+        inside = Message.objects.create(
+            point=points[2], text='Берлин', created_by=user
+        )
+        Message.objects.create(point=points[0], text='Центр', created_by=user)
+
+        resp = auth_client.get(MESSAGES_URL, {'bbox': '13,52,14,53'})
+
+        assert resp.status_code == 200
+        assert ids(resp) == [inside.id]
+        assert resp.data['results'][0]['point']['name'] == 'Берлин'
+        assert resp.data['results'][0]['point_distance_km'] is None
+
+
+@pytest.mark.django_db
+def test_plan_uses_geometry_index(points):
+    queryset = within_bbox(Point.objects.all(), 'location', (0, 50, 20, 55), 10)
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        sql, params = queryset.query.sql_with_params()
+        cursor.execute(f'EXPLAIN {sql}', params)
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+
+    assert 'Index' in plan
@@ -0,0 +1,90 @@
+import pytest
+from django.contrib.gis.geos import Point as GeoPoint
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Point
+from core.search import CLUSTER_SAMPLE_SIZE
+
+URL = '/api/points/clusters/'
+
+
+@pytest.mark.django_db
+class TestClusters:
+
+    def test_zoomed_out(self, auth_client, points, another_point):
+        resp = auth_client.get(URL, {'bbox': '0,50,20,55', 'zoom': 2})
+
+        assert resp.status_code == 200
+        assert resp.data['zoom'] == 2
+        # Ячейка при zoom 2 - 22.5 градуса: Амстердам, аэропорт и чужая
+        # точка притягиваются к долготе 0, Берлин - к 22.5.
+        results = resp.data['results']
+        assert [cluster['count'] for cluster in results] == [3, 1]
+        assert sorted(results[0]['ids']) == sorted(
+            [points[0].id, points[1].id, another_point.id]
+        )
+        assert results[1]['ids'] == [points[2].id]
+
+    def test_zoomed_in(self, auth_client, points):
+        resp = auth_client.get(URL, {'bbox': '4,52,14,53', 'zoom': 10})
+
+        counts = sorted(cluster['count'] for cluster in resp.data['results'])
+        assert counts == [1, 1, 1]
+        berlin = next(
+            cluster for cluster in resp.data['results']
+            if cluster['ids'] == [points[2].id]
+        )
+        assert berlin['latitude'] == pytest.approx(52.52)
+        assert berlin['longitude'] == pytest.approx(13.405)
+
+    def test_bbox_filters(self, auth_client, points):
+        resp = auth_client.get(URL, {'bbox': '10,50,20,55', 'zoom': 5})
+
+        assert [cluster['ids'] for cluster in resp.data['results']] == [
+            [points[2].id]
+        ]
+
+    def test_centroid_and_sample(self, auth_client, user):
+        created = Point.objects.bulk_create([
+            Point(
+                created_by=user, name=str(number),
+                location=GeoPoint(10 + number * 0.001, 50, srid=4326),
+            )
+            for number in range(CLUSTER_SAMPLE_SIZE + 3)
+        ])
+
+        resp = auth_client.get(URL, {'bbox': '9,49,11,51', 'zoom': 3})
+
+        cluster, = resp.data['results']
+        assert cluster['count'] == CLUSTER_SAMPLE_SIZE + 3
+        assert cluster['ids'] == sorted(p.id for p in created)[:CLUSTER_SAMPLE_SIZE]
+        assert cluster['longitude'] == pytest.approx(10.0035)
+        assert cluster['latitude'] == pytest.approx(50)
+
+    def test_single_query(self, auth_client, points):
+        with CaptureQueriesContext(connection) as queries:
+            auth_client.get(URL, {'bbox': '0,50,20,55', 'zoom': 4})
+
+        cluster_queries = [q for q in queries if 'ST_SnapToGrid' in q['sql']]
+        assert len(cluster_queries) == 1
+        assert '&&' in cluster_queries[0]['sql']
+
+    @pytest.mark.parametrize('params', [
+        {'zoom': 3},
+        {'bbox': '1,2,3', 'zoom': 3},
+        {'bbox': '20,50,10,55', 'zoom': 3},
+        {'bbox': '0,50,20,95', 'zoom': 3},
+        {'bbox': '0,50,20,55'},
+        {'bbox': '0,50,20,55', 'zoom': 21},
+        {'bbox': '-180,-90,180,90', 'zoom': 10},
+    ])
+    def test_invalid_params(self, auth_client, params):
+        resp = auth_client.get(URL, params)
+
+        assert resp.status_code == 400
+
+    def test_requires_auth(self, unauth_client):
+        resp = unauth_client.get(URL, {'bbox': '0,50,20,55', 'zoom': 3})
+
+        assert resp.status_code == 401
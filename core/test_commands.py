@@ -0,0 +1,218 @@
+import json
+from datetime import UTC, datetime
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from core import geohash
+from core.models import Message, Point
+
+
+@pytest.mark.django_db
+class TestImportGeodata:
+
+    def test_import_points_csv(self, tmp_path, user, another_user):
+        path = tmp_path / 'points.csv'
+        path.write_text(
+            'name,latitude,longitude,created_by\n'
+            'Уфа,54.44,55.58,\n'
+            f'Казань,55.79,49.12,{another_user.id}\n'
+            'Ошибка,95,55.58,\n'
+            'Чужой,55.0,37.0,999999\n',
+            encoding='utf-8',
+        )
+        call_command('import_geodata', str(path), user='testuser')
+
+        points = {p.name: p for p in Point.objects.all()}
+        assert set(points) == {'Уфа', 'Казань'}
+        assert points['Уфа'].created_by == user
+        assert points['Казань'].created_by == another_user
+        assert points['Уфа'].location.x == 55.58
+        assert points['Уфа'].location.y == 54.44
+        assert points['Уфа'].geohash == geohash.encode(55.58, 54.44)
+
+    def test_import_points_geojson(self, tmp_path, user):
+        path = tmp_path / 'points.geojson'
+        path.write_text(json.dumps({
+            'type': 'FeatureCollection',
+            'features': [
+                {
+                    'type': 'Feature',
+                    'geometry': {'type': 'Point', 'coordinates': [4.9, 52.37]},
+                    'properties': {'name': f'Точка {i}'},
+                }
+                for i in range(50)
+            ],
+        }), encoding='utf-8')
+        call_command('import_geodata', str(path), user='testuser')
+        assert Point.objects.filter(created_by=user).count() == 50
+
+    def test_import_messages_ndjson(self, tmp_path, user, point_amsterdam):
+        path = tmp_path / 'messages.ndjson'
+        lines = [
+            {'point_id': point_amsterdam.id, 'text': 'Первое'},
+            {'point_id': point_amsterdam.id, 'text': '  '},
+            {'point_id': 999999, 'text': 'К несуществующей точке'},
+            {'point_id': point_amsterdam.id, 'text': 'Второе'},
+        ]
+        path.write_text(
+            '\n'.join(json.dumps(line, ensure_ascii=False) for line in lines),
+            encoding='utf-8',
+        )
+        call_command(
+            'import_geodata', str(path), model='messages', user='testuser'
+        )
+        assert sorted(Message.objects.values_list('text', flat=True)) == [
+            'Второе', 'Первое'
+        ]
+
+    @pytest.mark.parametrize('created_by', ['abc', '99999999999', '-1', '1.5'])
+    def test_import_invalid_created_by_skipped(self, tmp_path, user, created_by):
+        path = tmp_path / 'points.csv'
+        path.write_text(
+            'name,latitude,longitude,created_by\n'
+            'Уфа,54.44,55.58,\n'
+            f'Плохой,55.0,37.0,{created_by}\n',
+            encoding='utf-8',
+        )
+
+        call_command('import_geodata', str(path), user='testuser')
+
+        assert list(Point.objects.values_list('name', flat=True)) == ['Уфа']
+
+    def test_import_messages_invalid_ids_skipped(
+        self, tmp_path, user, point_amsterdam
+    ):
+        path = tmp_path / 'messages.ndjson'
+        lines = [
+            {'point_id': point_amsterdam.id, 'text': 'Первое'},
+            {'point_id': 2**64, 'text': 'Огромный point_id'},
+            {'point_id': point_amsterdam.id, 'text': 'Чужой',
+             'created_by': 2**40},
+            {'point_id': float(point_amsterdam.id), 'text': 'Дробный'},
+        ]
+        path.write_text(
+            '\n'.join(json.dumps(line, ensure_ascii=False) for line in lines),
+            encoding='utf-8',
+        )
+
+        call_command(
+            'import_geodata', str(path), model='messages', user='testuser'
+        )
+
+        assert list(Message.objects.values_list('text', flat=True)) == [
+            'Первое'
+        ]
+
+    def test_import_invalid_progress_every(self, tmp_path, user):
+        path = tmp_path / 'points.csv'
+        path.write_text('name,latitude,longitude\nУфа,54.44,55.58\n', encoding='utf-8')
+        with pytest.raises(CommandError):
+            call_command(
+                'import_geodata', str(path), user='testuser', progress_every=0
+            )
+        assert Point.objects.count() == 0
+
+    def test_import_unknown_user(self, tmp_path, user):
+        path = tmp_path / 'points.csv'
+        path.write_text('name,latitude,longitude\n', encoding='utf-8')
+        with pytest.raises(CommandError):
+            call_command('import_geodata', str(path), user='nobody')
+
+    def test_import_broken_json_rolls_back(self, tmp_path, user):
+        path = tmp_path / 'points.ndjson'
+        path.write_text(
+            '{"latitude": 52.0, "longitude": 4.9}\n{"latitude": ',
+            encoding='utf-8',
+        )
+        with pytest.raises(CommandError):
+            call_command('import_geodata', str(path), user='testuser')
+        assert Point.objects.count() == 0
+
+
+def coordinates(queryset):
+    return [(p.location.x, p.location.y) for p in queryset.order_by('id')]
+
+
+def timestamps(queryset):
+    return list(queryset.order_by('id').values_list('created_at', flat=True))
+
+
+@pytest.mark.django_db
+class TestSeedGeodata:
+
+    @pytest.mark.parametrize('distribution', ['uniform', 'clustered', 'hotspot'])
+    def test_seed_points_and_messages(self, distribution):
+        call_command(
+            'seed_geodata', points=200, messages=500, users=5,
+            distribution=distribution,
+        )
+
+        assert Point.objects.count() == 200
+        assert Message.objects.count() == 500
+        assert User.objects.filter(username__startswith='seed').count() == 5
+        for message in Message.objects.select_related('point')[:50]:
+            assert message.location == message.point.location
+        for point in Point.objects.all()[:50]:
+            assert point.geohash == geohash.encode(
+                point.location.x, point.location.y
+            )
+
+    def test_same_seed_same_data(self):
+        call_command('seed_geodata', points=50, messages=20, users=3, seed=7)
+        first = coordinates(Point.objects.all())
+        first_dates = timestamps(Point.objects.all())
+        first_message_dates = timestamps(Message.objects.all())
+        Point.objects.all().delete()
+
+        call_command('seed_geodata', points=50, messages=20, users=3, seed=7)
+        assert coordinates(Point.objects.all()) == first
+        assert timestamps(Point.objects.all()) == first_dates
+        assert timestamps(Message.objects.all()) == first_message_dates
+
+    def test_dates_from_start(self):
+        call_command('seed_geodata', points=50, users=1, start='2020-03-01')
+
+        for created_at in timestamps(Point.objects.all()):
+            assert datetime(2020, 3, 1, tzinfo=UTC) <= created_at
+            assert created_at < datetime(2021, 3, 1, tzinfo=UTC)
+
+    def test_invalid_start(self):
+        with pytest.raises(CommandError):
+            call_command('seed_geodata', points=1, users=1, start='вчера')
+
+    def test_invalid_progress_every(self):
+        with pytest.raises(CommandError):
+            call_command('seed_geodata', points=1, users=1, progress_every=0)
+        assert Point.objects.count() == 0
+
+    def test_hotspot_is_dense(self):
+        call_command('seed_geodata', points=100, users=1, distribution='hotspot')
+        for x, y in coordinates(Point.objects.all()):
+            assert abs(x - 4.89) < 0.2 and abs(y - 52.37) < 0.2
+
+
+@pytest.mark.django_db
+class TestBenchApi:
+
+    def test_writes_report(self, tmp_path):
+        call_command(
+            'seed_geodata', points=300, messages=300, users=2,
+            distribution='hotspot',
+        )
+        output = tmp_path / 'bench.json'
+        call_command(
+            'bench_api', output=str(output), queries=3, radius=[1, 10],
+            pages=[1, 2],
+        )
+
+        report = json.loads(output.read_text(encoding='utf-8'))
+        assert report['environment']['points'] == 300
+        endpoints = {result['endpoint'] for result in report['results']}
+        assert endpoints == {
+            'points/search', 'messages/search', 'points/list', 'points/retrieve'
+        }
+        for result in report['results']:
+            assert result['p50_ms'] <= result['p99_ms']
@@ -0,0 +1,68 @@
+import importlib.util
+
+import pytest
+from psycopg_pool import ConnectionPool
+
+import geopoints.settings
+
+
+def load_settings(monkeypatch, **env):
+    # Отдельный экземпляр модуля настроек с подменённым окружением,
+    # django.conf.settings текущего процесса не меняется.
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    spec = importlib.util.spec_from_file_location(
+        'pool_settings', geopoints.settings.__file__
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.DATABASES['default']
+
+
+class TestDbPoolSettings:
+
+    def test_enabled(self, monkeypatch):
+        database = load_settings(
+            monkeypatch, DB_POOL_ENABLED='True', DB_POOL_MIN_SIZE='3',
+            DB_POOL_MAX_SIZE='7', DB_POOL_CHECK='True',
+        )
+
+        pool = database['OPTIONS']['pool']
+        assert pool['min_size'] == 3
+        assert pool['max_size'] == 7
+        assert pool['check'] is ConnectionPool.check_connection
+        assert 'CONN_MAX_AGE' not in database
+
+    def test_without_check(self, monkeypatch):
+        database = load_settings(
+            monkeypatch, DB_POOL_ENABLED='True', DB_POOL_CHECK='False',
+        )
+
+        assert 'check' not in database['OPTIONS']['pool']
+
+    def test_disabled(self, monkeypatch):
+        database = load_settings(
+            monkeypatch, DB_POOL_ENABLED='False', CONN_MAX_AGE='60',
+        )
+
+        assert 'pool' not in database.get('OPTIONS', {})
+        assert database['CONN_MAX_AGE'] == 60
+
+
+@pytest.mark.django_db
+class TestDbPoolStats:
+
+    def test_requires_staff(self, auth_client):
+        assert auth_client.get('/api/db/pool/').status_code == 403
+
+    def test_unauth(self, unauth_client):
+        assert unauth_client.get('/api/db/pool/').status_code == 401
+
+    def test_pool_disabled(self, auth_client, user):
+        user.is_staff = True
+        user.save()
+
+        resp = auth_client.get('/api/db/pool/')
+
+        assert resp.status_code == 200
+        assert resp.data == {'enabled': False}
@@ -0,0 +1,104 @@
+import pytest
+from django.contrib.gis.geos import Point as GeoPoint
+from django.core.management import call_command
+from django.db import connection
+
+from core import geohash
+from core.models import Point
+
+
+@pytest.mark.parametrize('lon, lat, precision, expected', [
+    (-5.6, 42.6, 5, 'ezs42'),
+    (10.40744, 57.64911, 11, 'u4pruydqqvj'),
+    (4.900225, 52.379189, 7, 'u173zx2'),
+])
+def test_encode(lon, lat, precision, expected):
+    assert geohash.encode(lon, lat, precision) == expected
+
+
+def test_bounds_contain_point():
+    west, south, east, north = geohash.bounds(geohash.encode(4.9, 52.37, 6))
+
+    assert west <= 4.9 < east
+    assert south <= 52.37 < north
+
+
+@pytest.mark.django_db
+class TestPointGeohash:
+
+    def test_set_on_save(self, point_amsterdam):
+        assert point_amsterdam.geohash == geohash.encode(4.900225, 52.379189)
+        assert len(point_amsterdam.geohash) == geohash.MAX_PRECISION
+
+    def test_matches_postgis(self, points):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT geohash, ST_GeoHash(location, 12) FROM core_point'
+            )
+            rows = cursor.fetchall()
+
+        assert rows and all(ours == postgis for ours, postgis in rows)
+
+    def test_updated_with_location(self, point_amsterdam):
+        point_amsterdam.location = GeoPoint(13.405, 52.52, srid=4326)
+        point_amsterdam.save(update_fields=['location'])
+
+        point_amsterdam.refresh_from_db()
+        assert point_amsterdam.geohash == geohash.encode(13.405, 52.52)
+
+    def test_bulk_create(self, user):
+        Point.objects.bulk_create([
+            Point(created_by=user, location=GeoPoint(4.9, 52.37, srid=4326)),
+        ])
+
+        assert Point.objects.get().geohash == geohash.encode(4.9, 52.37)
+
+    def test_bulk_endpoint(self, auth_client):
+        resp = auth_client.post(
+            '/api/points/bulk/',
+            [{'name': 'Уфа', 'latitude': 54.44, 'longitude': 55.58}],
+            format='json',
+        )
+
+        assert resp.status_code == 201
+        assert Point.objects.get().geohash == geohash.encode(55.58, 54.44)
+
+    def test_in_cell(self, points, another_point):
+        amsterdam = Point.objects.in_cell('u17')
+
+        assert set(amsterdam.values_list('name', flat=True)) == {
+            'Центр', 'Аэропорт', 'Чужая точка',
+        }
+        assert Point.objects.in_cell('u33').get().name == 'Берлин'
+        assert not Point.objects.in_cell('zzz').exists()
+
+    def test_in_cell_uses_prefix_lookup(self, points):
+        sql = str(Point.objects.in_cell('u17').query)
+
+        assert 'LIKE' in sql
+
+    def test_in_cell_invalid_prefix(self):
+        with pytest.raises(ValueError):
+            Point.objects.in_cell("u1'a")
+
+    def test_cell_counts(self, points, another_point):
+        counts = {
+            row['cell']: row['count'] for row in Point.objects.cell_counts(3)
+        }
+
+        assert counts == {'u17': 3, 'u33': 1}
+
+    def test_cell_counts_within_cell(self, points):
+        counts = list(Point.objects.in_cell('u17').cell_counts(2))
+
+        assert counts == [{'cell': 'u1', 'count': 2}]
+
+    def test_backfill_command(self, points):
+        Point.objects.update(geohash='')
+
+        call_command('backfill_geohash', batch_size=1)
+
+        for point in Point.objects.all():
+            assert point.geohash == geohash.encode(
+                point.location.x, point.location.y
+            )
@@ -0,0 +1,205 @@
+from types import SimpleNamespace
+
+import pytest
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import Message, Point
+from core.serializers import PointSerializer
+
+SEARCH_URL = '/api/points/search/'
+CENTER = {'latitude': 52.370216, 'longitude': 4.895168, 'radius': 20}
+
+
+def post_message(client, point, text='Сообщение'):
+    return client.post(
+        '/api/points/messages/',
+        {'point_id': point.id, 'text': text},
+        format='json',
+    )
+
+
+def stats(point):
+    point.refresh_from_db()
+    return point.message_count, point.last_message_at
+
+
+@pytest.mark.django_db
+class TestMessageStats:
+
+    def test_create_increments(self, auth_client, point_amsterdam):
+        post_message(auth_client, point_amsterdam)
+        resp = post_message(auth_client, point_amsterdam)
+
+        count, last = stats(point_amsterdam)
+        assert count == 2
+        assert last == Message.objects.get(pk=resp.data['id']).created_at
+
+    def test_delete_latest_recomputes(self, auth_client, point_amsterdam):
+        first = post_message(auth_client, point_amsterdam).data['id']
+        second = post_message(auth_client, point_amsterdam).data['id']
+
+        resp = auth_client.delete(f'/api/messages/{second}/')
+
+        assert resp.status_code == 204
+        assert stats(point_amsterdam) == (
+            1, Message.objects.get(pk=first).created_at
+        )
+
+    def test_delete_last_message(self, auth_client, point_amsterdam):
+        message = post_message(auth_client, point_amsterdam).data['id']
+
+        auth_client.delete(f'/api/messages/{message}/')
+
+        assert stats(point_amsterdam) == (0, None)
+
+    def test_point_update_keeps_stats(self, auth_client, point_amsterdam):
+        # Точка загружена до сообщения, как при параллельных запросах.
+        stale = Point.objects.get(pk=point_amsterdam.pk)
+        post_message(auth_client, point_amsterdam)
+        serializer = PointSerializer(
+            stale, data={'name': 'Новое имя'}, partial=True,
+            context={'request': SimpleNamespace(method='PATCH')},
+        )
+        serializer.is_valid(raise_exception=True)
+
+        serializer.save()
+
+        point_amsterdam.refresh_from_db()
+        assert point_amsterdam.name == 'Новое имя'
+        assert point_amsterdam.message_count == 1
+
+    def test_async_create(self, user, point_amsterdam):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'
+        )
+
+        resp = client.post(
+            '/api/async/messages/',
+            {'point_id': point_amsterdam.id, 'text': 'Привет'},
+            format='json',
+        )
+
+        assert resp.status_code == 201
+        assert stats(point_amsterdam)[0] == 1
+
+    def test_serialized(self, auth_client, point_amsterdam):
+        post_message(auth_client, point_amsterdam)
+
+        detail = auth_client.get(f'/api/points/{point_amsterdam.id}/').data
+
+        assert detail['message_count'] == 1
+        assert detail['last_message_at'] is not None
+
+
+@pytest.mark.django_db
+class TestSearchOrder:
+
+    @pytest.fixture
+    def busy(self, auth_client, points):
+        center, airport, _ = points
+        for _ in range(3):
+            post_message(auth_client, airport)
+        post_message(auth_client, center)
+        return points
+
+    def names(self, resp):
+        return [row['name'] for row in resp.data['results']]
+
+    def test_by_message_count(self, auth_client, busy):
+        resp = auth_client.get(SEARCH_URL, {**CENTER, 'order': '-message_count'})
+
+        assert resp.status_code == 200
+        assert self.names(resp) == ['Аэропорт', 'Центр']
+        assert resp.data['results'][0]['message_count'] == 3
+
+    def test_by_last_message(self, auth_client, busy, user, points):
+        Point.objects.create(
+            created_by=user, name='Пустая', location=points[0].location,
+        )
+        post_message(auth_client, busy[1])
+
+        resp = auth_client.get(SEARCH_URL, {**CENTER, 'order': '-last_message_at'})
+
+        assert self.names(resp) == ['Аэропорт', 'Центр', 'Пустая']
+
+    def test_default_is_distance(self, auth_client, busy):
+        resp = auth_client.get(SEARCH_URL, CENTER)
+
+        assert self.names(resp) == ['Центр', 'Аэропорт']
+
+    @pytest.mark.parametrize('order', ['message_count', '-last_message_at'])
+    def test_keyset_pagination(self, auth_client, user, points, order):
+        Point.objects.bulk_create([
+            Point(
+                created_by=user, location=points[0].location,
+                message_count=number % 3,
+            )
+            for number in range(45)
+        ])
+
+        seen = []
+        resp = auth_client.get(SEARCH_URL, {**CENTER, 'order': order})
+        while True:
+            seen.extend(row['id'] for row in resp.data['results'])
+            if not resp.data['next']:
+                break
+            resp = auth_client.get(resp.data['next'])
+
+        assert len(seen) == len(set(seen)) == 47
+
+    def test_invalid_order(self, auth_client):
+        resp = auth_client.get(SEARCH_URL, {**CENTER, 'order': 'name'})
+
+        assert resp.status_code == 400
+
+    def test_async_view(self, user, busy):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'
+        )
+
+        resp = client.get(
+            '/api/async/points/search/', {**CENTER, 'order': '-message_count'}
+        )
+
+        assert [row['name'] for row in resp.json()['results']] == [
+            'Аэропорт', 'Центр'
+        ]
+
+
+@pytest.mark.django_db
+class TestReconcileMessageStats:
+
+    def test_fixes_drift(self, auth_client, points):
+        post_message(auth_client, points[0])
+        Point.objects.filter(pk=points[1].pk).update(message_count=7)
+        Message.objects.filter(point=points[0]).update(point=points[2])
+
+        call_command('reconcile_message_stats', batch_size=1)
+
+        assert stats(points[0]) == (0, None)
+        assert stats(points[1]) == (0, None)
+        assert stats(points[2])[0] == 1
+
+    def test_import_messages_updates_stats(self, tmp_path, user, point_amsterdam):
+        path = tmp_path / 'messages.csv'
+        path.write_text(
+            f'point_id,text\n{point_amsterdam.id},Раз\n{point_amsterdam.id},Два\n',
+            encoding='utf-8',
+        )
+
+        call_command(
+            'import_geodata', str(path), model='messages', user='testuser'
+        )
+
+        assert stats(point_amsterdam)[0] == 2
+
+    def test_seed_updates_stats(self):
+        call_command('seed_geodata', points=20, messages=100, users=2)
+
+        assert sum(
+            Point.objects.values_list('message_count', flat=True)
+        ) == 100
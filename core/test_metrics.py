@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.core.cache import caches
+from django.test import AsyncClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.metrics import record_search, registry, render_metrics
+from core.middleware import MetricsMiddleware
+
+SEARCH = {'latitude': 52.37, 'longitude': 4.89, 'radius': 20}
+
+
+@pytest.fixture(autouse=True)
+def enable(settings, tmp_path):
+    settings.METRICS = {
+        'ENABLED': True, 'DIR': str(tmp_path), 'FLUSH_INTERVAL': 0, 'TOKEN': '',
+    }
+    registry.reset()
+    yield
+    registry.reset()
+
+
+def samples(text):
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, _, value = line.rpartition(' ')
+            values[name] = float(value)
+    return values
+
+
+@pytest.mark.django_db
+class TestMetricsEndpoint:
+
+    def test_request_metrics(self, auth_client, points, unauth_client):
+        auth_client.get('/api/points/search/', SEARCH)
+
+        resp = unauth_client.get('/metrics')
+
+        assert resp.status_code == 200
+        assert resp['Content-Type'].startswith('text/plain')
+        values = samples(resp.content.decode())
+        labels = 'method="GET",route="points-search"'
+        assert values[f'geopoints_requests_total{{{labels},status="200"}}'] == 1
+        assert values[f'geopoints_request_duration_seconds_count{{{labels}}}'] == 1
+        assert values[
+            f'geopoints_request_db_queries_bucket{{{labels},le="1"}}'
+        ] == 1
+        assert values[
+            f'geopoints_request_db_queries_bucket{{{labels},le="0"}}'
+        ] == 0
+        assert values['geopoints_search_radius_km_sum{scope="points"}'] == 20
+
+    def test_clamped_radius(self, auth_client, points, unauth_client):
+        auth_client.get('/api/messages/search/', {**SEARCH, 'radius': 5000})
+
+        values = samples(unauth_client.get('/metrics').content.decode())
+        assert values['geopoints_search_radius_clamped_total{scope="messages"}'] == 1
+        assert values[
+            'geopoints_search_radius_km_bucket{scope="messages",le="1000"}'
+        ] == 0
+
+    def test_search_cache(self, auth_client, points, unauth_client, settings):
+        settings.SEARCH_CACHE = {'ENABLED': True, 'ALIAS': 'search'}
+        caches['search'].clear()
+        auth_client.get('/api/points/search/', SEARCH)
+        auth_client.get('/api/points/search/', SEARCH)
+
+        values = samples(unauth_client.get('/metrics').content.decode())
+        assert values['geopoints_search_cache_total{result="miss",scope="points"}'] == 1
+        assert values['geopoints_search_cache_total{result="hit",scope="points"}'] == 1
+
+    def test_asgi_request(self, user, points, unauth_client):
+        async def get_response(request):
+            return None
+
+        assert iscoroutinefunction(MetricsMiddleware(get_response))
+        client = AsyncClient(
+            headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        )
+
+        resp = async_to_sync(client.get)('/api/async/points/search/', SEARCH)
+
+        assert resp.status_code == 200
+        values = samples(unauth_client.get('/metrics').content.decode())
+        labels = 'method="GET",route="async-points-search"'
+        assert values[f'geopoints_requests_total{{{labels},status="200"}}'] == 1
+
+    def test_token(self, unauth_client, settings):
+        settings.METRICS = {**settings.METRICS, 'TOKEN': 'secret'}
+
+        assert unauth_client.get('/metrics').status_code == 401
+        resp = unauth_client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        assert resp.status_code == 200
+
+    def test_disabled(self, unauth_client, settings):
+        settings.METRICS = {'ENABLED': False}
+
+        assert unauth_client.get('/metrics').status_code == 404
+
+
+class TestMultiprocess:
+
+    def test_sums_worker_files(self, tmp_path):
+        record_search('points', {'radius': '3'}, 10)
+        registry.flush()
+        snapshot = json.loads((tmp_path / f'{os.getpid()}.json').read_text())
+        # Файл другого, уже завершившегося воркера.
+        snapshot['pid'] = 2 ** 22 + 1
+        snapshot['gauges'] = [
+            ['geopoints_db_pool_size', [['alias', 'default']], 4]
+        ]
+        (tmp_path / 'other.json').write_text(json.dumps(snapshot))
+
+        values = samples(render_metrics())
+
+        assert values['geopoints_search_radius_km_count{scope="points"}'] == 2
+        assert values['geopoints_search_radius_km_bucket{scope="points",le="5"}'] == 2
+        assert values[
+            'geopoints_search_radius_km_bucket{scope="points",le="+Inf"}'
+        ] == 2
+        assert values['geopoints_search_results_sum{scope="points"}'] == 20
+        assert not any(name.startswith('geopoints_db_pool_size') for name in values)
+
+    def test_concurrent_flush(self, tmp_path):
+        record_search('points', {'radius': '3'}, 10)
+        threads = [threading.Thread(target=registry.maybe_flush) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        snapshot = json.loads((tmp_path / f'{os.getpid()}.json').read_text())
+        assert snapshot['pid'] == os.getpid()
+        assert list(tmp_path.glob('*.tmp')) == []
+
+    def test_write_error_is_logged(self, settings, tmp_path, caplog):
+        blocker = tmp_path / 'file'
+        blocker.write_text('')
+        settings.METRICS = {**settings.METRICS, 'DIR': str(blocker / 'metrics')}
+
+        record_search('points', {'radius': '3'}, 10)
+
+        assert 'Не удалось записать метрики' in caplog.text
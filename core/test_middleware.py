@@ -0,0 +1,143 @@
+import json
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.test import AsyncClient
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.middleware import ServerTimingMiddleware
+
+SEARCH = {'latitude': 52.37, 'longitude': 4.89, 'radius': 20}
+
+
+@pytest.fixture
+def timing_log(caplog):
+    logger = logging.getLogger('core.timing')
+    logger.addHandler(caplog.handler)
+    caplog.set_level(logging.INFO, logger='core.timing')
+    yield caplog
+    logger.removeHandler(caplog.handler)
+
+
+def server_timing(response):
+    metrics = {}
+    for part in response['Server-Timing'].split(', '):
+        name, _, value = part.partition(';')
+        metrics[name] = value
+    return metrics
+
+
+@pytest.mark.django_db
+class TestServerTimingMiddleware:
+
+    @pytest.fixture(autouse=True)
+    def enable(self, settings):
+        settings.SERVER_TIMING = {'ENABLED': True, 'QUERY_BUDGETS': {}}
+
+    def test_header(self, auth_client, points):
+        resp = auth_client.get('/api/points/search/', SEARCH)
+
+        assert resp.status_code == 200
+        metrics = server_timing(resp)
+        assert {'db', 'serialize', 'render', 'total'} <= set(metrics)
+        assert metrics['queries'] == 'desc="1"'
+
+    def test_log_line(self, auth_client, points, timing_log):
+        auth_client.get('/api/points/search/', SEARCH)
+
+        record = json.loads(timing_log.records[-1].getMessage())
+        assert timing_log.records[-1].levelno == logging.INFO
+        assert record['url_name'] == 'points-search'
+        assert record['queries'] == 1
+        assert record['status'] == 200
+        assert 'query_budget' not in record
+
+    def test_query_budget_exceeded(self, auth_client, points, settings, timing_log):
+        settings.SERVER_TIMING = {
+            'ENABLED': True, 'QUERY_BUDGETS': {'points-search': 0}
+        }
+
+        auth_client.get('/api/points/search/', SEARCH)
+
+        assert timing_log.records[-1].levelno == logging.WARNING
+        record = json.loads(timing_log.records[-1].getMessage())
+        assert record['query_budget'] == 0
+
+    def test_async_capable(self):
+        async def get_response(request):
+            return None
+
+        assert iscoroutinefunction(ServerTimingMiddleware(get_response))
+        assert not iscoroutinefunction(ServerTimingMiddleware(lambda r: None))
+
+    def test_asgi_request(self, user, points, timing_log):
+        client = AsyncClient(
+            headers={'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        )
+
+        resp = async_to_sync(client.get)('/api/async/points/search/', SEARCH)
+
+        assert resp.status_code == 200
+        assert 'total' in server_timing(resp)
+        record = json.loads(timing_log.records[-1].getMessage())
+        assert record['status'] == 200
+        assert record['queries'] >= 1
+
+    def test_disabled(self, auth_client, settings):
+        settings.SERVER_TIMING = {'ENABLED': False}
+
+        resp = auth_client.get('/api/points/')
+        assert 'Server-Timing' not in resp
+
+
+@pytest.mark.django_db
+class TestProfilingMiddleware:
+
+    @pytest.fixture(autouse=True)
+    def enable(self, settings, tmp_path):
+        settings.PROFILING = {
+            'ENABLED': True, 'DIR': str(tmp_path), 'PROFILER': 'cprofile',
+            'TOP': 5,
+        }
+
+    @pytest.fixture
+    def staff_client(self, user):
+        user.is_staff = True
+        user.save()
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'
+        )
+        return client
+
+    def test_profile_written(self, staff_client, points, tmp_path):
+        resp = staff_client.get(
+            '/api/points/search/', SEARCH, HTTP_X_PROFILE='1'
+        )
+
+        assert resp.status_code == 200
+        assert 'results' in resp.json()
+        name = resp['X-Profile-File']
+        assert name.startswith('points-search-') and name.endswith('.prof')
+        assert (tmp_path / name).exists()
+
+    def test_inline(self, staff_client, tmp_path):
+        resp = staff_client.get('/api/points/', {'profile': 'inline'})
+
+        assert resp.status_code == 200
+        assert resp['Content-Type'].startswith('text/plain')
+        assert 'function calls' in resp.content.decode()
+
+    def test_not_staff(self, user, tmp_path):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'
+        )
+
+        resp = client.get('/api/points/', HTTP_X_PROFILE='inline')
+
+        assert resp.status_code == 200
+        assert 'X-Profile-File' not in resp
+        assert list(tmp_path.iterdir()) == []
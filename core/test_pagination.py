@@ -0,0 +1,107 @@
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+from django.contrib.gis.geos import Point as GeoPoint
+
+from core.models import Message, Point
+
+
+@pytest.fixture
+def grid_points(user):
+    return Point.objects.bulk_create(
+        Point(
+            created_by=user,
+            name=f"Точка {i}",
+            location=GeoPoint(4.89 + (i % 10) * 0.001, 52.37, srid=4326),
+        )
+        for i in range(55)
+    )
+
+
+def collect_pages(client, url, params, django_assert_num_queries):
+    items = []
+    next_url = None
+    while True:
+        with django_assert_num_queries(1):
+            if next_url is None:
+                resp = client.get(url, params)
+            else:
+                resp = client.get(next_url)
+        assert resp.status_code == 200
+        assert 'count' not in resp.data
+        items.extend(resp.data['results'])
+        next_url = resp.data['next']
+        if next_url is None:
+            return items
+
+
+@pytest.mark.django_db
+class TestKeysetPagination:
+
+    def test_search_pages_follow_distance_then_id(
+            self, auth_client, grid_points, django_assert_num_queries):
+        items = collect_pages(auth_client, '/api/points/search/', {
+            'latitude': 52.37,
+            'longitude': 4.89,
+            'radius': 10,
+        }, django_assert_num_queries)
+
+        keys = [(item['distance_km'], item['id']) for item in items]
+        assert len(keys) == len(grid_points)
+        assert len({item['id'] for item in items}) == len(grid_points)
+        assert [k[0] for k in keys] == sorted(k[0] for k in keys)
+
+    def test_list_pages_follow_created_at_desc(
+            self, auth_client, grid_points, django_assert_num_queries):
+        items = collect_pages(
+            auth_client, '/api/points/', {}, django_assert_num_queries
+        )
+        expected = list(
+            Point.objects.order_by('-created_at', '-id')
+            .values_list('id', flat=True)
+        )
+        assert [item['id'] for item in items] == expected
+
+    def test_message_search_pages(
+            self, auth_client, user, point_amsterdam,
+            django_assert_num_queries):
+        Message.objects.bulk_create(
+            Message(
+                point=point_amsterdam, location=point_amsterdam.location,
+                created_by=user, text=f"#{i}",
+            )
+            for i in range(45)
+        )
+        items = collect_pages(auth_client, '/api/messages/search/', {
+            'latitude': 52.37,
+            'longitude': 4.89,
+            'radius': 5,
+        }, django_assert_num_queries)
+        assert sorted(item['id'] for item in items) == sorted(
+            Message.objects.values_list('id', flat=True)
+        )
+
+    def test_count_only_on_request(self, auth_client, grid_points):
+        resp = auth_client.get('/api/points/search/', {
+            'latitude': 52.37,
+            'longitude': 4.89,
+            'count': 'true',
+        })
+        assert resp.status_code == 200
+        assert resp.data['count'] == len(grid_points)
+        assert len(resp.data['results']) == 20
+
+    @pytest.mark.parametrize('cursor', ['мусор', 'eyJvIjogWyJpZCJdfQ=='])
+    def test_invalid_cursor(self, auth_client, grid_points, cursor):
+        resp = auth_client.get('/api/points/', {'cursor': cursor})
+        assert resp.status_code == 404
+
+    def test_cursor_from_other_endpoint_rejected(self, auth_client, grid_points):
+        resp = auth_client.get('/api/points/')
+        cursor = parse_qs(urlparse(resp.data['next']).query)['cursor'][0]
+        resp = auth_client.get('/api/points/search/', {
+            'latitude': 52.37,
+            'longitude': 4.89,
+            'cursor': cursor,
+        })
+        assert resp.status_code == 404
@@ -1,77 +1,15 @@
+import json
+
 import pytest
-from django.contrib.auth.models import User
+from django.contrib import admin
 from django.contrib.gis.geos import Point as GeoPoint
-from rest_framework.test import APIClient
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
+from core.admin import PointAdmin
 from core.models import Message, Point
 
 
-@pytest.fixture(autouse=True)
-def clear_db():
-    Point.objects.all().delete()
-    Message.objects.all().delete()
-
-
-@pytest.fixture
-def user(db):
-    return User.objects.create_user(username='testuser', password='test123')
-
-
-@pytest.fixture
-def another_user(db):
-    return User.objects.create_user(username='another', password='test123')
-
-
-@pytest.fixture
-def auth_client(user):
-    client = APIClient()
-    client.force_authenticate(user=user)
-    return client
-
-
-@pytest.fixture
-def unauth_client():
-    return APIClient()
-
-
-@pytest.fixture
-def point_amsterdam(user):
-    return Point.objects.create(
-        created_by=user,
-        name="Amsterdam Centraal",
-        location=GeoPoint(4.900225, 52.379189, srid=4326)
-    )
-
-
-@pytest.fixture
-def another_point(another_user):
-    return Point.objects.create(
-        created_by=another_user,
-        name="Чужая точка",
-        location=GeoPoint(4.895, 52.370, srid=4326)
-    )
-
-
-@pytest.fixture
-def points(user):
-    coords = [
-        ("Центр", 4.895168, 52.370216),
-        ("Аэропорт", 4.763889, 52.308056),
-        ("Берлин", 13.4050, 52.5200),
-    ]
-
-    points_list = []
-    for name, lon, lat in coords:
-        point = Point.objects.create(
-            created_by=user,
-            name=name,
-            location=GeoPoint(lon, lat, srid=4326)
-        )
-        points_list.append(point)
-
-    return points_list
-
-
 @pytest.mark.django_db
 class TestPointAPI:
 
@@ -172,6 +110,78 @@ class TestPointAPI:
         assert resp.data['latitude'] == 52.379189
         assert resp.data['longitude'] == 4.900225
 
+    def test_move_point_moves_messages(self, auth_client, user, point_amsterdam):
+        message = Message.objects.create(
+            point=point_amsterdam, created_by=user, text="Тест"
+        )
+        assert message.location == point_amsterdam.location
+
+        resp = auth_client.patch(
+            f"/api/points/{point_amsterdam.id}/",
+            {"latitude": 48.8566, "longitude": 2.3522},
+            format="json",
+        )
+        assert resp.status_code == 200
+
+        message.refresh_from_db()
+        assert (message.location.x, message.location.y) == (2.3522, 48.8566)
+        resp = auth_client.get('/api/messages/search/', {
+            'latitude': 48.8566,
+            'longitude': 2.3522,
+            'radius': 1,
+        })
+        assert [item['id'] for item in resp.data['results']] == [message.id]
+
+    def test_orm_save_moves_messages(self, user, point_amsterdam):
+        message = Message.objects.create(
+            point=point_amsterdam, created_by=user, text="Тест"
+        )
+        point = Point.objects.get(pk=point_amsterdam.pk)
+
+        point.location = GeoPoint(2.3522, 48.8566, srid=4326)
+        point.save()
+
+        message.refresh_from_db()
+        assert (message.location.x, message.location.y) == (2.3522, 48.8566)
+
+    def test_admin_save_moves_messages(self, user, point_amsterdam):
+        message = Message.objects.create(
+            point=point_amsterdam, created_by=user, text="Тест"
+        )
+        point = Point.objects.get(pk=point_amsterdam.pk)
+        point.location = GeoPoint(2.3522, 48.8566, srid=4326)
+
+        PointAdmin(Point, admin.site).save_model(None, point, None, change=True)
+
+        message.refresh_from_db()
+        assert (message.location.x, message.location.y) == (2.3522, 48.8566)
+
+    def test_bulk_update_moves_messages(self, user, point_amsterdam):
+        message = Message.objects.create(
+            point=point_amsterdam, created_by=user, text="Тест"
+        )
+        point_amsterdam.location = GeoPoint(2.3522, 48.8566, srid=4326)
+
+        Point.objects.bulk_update([point_amsterdam], ['location'])
+
+        message.refresh_from_db()
+        assert (message.location.x, message.location.y) == (2.3522, 48.8566)
+
+    def test_rename_keeps_messages(self, user, point_amsterdam):
+        Message.objects.create(
+            point=point_amsterdam, created_by=user, text="Тест"
+        )
+        point = Point.objects.get(pk=point_amsterdam.pk)
+        point.name = "Новое название"
+
+        with CaptureQueriesContext(connection) as queries:
+            point.save()
+
+        assert not any(
+            query['sql'].startswith('UPDATE "core_message"')
+            for query in queries
+        )
+
 
 @pytest.mark.django_db
 class TestMessageAPI:
@@ -295,3 +305,128 @@ class TestMessageAPI:
             'radius': 10
         })
         assert resp.status_code == 401
+
+
+@pytest.mark.django_db
+class TestPointBulkAPI:
+
+    def test_bulk_create_success(self, auth_client, user):
+        data = [
+            {"name": f"Точка {i}", "latitude": 52.0 + i / 100, "longitude": 4.9}
+            for i in range(5)
+        ]
+        resp = auth_client.post('/api/points/bulk/', data, format='json')
+        assert resp.status_code == 201
+        assert resp.data['errors'] == []
+        assert len(resp.data['created']) == 5
+        assert all(item['id'] for item in resp.data['created'])
+        assert Point.objects.filter(created_by=user).count() == 5
+
+    def test_bulk_create_in_chunks(self, auth_client, settings):
+        settings.POINTS_BULK = {'MAX_ITEMS': 100, 'BATCH_SIZE': 2}
+        data = [{"latitude": 52.0, "longitude": 4.9} for _ in range(5)]
+        with CaptureQueriesContext(connection) as ctx:
+            resp = auth_client.post('/api/points/bulk/', data, format='json')
+        assert resp.status_code == 201
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        assert len(inserts) == 3
+
+    def test_bulk_create_partial_errors(self, auth_client):
+        data = [
+            {"name": "Хорошая", "latitude": 52.0, "longitude": 4.9},
+            {"name": "Плохая", "latitude": 95, "longitude": 4.9},
+            {"name": "Без координат"},
+        ]
+        resp = auth_client.post('/api/points/bulk/', data, format='json')
+        assert resp.status_code == 207
+        assert [item['name'] for item in resp.data['created']] == ["Хорошая"]
+        assert [item['index'] for item in resp.data['created']] == [0]
+        assert [error['index'] for error in resp.data['errors']] == [1, 2]
+        assert 'latitude' in resp.data['errors'][0]['errors']
+        assert Point.objects.count() == 1
+
+    def test_bulk_create_indexes_after_error(self, auth_client):
+        data = [
+            {"name": "Плохая", "latitude": 95, "longitude": 4.9},
+            {"name": "Первая", "latitude": 52.0, "longitude": 4.9},
+            {"name": "Вторая", "latitude": 53.0, "longitude": 4.9},
+        ]
+        resp = auth_client.post('/api/points/bulk/', data, format='json')
+        assert resp.status_code == 207
+        assert [
+            (item['index'], item['name']) for item in resp.data['created']
+        ] == [(1, "Первая"), (2, "Вторая")]
+
+    def test_bulk_create_all_invalid(self, auth_client):
+        data = [{"latitude": 95, "longitude": 4.9}]
+        resp = auth_client.post('/api/points/bulk/', data, format='json')
+        assert resp.status_code == 400
+        assert resp.data['created'] == []
+        assert Point.objects.count() == 0
+
+    @pytest.mark.parametrize('data', [{}, [], "точки"])
+    def test_bulk_create_invalid_body(self, auth_client, data):
+        resp = auth_client.post('/api/points/bulk/', data, format='json')
+        assert resp.status_code == 400
+
+    def test_bulk_create_too_many(self, auth_client, settings):
+        settings.POINTS_BULK = {'MAX_ITEMS': 2, 'BATCH_SIZE': 2}
+        data = [{"latitude": 52.0, "longitude": 4.9} for _ in range(3)]
+        resp = auth_client.post('/api/points/bulk/', data, format='json')
+        assert resp.status_code == 400
+        assert Point.objects.count() == 0
+
+    def test_bulk_create_unauth(self, unauth_client):
+        resp = unauth_client.post(
+            '/api/points/bulk/',
+            [{"latitude": 52.0, "longitude": 4.9}],
+            format='json',
+        )
+        assert resp.status_code == 401
+
+
+def read_stream(resp):
+    return b''.join(resp.streaming_content).decode('utf-8')
+
+
+@pytest.mark.django_db
+class TestPointExport:
+
+    def test_export_geojson_only_own_points(
+            self, auth_client, points, another_point):
+        resp = auth_client.get('/api/points/export/')
+        assert resp.status_code == 200
+        assert resp['Content-Type'] == 'application/geo+json'
+        data = json.loads(read_stream(resp))
+        assert data['type'] == 'FeatureCollection'
+        ids = [f['properties']['id'] for f in data['features']]
+        assert ids == sorted(p.id for p in points)
+        berlin = data['features'][2]
+        assert berlin['geometry']['coordinates'] == [13.4050, 52.5200]
+
+    def test_export_ndjson_with_messages(
+            self, auth_client, user, points, another_point):
+        Message.objects.create(point=another_point, created_by=user, text="Моё")
+        resp = auth_client.get('/api/points/export/', {
+            'output': 'ndjson',
+            'messages': 'true',
+        })
+        assert resp.status_code == 200
+        lines = read_stream(resp).splitlines()
+        features = [json.loads(line) for line in lines]
+        kinds = [f['properties']['kind'] for f in features]
+        assert kinds == ['point', 'point', 'point', 'message']
+        assert features[-1]['properties']['text'] == "Моё"
+        assert features[-1]['geometry']['coordinates'] == [4.895, 52.370]
+
+    def test_export_empty(self, auth_client):
+        resp = auth_client.get('/api/points/export/')
+        assert json.loads(read_stream(resp))['features'] == []
+
+    def test_export_invalid_output(self, auth_client):
+        resp = auth_client.get('/api/points/export/', {'output': 'xml'})
+        assert resp.status_code == 400
+
+    def test_export_unauth(self, unauth_client):
+        resp = unauth_client.get('/api/points/export/')
+        assert resp.status_code == 401
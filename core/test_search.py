@@ -0,0 +1,141 @@
+import pytest
+from django.contrib.gis.geos import Point as GeoPoint
+from django.db import connection
+from django.db.models.signals import post_init
+
+from core.models import Message, Point
+from core.search import k_nearest, within_radius
+
+CENTER = GeoPoint(4.89, 52.37, srid=4326)
+
+
+def force_index_scan():
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+
+
+@pytest.mark.django_db
+class TestRadiusSearchIndex:
+
+    def test_point_search_uses_geography_index(self, points):
+        force_index_scan()
+        queryset = within_radius(Point.objects.all(), 'location', CENTER, 10)
+        plan = queryset.order_by('distance').explain()
+        assert 'point_location_geog_idx' in plan
+
+    def test_message_search_uses_geography_index(self, user, points):
+        Message.objects.create(point=points[0], created_by=user, text="Тест")
+        force_index_scan()
+        queryset = within_radius(
+            Message.objects.all(), 'location', CENTER, 10
+        )
+        plan = queryset.order_by('distance').explain()
+        assert 'msg_location_geog_idx' in plan
+        assert 'core_point' not in plan
+
+    def test_radius_boundary_is_exact(self, user):
+        # 0.09° широты ≈ 10.0 км, 0.0895° ≈ 9.95 км
+        inside = Point.objects.create(
+            created_by=user,
+            location=GeoPoint(4.89, 52.37 + 0.0895, srid=4326),
+        )
+        Point.objects.create(
+            created_by=user,
+            location=GeoPoint(4.89, 52.37 + 0.0905, srid=4326),
+        )
+        found = list(
+            within_radius(Point.objects.all(), 'location', CENTER, 10)
+            .values_list('id', flat=True)
+        )
+        assert found == [inside.id]
+
+
+def create_messages(user, point, count):
+    Message.objects.bulk_create(
+        Message(
+            point=point, location=point.location, created_by=user,
+            text=f"Сообщение {i}",
+        )
+        for i in range(count)
+    )
+
+
+@pytest.mark.django_db
+class TestMessageSearchPagination:
+
+    @pytest.mark.parametrize('count', [100, 20000])
+    def test_only_requested_page_is_fetched(
+            self, auth_client, user, point_amsterdam,
+            django_assert_num_queries, count):
+        create_messages(user, point_amsterdam, count)
+        instances = []
+
+        def on_init(sender, instance, **kwargs):
+            instances.append(instance)
+
+        post_init.connect(on_init, sender=Message)
+        try:
+            with django_assert_num_queries(1):
+                resp = auth_client.get('/api/messages/search/', {
+                    'latitude': 52.37,
+                    'longitude': 4.89,
+                    'radius': 1000,
+                })
+        finally:
+            post_init.disconnect(on_init, sender=Message)
+
+        assert resp.status_code == 200
+        assert 'count' not in resp.data
+        assert len(resp.data['results']) == 20
+        # строки читаются через values(), модели не создаются вовсе
+        assert instances == []
+
+
+@pytest.mark.django_db
+class TestNearest:
+
+    def test_nearest_points_ordered_by_distance(self, auth_client, points):
+        resp = auth_client.get('/api/points/nearest/', {
+            'latitude': 52.37,
+            'longitude': 4.89,
+            'k': 2,
+        })
+        assert resp.status_code == 200
+        assert [item['name'] for item in resp.data] == ["Центр", "Аэропорт"]
+        assert resp.data[0]['distance_km'] <= resp.data[1]['distance_km']
+
+    def test_nearest_includes_other_users_points(
+            self, auth_client, points, another_point):
+        resp = auth_client.get('/api/points/nearest/', {
+            'latitude': 52.370,
+            'longitude': 4.895,
+            'k': 1,
+        })
+        assert resp.status_code == 200
+        assert resp.data[0]['id'] == another_point.id
+
+    def test_nearest_messages(self, auth_client, user, points):
+        far = Message.objects.create(point=points[2], created_by=user, text="Б")
+        near = Message.objects.create(point=points[0], created_by=user, text="Ц")
+        resp = auth_client.get('/api/messages/nearest/', {
+            'latitude': 52.37,
+            'longitude': 4.89,
+        })
+        assert resp.status_code == 200
+        assert [item['id'] for item in resp.data] == [near.id, far.id]
+
+    @pytest.mark.parametrize('params', [
+        {'latitude': 52.37},
+        {'latitude': 52.37, 'longitude': 4.89, 'k': 0},
+        {'latitude': 52.37, 'longitude': 4.89, 'k': 1000},
+        {'latitude': 52.37, 'longitude': 200},
+    ])
+    def test_nearest_invalid_params(self, auth_client, params):
+        resp = auth_client.get('/api/points/nearest/', params)
+        assert resp.status_code == 400
+
+    def test_nearest_uses_knn_index_scan(self, points):
+        force_index_scan()
+        queryset = k_nearest(Point.objects.all(), 'location', CENTER, 2)
+        plan = queryset.explain()
+        assert 'point_location_geog_idx' in plan
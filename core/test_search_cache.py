@@ -0,0 +1,119 @@
+import pytest
+from django.contrib.gis.geos import Point as GeoPoint
+from django.core.cache import caches
+
+from core.models import Point
+
+SEARCH = {'latitude': 52.3701, 'longitude': 4.8901, 'radius': 10}
+JITTERED = {'latitude': 52.37012, 'longitude': 4.89008, 'radius': 10.1}
+SNAPPED = {'latitude': 52.37, 'longitude': 4.89, 'radius': 10}
+
+
+@pytest.fixture
+def search_cache(settings):
+    settings.CACHES = {
+        **settings.CACHES,
+        'search': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'test-search',
+        },
+    }
+    settings.SEARCH_CACHE = {'ENABLED': True, 'ALIAS': 'search'}
+    caches['search'].clear()
+    yield caches['search']
+    caches['search'].clear()
+
+
+@pytest.mark.django_db
+class TestSearchCache:
+
+    def test_same_request_hits_cache(self, auth_client, points, search_cache):
+        first = auth_client.get('/api/points/search/', SEARCH)
+        second = auth_client.get('/api/points/search/', SEARCH)
+        assert first['X-Cache'] == 'MISS'
+        assert second['X-Cache'] == 'HIT'
+        assert second.data['results'] == first.data['results']
+
+    def test_jittered_request_hits_cache(
+            self, auth_client, points, search_cache, settings):
+        auth_client.get('/api/points/search/', SEARCH)
+        resp = auth_client.get('/api/points/search/', JITTERED)
+        settings.SEARCH_CACHE = {'ENABLED': False}
+        snapped = auth_client.get('/api/points/search/', SNAPPED)
+        assert resp['X-Cache'] == 'HIT'
+        assert resp['X-Search-Center'] == '52.37,4.89'
+        assert resp['X-Search-Radius'] == '10.0'
+        assert resp.data['results'] == snapped.data['results']
+
+    def test_small_radius_rounded_to_step(
+            self, auth_client, user, points, search_cache):
+        # Точка примерно в 300 м от центра попадает в круг 0.5 км, до
+        # которого округляется радиус 0.2 км.
+        Point.objects.create(
+            created_by=user, name='Рядом',
+            location=GeoPoint(4.8945, 52.3728, srid=4326),
+        )
+        params = {'latitude': 52.370216, 'longitude': 4.895168, 'radius': 0.2}
+        resp = auth_client.get('/api/points/search/', params)
+        assert resp['X-Search-Radius'] == '0.5'
+        assert [item['name'] for item in resp.data['results']] == [
+            'Центр', 'Рядом'
+        ]
+
+    def test_nearby_point_invalidates(
+            self, auth_client, user, points, search_cache,
+            django_capture_on_commit_callbacks):
+        auth_client.get('/api/points/search/', SEARCH)
+        with django_capture_on_commit_callbacks(execute=True):
+            Point.objects.create(
+                created_by=user,
+                name="Новая",
+                location=GeoPoint(4.8902, 52.3702, srid=4326),
+            )
+        resp = auth_client.get('/api/points/search/', SEARCH)
+        assert resp['X-Cache'] == 'MISS'
+        assert "Новая" in [item['name'] for item in resp.data['results']]
+
+    def test_moved_point_invalidates_old_cell(
+            self, auth_client, points, search_cache,
+            django_capture_on_commit_callbacks):
+        auth_client.get('/api/points/search/', SEARCH)
+        center = points[0]
+        with django_capture_on_commit_callbacks(execute=True):
+            center.location = GeoPoint(30.0, 60.0, srid=4326)
+            center.save()
+        resp = auth_client.get('/api/points/search/', SEARCH)
+        assert resp['X-Cache'] == 'MISS'
+        assert center.id not in [item['id'] for item in resp.data['results']]
+
+    def test_far_point_keeps_cache(
+            self, auth_client, user, points, search_cache,
+            django_capture_on_commit_callbacks):
+        auth_client.get('/api/points/search/', SEARCH)
+        with django_capture_on_commit_callbacks(execute=True):
+            Point.objects.create(
+                created_by=user,
+                location=GeoPoint(37.61, 55.75, srid=4326),
+            )
+        resp = auth_client.get('/api/points/search/', SEARCH)
+        assert resp['X-Cache'] == 'HIT'
+
+    def test_message_invalidates_message_search(
+            self, auth_client, user, point_amsterdam, search_cache,
+            django_capture_on_commit_callbacks):
+        auth_client.get('/api/messages/search/', SEARCH)
+        with django_capture_on_commit_callbacks(execute=True):
+            resp = auth_client.post('/api/points/messages/', {
+                'point_id': point_amsterdam.id,
+                'text': "Новое сообщение",
+            }, format='json')
+        assert resp.status_code == 201
+        resp = auth_client.get('/api/messages/search/', SEARCH)
+        assert resp['X-Cache'] == 'MISS'
+        assert len(resp.data['results']) == 1
+
+    def test_cursor_is_part_of_key(self, auth_client, points, search_cache):
+        auth_client.get('/api/points/search/', SEARCH)
+        resp = auth_client.get('/api/points/search/', {**SEARCH, 'count': 'true'})
+        assert resp['X-Cache'] == 'MISS'
+        assert resp.data['count'] == 1
@@ -0,0 +1,83 @@
+import pytest
+from django.contrib.gis.geos import Point as GeoPoint
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Message, Point
+from core.search import within_radius
+from core.serializers import (
+    MessageReadSerializer,
+    MessageSerializer,
+    PointReadSerializer,
+    PointSerializer,
+)
+
+CENTER = GeoPoint(4.89, 52.37, srid=4326)
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+@pytest.mark.django_db
+class TestReadSerializers:
+
+    def test_points_match_model_serializer(self, points):
+        Point.objects.create(
+            name='', location=GeoPoint(-0.1234567, -33.7654321, srid=4326),
+            created_by=points[0].created_by,
+        )
+        queryset = Point.objects.order_by('id')
+
+        expected = PointSerializer(queryset, many=True).data
+        actual = PointReadSerializer(
+            PointReadSerializer.project(queryset), many=True
+        ).data
+
+        assert render(actual) == render(expected)
+
+    def test_points_with_distance_match(self, points):
+        queryset = within_radius(
+            Point.objects.all(), 'location', CENTER, 1000
+        ).order_by('distance', 'id')
+
+        expected = PointSerializer(queryset, many=True).data
+        actual = PointReadSerializer(
+            within_radius(
+                PointReadSerializer.project(Point.objects.all()),
+                'location', CENTER, 1000,
+            ).order_by('distance', 'id'),
+            many=True,
+        ).data
+
+        assert render(actual) == render(expected)
+
+    def test_messages_match_model_serializer(self, user, points):
+        unnamed = Point.objects.create(
+            name='', location=GeoPoint(4.9, 52.4, srid=4326), created_by=user
+        )
+        for point in [*points, unnamed]:
+            Message.objects.create(
+                point=point, text=f'Сообщение у {point.pk}', created_by=user
+            )
+
+        queryset = within_radius(
+            Message.objects.select_related('point'),
+            'point__location', CENTER, 1000,
+        ).order_by('distance', 'id')
+
+        expected = MessageSerializer(queryset, many=True).data
+        actual = MessageReadSerializer(
+            within_radius(
+                MessageReadSerializer.project(Message.objects.all()),
+                'location', CENTER, 1000,
+            ).order_by('distance', 'id'),
+            many=True,
+        ).data
+
+        assert render(actual) == render(expected)
+
+    def test_retrieve_uses_read_serializer(self, auth_client, point_amsterdam):
+        resp = auth_client.get(f'/api/points/{point_amsterdam.pk}/')
+
+        assert resp.status_code == 200
+        assert resp.content == render(PointSerializer(point_amsterdam).data)
@@ -0,0 +1,209 @@
+import random
+
+import pytest
+from django.contrib.gis.geos import Point as GeoPoint
+
+from core.models import Point
+from core.spatial_index import GridIndex, geodesic_m, reset_spatial_index
+
+
+@pytest.fixture
+def spatial_index_enabled(settings):
+    settings.SPATIAL_INDEX = {'ENABLED': True, 'CELL_SIZE': 0.1, 'MAX_AGE': 0}
+    reset_spatial_index()
+    yield
+    reset_spatial_index()
+
+
+def brute_force(rows, lon, lat, radius_m):
+    hits = []
+    for point_id, p_lon, p_lat, _ in rows:
+        distance = geodesic_m(lon, lat, p_lon, p_lat)
+        if distance <= radius_m:
+            hits.append((distance, point_id))
+    return sorted(hits)
+
+
+class TestGridIndex:
+
+    @pytest.mark.parametrize('lon, lat', [
+        (4.89, 52.37),
+        (179.95, 0.0),
+        (-179.95, 10.0),
+        (30.0, 89.5),
+    ])
+    def test_matches_brute_force(self, lon, lat):
+        rng = random.Random(1)
+        rows = [
+            (i, rng.uniform(-180, 180), rng.uniform(-90, 90), 1)
+            for i in range(5000)
+        ]
+        rows += [
+            (5000 + i, lon + rng.uniform(-2, 2), lat + rng.uniform(-0.4, 0.4), 1)
+            for i in range(500)
+        ]
+        rows = [
+            (i, (x + 180) % 360 - 180, max(-90, min(90, y)), owner)
+            for i, x, y, owner in rows
+        ]
+        index = GridIndex(cell_size=0.5)
+        index.load(rows)
+        for radius_m in (1000, 50_000, 1_000_000):
+            assert index.search(lon, lat, radius_m) == brute_force(
+                rows, lon, lat, radius_m
+            )
+
+    def test_add_move_remove(self):
+        index = GridIndex(cell_size=0.1)
+        index.load([])
+        index.add(1, 4.89, 52.37, 1)
+        assert [pid for _, pid in index.search(4.89, 52.37, 100)] == [1]
+
+        index.add(1, 13.40, 52.52, 1)
+        assert index.search(4.89, 52.37, 100) == []
+        assert len(index) == 1
+
+        index.remove(1)
+        assert index.search(13.40, 52.52, 100) == []
+        assert len(index) == 0
+
+    @pytest.mark.parametrize('lon1, lat1, lon2, lat2, expected', [
+        # Эталон - GeographicLib (им же считает PostGIS).
+        (0, 0, 0, 1, 110574.389),
+        (0, 0, 1, 0, 111319.491),
+        (4.895168, 52.370216, 4.763889, 52.308056, 11309.418),
+    ])
+    def test_geodesic_matches_spheroid(self, lon1, lat1, lon2, lat2, expected):
+        assert geodesic_m(lon1, lat1, lon2, lat2) == pytest.approx(
+            expected, abs=0.001
+        )
+
+    def test_memory_budget_overflow(self):
+        index = GridIndex(cell_size=0.1, max_points=2)
+        index.load([(i, 0.0, 0.0, 1) for i in range(3)])
+        assert index.overflow
+
+
+@pytest.mark.django_db
+class TestIndexedSearch:
+
+    def test_same_results_as_database(
+            self, auth_client, points, another_point, settings):
+        params = {'latitude': 52.37, 'longitude': 4.89, 'radius': 50}
+        from_db = auth_client.get('/api/points/search/', params).data
+
+        settings.SPATIAL_INDEX = {'ENABLED': True, 'MAX_AGE': 0}
+        reset_spatial_index()
+        try:
+            from_index = auth_client.get('/api/points/search/', params).data
+        finally:
+            reset_spatial_index()
+
+        assert [item['id'] for item in from_index['results']] == [
+            item['id'] for item in from_db['results']
+        ]
+
+    def test_index_matches_database_exactly(self, auth_client, user, settings):
+        rng = random.Random(3)
+        center = (4.89, 52.37)
+        Point.objects.bulk_create([
+            Point(created_by=user, location=GeoPoint(
+                center[0] + rng.uniform(-0.5, 0.5),
+                center[1] + rng.uniform(-0.3, 0.3),
+                srid=4326,
+            ))
+            for _ in range(300)
+        ])
+        # Радиус ровно до одной из точек: она лежит на самой границе круга.
+        edge = Point.objects.order_by('id')[150]
+        radius_km = geodesic_m(*center, edge.location.x, edge.location.y) / 1000
+        params = {
+            'latitude': center[1], 'longitude': center[0], 'radius': radius_km,
+        }
+
+        def all_pages():
+            rows = []
+            resp = auth_client.get('/api/points/search/', params)
+            while True:
+                rows.extend(
+                    (item['id'], item['distance_km'])
+                    for item in resp.data['results']
+                )
+                if not resp.data['next']:
+                    return rows
+                resp = auth_client.get(resp.data['next'])
+
+        from_db = all_pages()
+        settings.SPATIAL_INDEX = {'ENABLED': True, 'MAX_AGE': 0}
+        reset_spatial_index()
+        try:
+            from_index = all_pages()
+        finally:
+            reset_spatial_index()
+
+        assert edge.id in [point_id for point_id, _ in from_db]
+        assert from_index == from_db
+
+    def test_cursor_continues_on_its_own_path(
+            self, auth_client, user, settings):
+        Point.objects.bulk_create([
+            Point(
+                created_by=user,
+                location=GeoPoint(4.89 + i * 1e-4, 52.37, srid=4326),
+            )
+            for i in range(30)
+        ])
+        params = {'latitude': 52.37, 'longitude': 4.89, 'radius': 5}
+        db_next = auth_client.get('/api/points/search/', params).data['next']
+
+        settings.SPATIAL_INDEX = {'ENABLED': True, 'MAX_AGE': 0}
+        reset_spatial_index()
+        try:
+            # Курсор из БД дочитывается через БД и при включённом индексе.
+            assert len(auth_client.get(db_next).data['results']) == 10
+            index_next = auth_client.get(
+                '/api/points/search/', params
+            ).data['next']
+        finally:
+            reset_spatial_index()
+
+        settings.SPATIAL_INDEX = {'ENABLED': False}
+        assert auth_client.get(index_next).status_code == 404
+
+    def test_large_radius_uses_database(
+            self, auth_client, points, spatial_index_enabled, settings,
+            monkeypatch):
+        settings.SPATIAL_INDEX = {
+            **settings.SPATIAL_INDEX, 'MAX_RADIUS_KM': 20,
+        }
+
+        def no_index():
+            raise AssertionError('индекс не должен использоваться')
+
+        monkeypatch.setattr('core.views.get_spatial_index', no_index)
+        params = {'latitude': 52.37, 'longitude': 4.89, 'radius': 700}
+        resp = auth_client.get('/api/points/search/', params)
+
+        assert resp.status_code == 200
+        assert len(resp.data['results']) == 3
+
+    def test_index_follows_point_changes(
+            self, auth_client, user, spatial_index_enabled,
+            django_capture_on_commit_callbacks):
+        params = {'latitude': 52.37, 'longitude': 4.89, 'radius': 5}
+        assert auth_client.get('/api/points/search/', params).data[
+            'results'] == []
+
+        with django_capture_on_commit_callbacks(execute=True):
+            resp = auth_client.post('/api/points/', {
+                'latitude': 52.371,
+                'longitude': 4.891,
+            }, format='json')
+        point_id = resp.data['id']
+        results = auth_client.get('/api/points/search/', params).data['results']
+        assert [item['id'] for item in results] == [point_id]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Point.objects.filter(pk=point_id).get().delete()
+        assert auth_client.get('/api/points/search/', params).data[
+            'results'] == []
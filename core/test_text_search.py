@@ -0,0 +1,151 @@
+import pytest
+from django.db import connection
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models import Message
+from core.search import match_text, within_radius
+
+URL = '/api/messages/search/'
+CENTER = {'latitude': 52.370216, 'longitude': 4.895168, 'radius': 20}
+
+
+@pytest.fixture
+def messages(user, points):
+    center, airport, _ = points
+    texts = [
+        (center, 'Бесплатная парковка у вокзала'),
+        (center, 'Хороший кофе рядом'),
+        (airport, 'Парковка, парковка и ещё раз парковка'),
+        (airport, 'Free parking near the terminal'),
+    ]
+    return [
+        Message.objects.create(point=point, text=text, created_by=user)
+        for point, text in texts
+    ]
+
+
+def texts(resp):
+    return [row['text'] for row in resp.data['results']]
+
+
+@pytest.mark.django_db
+class TestTextSearch:
+
+    def test_russian_morphology(self, auth_client, messages):
+        resp = auth_client.get(URL, {**CENTER, 'q': 'парковки', 'rank': 'distance'})
+
+        assert resp.status_code == 200
+        assert texts(resp) == [
+            'Бесплатная парковка у вокзала',
+            'Парковка, парковка и ещё раз парковка',
+        ]
+
+    def test_english_morphology(self, auth_client, messages):
+        resp = auth_client.get(URL, {**CENTER, 'q': 'parked'})
+
+        assert texts(resp) == ['Free parking near the terminal']
+
+    def test_websearch_syntax(self, auth_client, messages):
+        resp = auth_client.get(URL, {**CENTER, 'q': 'кофе or parking'})
+
+        assert sorted(texts(resp)) == [
+            'Free parking near the terminal', 'Хороший кофе рядом',
+        ]
+
+    def test_relevance_is_default(self, auth_client, messages):
+        resp = auth_client.get(URL, {**CENTER, 'q': 'парковка'})
+
+        assert texts(resp)[0] == 'Парковка, парковка и ещё раз парковка'
+
+    def test_blend_prefers_nearby(self, auth_client, messages):
+        # Аэропорт примерно в 11 км от центра: при радиусе 12 км его
+        # релевантность почти вдвое меньше, и ближнее сообщение первое.
+        resp = auth_client.get(
+            URL, {**CENTER, 'radius': 12, 'q': 'парковка', 'rank': 'blend'}
+        )
+
+        assert texts(resp)[0] == 'Бесплатная парковка у вокзала'
+
+    def test_radius_still_applies(self, auth_client, messages):
+        resp = auth_client.get(URL, {**CENTER, 'radius': 1, 'q': 'парковка'})
+
+        assert texts(resp) == ['Бесплатная парковка у вокзала']
+
+    def test_without_q_unchanged(self, auth_client, messages):
+        resp = auth_client.get(URL, CENTER)
+
+        assert len(texts(resp)) == 4
+
+    @pytest.mark.parametrize('rank', ['relevance', 'blend'])
+    def test_keyset_pagination(self, auth_client, user, points, rank):
+        # Одинаковые тексты дают одинаковый rank, порядок внутри - по id.
+        Message.objects.bulk_create([
+            Message(
+                point=points[number % 2], location=points[number % 2].location,
+                text='парковка ' * (number % 3 + 1), created_by=user,
+            )
+            for number in range(45)
+        ])
+
+        seen = []
+        resp = auth_client.get(URL, {**CENTER, 'q': 'парковка', 'rank': rank})
+        while True:
+            seen.extend(row['id'] for row in resp.data['results'])
+            if not resp.data['next']:
+                break
+            resp = auth_client.get(resp.data['next'])
+
+        assert len(seen) == len(set(seen)) == 45
+
+    @pytest.mark.parametrize('params', [
+        {'rank': 'relevance'},
+        {'rank': 'blend'},
+        {'rank': 'popular', 'q': 'парковка'},
+        {'q': 'x' * 201},
+    ])
+    def test_invalid_params(self, auth_client, params):
+        resp = auth_client.get(URL, {**CENTER, **params})
+
+        assert resp.status_code == 400
+
+    def test_async_view(self, user, messages):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}'
+        )
+
+        resp = client.get(
+            '/api/async/messages/search/', {**CENTER, 'q': 'parking'}
+        )
+
+        assert [row['text'] for row in resp.json()['results']] == [
+            'Free parking near the terminal'
+        ]
+
+
+@pytest.mark.django_db
+class TestTextSearchIndex:
+
+    def test_search_vector_has_gin_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexdef FROM pg_indexes "
+                "WHERE indexname = 'msg_search_vector_idx'"
+            )
+            indexdef, = cursor.fetchone()
+
+        assert 'gin' in indexdef.lower()
+
+    def test_plan_can_use_text_index(self, user, points):
+        queryset = match_text(
+            within_radius(Message.objects.all(), 'location', points[0].location, 5),
+            'парковка', 'distance', 5,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f'EXPLAIN {sql}', params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+
+        assert 'msg_search_vector_idx' in plan or 'msg_location_geog_idx' in plan
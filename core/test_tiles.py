@@ -0,0 +1,162 @@
+import pytest
+from django.contrib.gis.geos import Point as GeoPoint
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Point
+from core.tiles import tile_bounds, tiles_of
+
+ZOOM = 10
+
+
+def tile_url(lon, lat, z=ZOOM):
+    (x, y), = tiles_of(lon, lat, z)
+    return f'/api/tiles/{z}/{x}/{y}.mvt'
+
+
+@pytest.fixture
+def tile_cache(settings):
+    settings.TILE_CACHE = {'ENABLED': True, 'ALIAS': 'tiles', 'MAX_ZOOM': 14}
+    caches['tiles'].clear()
+    yield caches['tiles']
+    caches['tiles'].clear()
+
+
+def test_tiles_of_matches_bounds():
+    (x, y), = tiles_of(4.900225, 52.379189, ZOOM)
+    west, south, east, north = tile_bounds(ZOOM, x, y)
+
+    assert west <= 4.900225 < east
+    assert south <= 52.379189 < north
+
+
+def test_tiles_of_with_buffer_near_edge():
+    (x, y), = tiles_of(4.900225, 52.379189, ZOOM)
+    west, south, _, _ = tile_bounds(ZOOM, x, y)
+
+    tiles = tiles_of(west + 1e-6, south + 1e-6, ZOOM, margin=0.1)
+
+    assert sorted(tiles) == [(x - 1, y), (x - 1, y + 1), (x, y), (x, y + 1)]
+
+
+@pytest.mark.django_db
+class TestTiles:
+
+    def test_own_points_only(self, auth_client, point_amsterdam, another_point):
+        resp = auth_client.get(tile_url(4.900225, 52.379189))
+
+        assert resp.status_code == 200
+        assert resp['Content-Type'] == 'application/vnd.mapbox-vector-tile'
+        assert b'Amsterdam Centraal' in resp.content
+        assert 'Чужая точка'.encode() not in resp.content
+
+    def test_empty_tile(self, auth_client, point_amsterdam):
+        resp = auth_client.get(tile_url(-74.006, 40.7128))
+
+        assert resp.status_code == 204
+        assert resp.content == b''
+
+    def test_accept_mvt(self, auth_client, point_amsterdam):
+        resp = auth_client.get(
+            tile_url(4.900225, 52.379189),
+            HTTP_ACCEPT='application/vnd.mapbox-vector-tile',
+        )
+
+        assert resp.status_code == 200
+
+    @pytest.mark.parametrize('url', [
+        '/api/tiles/23/0/0.mvt',
+        '/api/tiles/2/4/0.mvt',
+        '/api/tiles/2/0/4.mvt',
+    ])
+    def test_out_of_range(self, auth_client, url):
+        assert auth_client.get(url).status_code == 404
+
+    def test_requires_auth(self, unauth_client):
+        assert unauth_client.get('/api/tiles/0/0/0.mvt').status_code == 401
+
+
+@pytest.mark.django_db
+class TestTileCache:
+
+    def test_hit(self, auth_client, point_amsterdam, tile_cache):
+        url = tile_url(4.900225, 52.379189)
+        first = auth_client.get(url)
+
+        with CaptureQueriesContext(connection) as queries:
+            second = auth_client.get(url)
+
+        assert first['X-Cache'] == 'MISS'
+        assert second['X-Cache'] == 'HIT'
+        assert second.content == first.content
+        assert len(queries) == 0
+
+    def test_cache_is_per_user(
+            self, auth_client, point_amsterdam, another_user, tile_cache):
+        url = tile_url(4.900225, 52.379189)
+        auth_client.get(url)
+        auth_client.force_authenticate(user=another_user)
+
+        resp = auth_client.get(url)
+
+        assert resp['X-Cache'] == 'MISS'
+        assert resp.status_code == 204
+
+    def test_point_in_tile_invalidates(
+            self, auth_client, user, point_amsterdam, tile_cache,
+            django_capture_on_commit_callbacks):
+        url = tile_url(4.900225, 52.379189)
+        auth_client.get(url)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Point.objects.create(
+                created_by=user, name='Новая точка',
+                location=GeoPoint(4.9, 52.38, srid=4326),
+            )
+        resp = auth_client.get(url)
+
+        assert resp['X-Cache'] == 'MISS'
+        assert 'Новая точка'.encode() in resp.content
+
+    def test_far_point_keeps_tile(
+            self, auth_client, user, point_amsterdam, tile_cache,
+            django_capture_on_commit_callbacks):
+        url = tile_url(4.900225, 52.379189)
+        auth_client.get(url)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Point.objects.create(
+                created_by=user, location=GeoPoint(13.405, 52.52, srid=4326),
+            )
+
+        assert auth_client.get(url)['X-Cache'] == 'HIT'
+
+    def test_bulk_create_bumps_one_key(
+            self, auth_client, point_amsterdam, tile_cache, monkeypatch,
+            django_capture_on_commit_callbacks):
+        url = tile_url(4.900225, 52.379189)
+        auth_client.get(url)
+        incr = []
+        original = tile_cache.incr
+        monkeypatch.setattr(
+            tile_cache, 'incr', lambda key, *args: incr.append(key) or original(key)
+        )
+
+        with django_capture_on_commit_callbacks(execute=True):
+            auth_client.post('/api/points/bulk/', [
+                {'name': f'Пачка {number}', 'latitude': 52.38, 'longitude': 4.9}
+                for number in range(50)
+            ], format='json')
+        resp = auth_client.get(url)
+
+        assert incr == ['tile-gen:all']
+        assert resp['X-Cache'] == 'MISS'
+        assert 'Пачка 0'.encode() in resp.content
+
+    def test_not_cached_above_max_zoom(
+            self, auth_client, point_amsterdam, tile_cache):
+        resp = auth_client.get(tile_url(4.900225, 52.379189, z=15))
+
+        assert resp.status_code == 200
+        assert 'X-Cache' not in resp
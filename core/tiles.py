@@ -0,0 +1,150 @@
+import math
+
+from django.conf import settings
+from django.contrib.gis.db import models
+from django.contrib.gis.geos import Polygon
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Func
+from django.http import Http404
+from rest_framework.renderers import BaseRenderer
+
+from .search_cache import bump_keys, read_generations
+
+MVT_EXTENT = 4096
+MVT_BUFFER = 64
+MVT_LAYER = 'points'
+MAX_TILE_ZOOM = 22
+MAX_MERCATOR_LAT = 85.0511287798
+GENERATION_KEY = 'tile-gen:{}:{}:{}'
+# Общее поколение всех тайлов: пачки точек сбрасывают его одним incr
+# вместо счётчика каждого тайла на каждом зуме.
+GLOBAL_GENERATION_KEY = 'tile-gen:all'
+
+
+def tile_settings():
+    return getattr(settings, 'TILE_CACHE', {})
+
+
+def get_cache():
+    return caches[tile_settings().get('ALIAS', 'tiles')]
+
+
+class MVTRenderer(BaseRenderer):
+    # Тайл отдаётся готовыми байтами; нужен, чтобы согласование формата DRF
+    # не отвечало 406 на Accept: application/vnd.mapbox-vector-tile.
+    media_type = 'application/vnd.mapbox-vector-tile'
+    format = 'mvt'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data if isinstance(data, bytes) else b''
+
+
+class AsMVTGeom(Func):
+    function = 'ST_AsMVTGeom'
+    template = (
+        '%(function)s(ST_Transform(%(expressions)s, 3857), '
+        'ST_TileEnvelope(%(z)d, %(x)d, %(y)d), %(extent)d, %(buffer)d, true)'
+    )
+    output_field = models.GeometryField(srid=3857)
+
+
+def check_tile(z, x, y):
+    if not (0 <= z <= MAX_TILE_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise Http404
+
+
+def tile_bounds(z, x, y, margin=0.0):
+    # (west, south, east, north) тайла в градусах, margin - доля тайла
+    # с каждой стороны.
+    n = 2 ** z
+
+    def lon(column):
+        return column / n * 360 - 180
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lon(x - margin), lat(y + 1 + margin), lon(x + 1 + margin), lat(y - margin)
+
+
+def tiles_of(lon, lat, z, margin=0.0):
+    # Тайлы зума z, в которые вместе с буфером попадает точка.
+    n = 2 ** z
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    column = (lon + 180) / 360 * n
+    row = (1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n
+
+    def covering(value):
+        return range(
+            max(math.floor(value - margin), 0),
+            min(math.floor(value + margin), n - 1) + 1,
+        )
+
+    return [(x, y) for x in covering(column) for y in covering(row)]
+
+
+def render_tile(queryset, z, x, y):
+    # && по рамке тайла с буфером идёт по GiST-индексу геометрии, а тайл
+    # целиком собирает ST_AsMVT в базе.
+    envelope = Polygon.from_bbox(tile_bounds(z, x, y, MVT_BUFFER / MVT_EXTENT))
+    envelope.srid = 4326
+    rows = (
+        queryset
+        .filter(location__bboverlaps=envelope)
+        .annotate(geom=AsMVTGeom(
+            'location', z=z, x=x, y=y, extent=MVT_EXTENT, buffer=MVT_BUFFER,
+        ))
+        .values('id', 'name', 'geom')
+        .order_by()
+    )
+    sql, params = rows.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT ST_AsMVT(tile, %s, %s, 'geom', 'id') FROM ({sql}) AS tile",
+            [MVT_LAYER, MVT_EXTENT, *params],
+        )
+        tile = cursor.fetchone()[0]
+    return bytes(tile or b'')
+
+
+def cached_tile(request, z, x, y, render):
+    config = tile_settings()
+    if not config.get('ENABLED') or z > config.get('MAX_ZOOM', 14):
+        return render(), None
+
+    cache = get_cache()
+    generation, global_generation = read_generations(
+        cache, [GENERATION_KEY.format(z, x, y), GLOBAL_GENERATION_KEY]
+    )
+    key = f'tile:{request.user.pk}:{z}:{x}:{y}:{generation}:{global_generation}'
+    tile = cache.get(key)
+    if tile is not None:
+        return tile, 'HIT'
+
+    tile = render()
+    cache.set(key, tile, config.get('TIMEOUT', 3600))
+    return tile, 'MISS'
+
+
+def bump_tiles(locations):
+    # Поколение общее для всех пользователей: изменение точки сбрасывает
+    # тайлы с ней на всех зумах, которые кэшируются.
+    config = tile_settings()
+    if not config.get('ENABLED'):
+        return
+    margin = MVT_BUFFER / MVT_EXTENT
+    keys = {
+        GENERATION_KEY.format(z, x, y)
+        for location in locations
+        if location is not None
+        for z in range(config.get('MAX_ZOOM', 14) + 1)
+        for x, y in tiles_of(location.x, location.y, z, margin)
+    }
+    bump_keys(get_cache(), keys)
+
+
+def bump_all_tiles():
+    if tile_settings().get('ENABLED'):
+        bump_keys(get_cache(), [GLOBAL_GENERATION_KEY])
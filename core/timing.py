@@ -0,0 +1,97 @@
+import contextvars
+import time
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.durations = {}
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.add('db', time.perf_counter() - started)
+
+
+def wrap_connections(stack, timings):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(timings.execute_wrapper))
+
+
+@contextmanager
+def instrumented(request):
+    # Один набор счётчиков на запрос: если внешний middleware уже начал
+    # замер, внутренние используют его же.
+    timings = getattr(request, 'timings', None)
+    if timings is not None:
+        yield timings
+        return
+
+    timings = request.timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        with ExitStack() as stack:
+            wrap_connections(stack, timings)
+            yield timings
+    finally:
+        _current.reset(token)
+
+
+@asynccontextmanager
+async def ainstrumented(request):
+    # То же для ASGI. Соединения с БД привязаны к потоку, а асинхронный ORM
+    # выполняет запросы в потоке sync_to_async(thread_sensitive=True) этого
+    # запроса, поэтому обёртки ставятся и снимаются в нём же.
+    timings = getattr(request, 'timings', None)
+    if timings is not None:
+        yield timings
+        return
+
+    timings = request.timings = RequestTimings()
+    token = _current.set(timings)
+    stack = ExitStack()
+    try:
+        await sync_to_async(wrap_connections)(stack, timings)
+        yield timings
+    finally:
+        await sync_to_async(stack.close)()
+        _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    db_before = timings.durations.get('db', 0.0)
+    try:
+        yield
+    finally:
+        # Запросы ленивых QuerySet внутри блока уже учтены в db.
+        db_inside = timings.durations.get('db', 0.0) - db_before
+        timings.add(name, time.perf_counter() - started - db_inside)
+
+
+class TimedDataMixin:
+    # serializer.data вызывается только у сериализатора верхнего уровня,
+    # поэтому вложенные и элементы списка не считаются дважды.
+
+    @property
+    def data(self):
+        with timed('serialize'):
+            return super().data
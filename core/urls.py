@@ -1,20 +1,42 @@
 from django.urls import path
 
-from .views import MessageViewSet, PointViewSet
+from . import async_views
+from .views import MessageViewSet, PointViewSet, db_pool_stats
 
 points_search_view = PointViewSet.as_view({'get': 'search'})
 messages_search_view = MessageViewSet.as_view({'get': 'search'})
+points_nearest_view = PointViewSet.as_view({'get': 'nearest'})
+messages_nearest_view = MessageViewSet.as_view({'get': 'nearest'})
+points_bbox_view = PointViewSet.as_view({'get': 'bbox'})
+messages_bbox_view = MessageViewSet.as_view({'get': 'bbox'})
+points_clusters_view = PointViewSet.as_view({'get': 'clusters'})
+point_tile_view = PointViewSet.as_view({'get': 'tile'}, **PointViewSet.tile.kwargs)
 
 urlpatterns = [
     path('points/', PointViewSet.as_view({
         'post': 'create',
         'get': 'list'
     }), name='point-list-create'),
+    path('points/bulk/', PointViewSet.as_view({
+        'post': 'bulk'
+    }), name='points-bulk'),
+    path('points/export/', PointViewSet.as_view({
+        'get': 'export'
+    }), name='points-export'),
     path('points/messages/', MessageViewSet.as_view({
         'post': 'create'
     }), name='message-create'),
     path('points/search/', points_search_view, name='points-search'),
     path('messages/search/', messages_search_view, name='messages-search'),
+    path('points/nearest/', points_nearest_view, name='points-nearest'),
+    path('messages/nearest/', messages_nearest_view, name='messages-nearest'),
+    path('points/search/batch/', PointViewSet.as_view({
+        'post': 'search_batch'
+    }), name='points-search-batch'),
+    path('points/bbox/', points_bbox_view, name='points-bbox'),
+    path('messages/bbox/', messages_bbox_view, name='messages-bbox'),
+    path('points/clusters/', points_clusters_view, name='points-clusters'),
+    path('tiles/<int:z>/<int:x>/<int:y>.mvt', point_tile_view, name='point-tile'),
     path('points/<int:pk>/', PointViewSet.as_view({
         'get': 'retrieve',
         'put': 'update',
@@ -26,4 +48,19 @@ urlpatterns = [
         'get': 'retrieve',
         'delete': 'destroy'
     }), name='message-detail'),
+
+    path('db/pool/', db_pool_stats, name='db-pool-stats'),
+
+    path('async/points/', async_views.PointListView.as_view(),
+         name='async-point-list-create'),
+    path('async/points/search/', async_views.PointSearchView.as_view(),
+         name='async-points-search'),
+    path('async/points/<int:pk>/', async_views.PointDetailView.as_view(),
+         name='async-point-detail'),
+    path('async/messages/', async_views.MessageListView.as_view(),
+         name='async-message-list-create'),
+    path('async/messages/search/', async_views.MessageSearchView.as_view(),
+         name='async-messages-search'),
+    path('async/messages/<int:pk>/', async_views.MessageDetailView.as_view(),
+         name='async-message-detail'),
 ]
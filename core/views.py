@@ -1,65 +1,163 @@
-from django.contrib.gis.db.models.functions import Distance
-from django.contrib.gis.geos import Point as GeoPoint
+import hmac
+import itertools
+
 from django.contrib.gis.measure import D
-from rest_framework import mixins, status, viewsets
-from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from django.db import connection, transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from rest_framework import mixins, serializers, status, viewsets
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from .export import (
+    CONTENT_TYPES,
+    encode_features,
+    message_features,
+    point_features,
+)
+from .message_stats import message_created, message_deleted
+from .metrics import metrics_settings, render_metrics
 from .models import Message, Point
-from .serializers import MessageSerializer, PointSerializer
+from .pagination import KeysetPagination
+from .search import (
+    batch_within_radius,
+    clusters,
+    k_nearest,
+    match_text,
+    order_points,
+    parse_batch_params,
+    parse_bbox_params,
+    parse_cluster_params,
+    parse_nearest_params,
+    parse_order_params,
+    parse_search_params,
+    parse_text_params,
+    radius_m,
+    within_bbox,
+    within_radius,
+)
+from .search_cache import cached_search
+from .serializers import (
+    MessageReadSerializer,
+    MessageSerializer,
+    PointReadSerializer,
+    PointSerializer,
+)
+from .signals import points_bulk_created
+from .spatial_index import get_spatial_index, index_settings
+from .tiles import MVTRenderer, cached_tile, check_tile, render_tile
+
+READ_ACTIONS = ['list', 'retrieve', 'search', 'search_batch', 'nearest', 'bbox']
+# Поиск видит точки и сообщения всех пользователей, остальное - только свои.
+SHARED_ACTIONS = ['search', 'nearest', 'bbox']
 
 
 class PointViewSet(viewsets.ModelViewSet):
     queryset = Point.objects.all()
     serializer_class = PointSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        if self.action not in ['search']:
-            return self.queryset.filter(created_by=self.request.user)
-        return self.queryset
+        queryset = self.queryset
+        if self.action not in [*SHARED_ACTIONS, 'clusters']:
+            queryset = queryset.filter(created_by=self.request.user)
+        if self.action in READ_ACTIONS:
+            queryset = PointReadSerializer.project(queryset)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action in READ_ACTIONS:
+            return PointReadSerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
-    @action(detail=False, methods=['GET'], url_path='search')
-    def search(self, request):
-        try:
-            lat = float(request.query_params['latitude'])
-            lon = float(request.query_params['longitude'])
-            radius = float(request.query_params.get('radius', 10))
-        except (KeyError, ValueError, TypeError):
-            return Response(
-                {
-                    "detail": (
-                        "Обязательные параметры: latitude, longitude, radius (числа)"
-                    )
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    @action(detail=False, methods=['POST'], url_path='bulk')
+    def bulk(self, request):
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
 
-        if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
-            return Response(
-                {"detail": "Недопустимые значения широты или долготы"},
-                status=status.HTTP_400_BAD_REQUEST
+        created = []
+        if serializer.validated_data:
+            serializer.save(created_by=request.user)
+            points_bulk_created(serializer.instance)
+            # Номер элемента во входном списке, как у errors: по нему клиент
+            # сопоставляет созданные точки с отправленными при ответе 207.
+            created = [
+                {'index': index, **item}
+                for index, item in zip(
+                    serializer.valid_indexes, serializer.data, strict=True
+                )
+            ]
+
+        errors = serializer.item_errors
+        if not created:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(
+            {'created': created, 'errors': errors},
+            status=response_status,
+        )
+
+    @action(detail=False, methods=['GET'], url_path='export')
+    def export(self, request):
+        output = request.query_params.get('output', 'geojson')
+        if output not in CONTENT_TYPES:
+            raise serializers.ValidationError(
+                {"detail": "Параметр output: geojson или ndjson"}
             )
 
-        if radius <= 0:
-            return Response(
-                {"detail": "Радиус должен быть больше 0 км"},
-                status=status.HTTP_400_BAD_REQUEST
+        features = point_features(self.get_queryset())
+        with_messages = request.query_params.get('messages', '')
+        if with_messages.lower() in ('1', 'true', 'yes'):
+            features = itertools.chain(
+                features,
+                message_features(
+                    Message.objects.filter(created_by=request.user)
+                ),
             )
 
-        radius = min(radius, 1000)
-        center = GeoPoint(lon, lat, srid=4326)
+        response = StreamingHttpResponse(
+            encode_features(features, output),
+            content_type=CONTENT_TYPES[output],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="points.{output}"'
+        )
+        return response
 
-        queryset = (
-            self.get_queryset()
-            .filter(location__distance_lte=(center, D(km=radius)))
-            .annotate(distance=Distance('location', center))
-            .order_by('distance')
+    @action(detail=False, methods=['GET'], url_path='search')
+    def search(self, request):
+        center, radius = parse_search_params(request.query_params)
+        self.order = parse_order_params(request.query_params)
+        return cached_search(request, 'points', center, radius, self.search_in)
+
+    def search_in(self, center, radius):
+        # In-memory индекс умеет только порядок по расстоянию. Каждая
+        # страница индекса считает все точки круга, поэтому большие радиусы
+        # идут в PostGIS. Следующие страницы идут тем же путём, что и первая:
+        # курсор индекса не продолжается запросом к БД и наоборот.
+        source = self.paginator.cursor_source(self.request)
+        index = None
+        max_radius = index_settings().get('MAX_RADIUS_KM', 50)
+        if self.order == 'distance' and source != 'db' and radius <= max_radius:
+            index = get_spatial_index()
+        if index is None and source == 'index':
+            raise NotFound('Индекс поиска перезапущен, начните поиск заново')
+        if index is not None:
+            return self.search_index(index, center, radius)
+
+        queryset = order_points(
+            within_radius(self.get_queryset(), 'location', center, radius),
+            self.order,
         )
 
         page = self.paginate_queryset(queryset)
@@ -70,6 +168,98 @@ class PointViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['POST'], url_path='search/batch')
+    def search_batch(self, request):
+        # Поиск по радиусу для списка центров (например, точек маршрута)
+        # одним SQL-запросом. Результаты сгруппированы по центрам в порядке
+        # запроса, у каждого не больше limit точек.
+        centers, limit, unique = parse_batch_params(request.data)
+        groups, truncated = batch_within_radius(centers, limit, unique)
+
+        return Response({
+            'results': [
+                {
+                    'latitude': center.y,
+                    'longitude': center.x,
+                    'radius': radius,
+                    'truncated': is_truncated,
+                    'results': self.get_serializer(rows, many=True).data,
+                }
+                for (center, radius), rows, is_truncated
+                in zip(centers, groups, truncated, strict=True)
+            ],
+        })
+
+    def search_index(self, index, center, radius):
+        hits = index.search(center.x, center.y, radius_m(radius))
+        page = self.paginator.paginate_hits(hits, self.request)
+        rows = {
+            row['id']: row
+            for row in self.get_queryset().filter(
+                pk__in=[point_id for _, point_id in page]
+            )
+        }
+
+        results = []
+        for distance, point_id in page:
+            row = rows.get(point_id)
+            if row is not None:
+                row['distance'] = D(m=distance)
+                results.append(row)
+
+        serializer = self.get_serializer(results, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['GET'], url_path='nearest')
+    def nearest(self, request):
+        center, k = parse_nearest_params(request.query_params)
+        queryset = k_nearest(self.get_queryset(), 'location', center, k)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['GET'], url_path='bbox')
+    def bbox(self, request):
+        return bbox_response(self, request)
+
+    @action(detail=False, methods=['GET'], url_path='clusters')
+    def clusters(self, request):
+        bbox, zoom, cell_size = parse_cluster_params(request.query_params)
+        rows = clusters(self.get_queryset(), 'location', bbox, cell_size)
+        return Response({
+            'zoom': zoom,
+            'cell_size': cell_size,
+            'results': [
+                {
+                    'latitude': round(row['center'].y, 6),
+                    'longitude': round(row['center'].x, 6),
+                    'count': row['count'],
+                    'ids': row['ids'],
+                }
+                for row in rows
+            ],
+        })
+
+    @action(
+        detail=False, methods=['GET'],
+        url_path=r'tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)',
+        renderer_classes=[JSONRenderer, MVTRenderer],
+    )
+    def tile(self, request, z, x, y):
+        # Векторный тайл только со своими точками, как и список points/.
+        check_tile(z, x, y)
+        tile, cache = cached_tile(
+            request, z, x, y,
+            lambda: render_tile(self.get_queryset(), z, x, y),
+        )
+        response = HttpResponse(
+            tile,
+            content_type='application/vnd.mapbox-vector-tile',
+            status=status.HTTP_200_OK if tile else status.HTTP_204_NO_CONTENT,
+        )
+        if cache is not None:
+            response['X-Cache'] = cache
+        return response
+
 
 class MessageViewSet(mixins.CreateModelMixin,
                      mixins.RetrieveModelMixin,
@@ -79,61 +269,44 @@ class MessageViewSet(mixins.CreateModelMixin,
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        if self.action not in ['search']:
-            return self.queryset.filter(
-                created_by=self.request.user
-            ).select_related(
-                "point",
-                "created_by",
-            )
-        return self.queryset.select_related('point', 'created_by')
+        queryset = self.queryset
+        if self.action not in SHARED_ACTIONS:
+            queryset = queryset.filter(created_by=self.request.user)
+        if self.action in READ_ACTIONS:
+            return MessageReadSerializer.project(queryset)
+        return queryset.select_related('point')
+
+    def get_serializer_class(self):
+        if self.action in READ_ACTIONS:
+            return MessageReadSerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        with transaction.atomic():
+            message = serializer.save(created_by=self.request.user)
+            message_created(message)
+
+    def perform_destroy(self, instance):
+        # instance.point уже загружен через select_related.
+        with transaction.atomic():
+            instance.delete()
+            message_deleted(instance, instance.point.last_message_at)
 
     @action(detail=False, methods=['GET'], url_path='search')
     def search(self, request):
-        try:
-            lat = float(request.query_params['latitude'])
-            lon = float(request.query_params['longitude'])
-            radius = float(request.query_params.get('radius', 10))
-        except (KeyError, ValueError, TypeError):
-            return Response(
-                {
-                    "detail": (
-                        "Обязательные параметры: latitude, longitude, radius (числа)"
-                    )
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+        center, radius = parse_search_params(request.query_params)
+        self.text, self.rank = parse_text_params(request.query_params)
+        return cached_search(request, 'messages', center, radius, self.search_in)
 
-        if not (-90 <= lat <= 90) or not (-180 <= lon <= 180):
-            return Response(
-                {"detail": "Недопустимые значения широты или долготы"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        if radius <= 0:
-            return Response(
-                {"detail": "Радиус должен быть больше 0 км"},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        radius = min(radius, 1000)
-        center = GeoPoint(lon, lat, srid=4326)
-
-        queryset = (
-            self.get_queryset()
-            .filter(point__location__distance_lte=(center, D(km=radius)))
-            .annotate(distance=Distance('point__location', center))
-            .order_by('distance')
+    def search_in(self, center, radius):
+        queryset = match_text(
+            within_radius(self.get_queryset(), 'location', center, radius),
+            self.text, self.rank, radius,
         )
 
-        for msg in queryset:
-            msg.distance = getattr(msg, 'distance', None)
-
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -141,3 +314,55 @@ class MessageViewSet(mixins.CreateModelMixin,
 
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['GET'], url_path='nearest')
+    def nearest(self, request):
+        center, k = parse_nearest_params(request.query_params)
+        queryset = k_nearest(self.get_queryset(), 'location', center, k)
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['GET'], url_path='bbox')
+    def bbox(self, request):
+        return bbox_response(self, request)
+
+
+def bbox_response(view, request):
+    # Видимый прямоугольник карты: вместо курсора - жёсткий limit и
+    # флаг truncated, если в прямоугольник попало больше строк.
+    bbox, limit = parse_bbox_params(request.query_params)
+    rows = list(within_bbox(view.get_queryset(), 'location', bbox, limit))
+    serializer = view.get_serializer(rows[:limit], many=True)
+    return Response({
+        'truncated': len(rows) > limit,
+        'results': serializer.data,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def db_pool_stats(request):
+    # Счётчики psycopg-pool текущего процесса: размер пула, свободные
+    # соединения, ожидающие запросы и время ожидания.
+    pool = connection.pool
+    if pool is None:
+        return Response({'enabled': False})
+    return Response({'enabled': True, **pool.get_stats()})
+
+
+def metrics(request):
+    # Метрики всех воркеров в текстовом формате Prometheus. Если задан
+    # METRICS TOKEN, нужен заголовок Authorization: Bearer <TOKEN>.
+    config = metrics_settings()
+    if not config.get('ENABLED'):
+        raise Http404
+    token = config.get('TOKEN')
+    if token:
+        header = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            response = HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+            response['WWW-Authenticate'] = 'Bearer realm="metrics"'
+            return response
+    return HttpResponse(
+        render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -1,3 +1,4 @@
+import json
 import os
 from datetime import timedelta
 from pathlib import Path
@@ -30,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -37,6 +40,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'geopoints.urls'
@@ -67,9 +71,33 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', 'postgres'),
         'HOST': os.getenv('POSTGRES_HOST', 'db'),
         'PORT': os.getenv('POSTGRES_PORT', '5432'),
+        'CONN_HEALTH_CHECKS': os.getenv('CONN_HEALTH_CHECKS', 'False').lower() == 'true',
     }
 }
 
+# Пул соединений psycopg (psycopg-pool): запрос берёт готовое соединение
+# вместо нового подключения к PostgreSQL. Без пула соединение можно держать
+# открытым CONN_MAX_AGE секунд; вместе с пулом CONN_MAX_AGE должен быть 0.
+if os.getenv('DB_POOL_ENABLED', 'False').lower() == 'true':
+    from psycopg_pool import ConnectionPool
+
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+            'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '3600')),
+            'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '600')),
+        },
+    }
+    if os.getenv('DB_POOL_CHECK', 'True').lower() == 'true':
+        # Проверяет соединение перед выдачей из пула.
+        DATABASES['default']['OPTIONS']['pool']['check'] = (
+            ConnectionPool.check_connection
+        )
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('CONN_MAX_AGE', '0'))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -101,7 +129,7 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -120,12 +148,142 @@ REST_FRAMEWORK = {
     ),
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Для нескольких процессов нужен общий бэкенд (например, FileBasedCache),
+    # иначе счётчики поколений не видны другим процессам.
+    'search': {
+        'BACKEND': os.getenv('SEARCH_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('SEARCH_CACHE_LOCATION', 'search'),
+        'TIMEOUT': int(os.getenv('SEARCH_CACHE_TIMEOUT', '60')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', '10000')),
+        },
+    },
+    'tiles': {
+        'BACKEND': os.getenv('TILE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('TILE_CACHE_LOCATION', 'tiles'),
+        'TIMEOUT': int(os.getenv('TILE_CACHE_TIMEOUT', '3600')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('TILE_CACHE_MAX_ENTRIES', '10000')),
+        },
+    },
+}
+
+# Кэш страниц points/search/ и messages/search/. Координаты округляются до
+# PRECISION знаков, радиус - до RADIUS_STEP км; записи сбрасываются через
+# счётчики поколений ячеек CELL_SIZE° при изменении точек и сообщений.
+SEARCH_CACHE = {
+    'ENABLED': os.getenv('SEARCH_CACHE_ENABLED', 'False').lower() == 'true',
+    'ALIAS': 'search',
+    'TIMEOUT': int(os.getenv('SEARCH_CACHE_TIMEOUT', '60')),
+    'PRECISION': int(os.getenv('SEARCH_CACHE_PRECISION', '3')),
+    'RADIUS_STEP': float(os.getenv('SEARCH_CACHE_RADIUS_STEP', '0.5')),
+    'CELL_SIZE': float(os.getenv('SEARCH_CACHE_CELL_SIZE', '1.0')),
+    'MAX_CELLS': int(os.getenv('SEARCH_CACHE_MAX_CELLS', '400')),
+}
+
+# Кэш векторных тайлов api/tiles/{z}/{x}/{y}.mvt до MAX_ZOOM включительно.
+# Изменение точки сбрасывает счётчики поколений тайлов, в которые она
+# попадает вместе с буфером, на каждом кэшируемом зуме.
+TILE_CACHE = {
+    'ENABLED': os.getenv('TILE_CACHE_ENABLED', 'False').lower() == 'true',
+    'ALIAS': 'tiles',
+    'TIMEOUT': int(os.getenv('TILE_CACHE_TIMEOUT', '3600')),
+    'MAX_ZOOM': int(os.getenv('TILE_CACHE_MAX_ZOOM', '14')),
+}
+
+# In-memory индекс точек для points/search/, по умолчанию выключен. Каждый
+# процесс держит свою копию: изменения из других процессов видны не позже
+# чем через MAX_AGE секунд. Расстояния считаются по эллипсоиду WGS84, как
+# в PostGIS. Поиск с радиусом больше MAX_RADIUS_KM идёт через PostGIS.
+SPATIAL_INDEX = {
+    'ENABLED': os.getenv('SPATIAL_INDEX_ENABLED', 'False').lower() == 'true',
+    'CELL_SIZE': float(os.getenv('SPATIAL_INDEX_CELL_SIZE', '0.1')),
+    'MAX_MEMORY_MB': int(os.getenv('SPATIAL_INDEX_MAX_MEMORY_MB', '256')),
+    'MAX_AGE': int(os.getenv('SPATIAL_INDEX_MAX_AGE', '300')),
+    'MAX_RADIUS_KM': float(os.getenv('SPATIAL_INDEX_MAX_RADIUS_KM', '50')),
+}
+
+# Пакетное создание точек через POST /api/points/bulk/
+POINTS_BULK = {
+    'MAX_ITEMS': int(os.getenv('POINTS_BULK_MAX_ITEMS', '5000')),
+    'BATCH_SIZE': int(os.getenv('POINTS_BULK_BATCH_SIZE', '500')),
+}
+
+# Server-Timing и JSON-строка в лог core.timing для каждого запроса.
+# QUERY_BUDGETS - допустимое число SQL-запросов по имени маршрута, с учётом
+# запроса пользователя при аутентификации; превышения пишутся как WARNING.
+SERVER_TIMING = {
+    'ENABLED': os.getenv('SERVER_TIMING_ENABLED', 'False').lower() == 'true',
+    'QUERY_BUDGETS': {
+        'point-list-create': 2,
+        'point-detail': 4,
+        'points-search': 2,
+        'points-search-batch': 2,
+        'messages-search': 2,
+        'points-nearest': 2,
+        'messages-nearest': 2,
+        'points-bbox': 2,
+        'messages-bbox': 2,
+        'points-clusters': 2,
+        'point-tile': 2,
+        'message-detail': 2,
+        **json.loads(os.getenv('SERVER_TIMING_QUERY_BUDGETS', '{}')),
+    },
+}
+
+# Профилирование запроса по заголовку X-Profile: 1 (или ?profile=1) для
+# staff. X-Profile: inline возвращает топ TOP функций вместо ответа.
+PROFILING = {
+    'ENABLED': os.getenv('PROFILING_ENABLED', 'False').lower() == 'true',
+    'DIR': os.getenv('PROFILING_DIR', str(BASE_DIR / 'profiles')),
+    'PROFILER': os.getenv('PROFILING_PROFILER', 'auto'),  # auto, cprofile, pyinstrument
+    'TOP': int(os.getenv('PROFILING_TOP', '30')),
+    'HEADER': 'X-Profile',
+    'QUERY_PARAM': 'profile',
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.timing': {
+            'handlers': ['console'],
+            'level': os.getenv('SERVER_TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Метрики Prometheus на /metrics. При нескольких воркерах gunicorn/uvicorn
+# каждый процесс сбрасывает свои значения в DIR не чаще FLUSH_INTERVAL
+# секунд, /metrics суммирует файлы всех процессов.
+METRICS = {
+    'ENABLED': os.getenv('METRICS_ENABLED', 'False').lower() == 'true',
+    'DIR': os.getenv('METRICS_DIR', ''),
+    'FLUSH_INTERVAL': float(os.getenv('METRICS_FLUSH_INTERVAL', '1')),
+    'TOKEN': os.getenv('METRICS_TOKEN', ''),
+}
+
+# Кэш пользователей JWT в памяти процесса: TTL в секундах, 0 - выключен.
+JWT_USER_CACHE = {
+    'TTL': int(os.getenv('JWT_USER_CACHE_TTL', '60')),
+    'MAX_ENTRIES': int(os.getenv('JWT_USER_CACHE_MAX_ENTRIES', '10000')),
+}
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': False,
-    'UPDATE_LAST_LOGIN': True,
+    # Запись last_login на каждую выдачу токена нагружает auth_user.
+    'UPDATE_LAST_LOGIN': os.getenv('JWT_UPDATE_LAST_LOGIN', 'False').lower() == 'true',
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'VERIFYING_KEY': None,
@@ -5,9 +5,12 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 
+from core.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('core.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics', metrics, name='metrics'),
 ]